@@ -0,0 +1,252 @@
+import os
+import re
+from c_regions import mask_code, _matching_brace, _matching_paren, _skip_space, _statement_end
+from config import Config
+from loop_analysis import analyze_program, _collapsible
+from tuning_db import TuningDatabase
+from utils import Logger, LogColors
+
+AGENT_NAME = "Autotuner"
+
+_DIRECTIVE_RE = re.compile(r"^(\s*#\s*pragma\s+omp\s+)(.*?)\s*$")
+_TUNED_CLAUSES = ("schedule", "collapse", "proc_bind", "num_threads")
+
+class Directive:
+    """One `#pragma omp` line of the accepted code and the tunable choices for it."""
+
+    def __init__(self, line_index: int, prefix: str, text: str, max_collapse: int):
+        self.line_index = line_index
+        self.prefix = prefix # "#pragma omp " with the line's indentation
+        self.is_loop = re.match(r"(parallel\s+)?for\b", text) is not None
+        self.is_parallel = text.startswith("parallel")
+        self.max_collapse = max_collapse
+        clauses = _parse_clauses(text)
+        self.base = _strip_clauses(text)
+        self.schedule = clauses.get("schedule")
+        self.collapse = int(clauses["collapse"]) if clauses.get("collapse", "").isdigit() else None
+        self.proc_bind = clauses.get("proc_bind")
+        self.num_threads = clauses.get("num_threads")
+
+    def render(self, settings: dict) -> str:
+        """The pragma line with the given settings ({"schedule", "collapse", "proc_bind", "num_threads"}) applied."""
+        clauses = []
+        if self.is_loop:
+            if settings.get("schedule"):
+                clauses.append(f"schedule({settings['schedule']})")
+            if settings.get("collapse") and settings["collapse"] > 1:
+                clauses.append(f"collapse({settings['collapse']})")
+        if self.is_parallel:
+            if settings.get("proc_bind"):
+                clauses.append(f"proc_bind({settings['proc_bind']})")
+            if settings.get("num_threads"):
+                clauses.append(f"num_threads({settings['num_threads']})")
+        return " ".join([f"{self.prefix}{self.base}"] + clauses)
+
+    def current(self) -> dict:
+        return {"schedule": self.schedule, "collapse": self.collapse, "proc_bind": self.proc_bind, "num_threads": self.num_threads}
+
+def _parse_clauses(text: str) -> dict:
+    clauses = {}
+    for match in re.finditer(r"\b(" + "|".join(_TUNED_CLAUSES) + r")\s*\(([^()]*)\)", text):
+        clauses[match.group(1)] = match.group(2).replace(" ", "")
+    return clauses
+
+def _strip_clauses(text: str) -> str:
+    return re.sub(r"\s*\b(" + "|".join(_TUNED_CLAUSES) + r")\s*\([^()]*\)", "", text).strip()
+
+def _perfect_nest_depth(masked: str, start: int) -> int:
+    """Counts the perfectly nested `for` loops beginning at the first `for` after `start` (the collapse limit)."""
+    depth = 0
+    i = _skip_space(masked, start)
+    while masked.startswith("for", i) and not (masked[i + 3:i + 4].isalnum() or masked[i + 3:i + 4] == "_"):
+        open_paren = _skip_space(masked, i + 3)
+        close_paren = _matching_paren(masked, open_paren) if masked[open_paren:open_paren + 1] == "(" else -1
+        if close_paren == -1:
+            break
+        depth += 1
+        body = _skip_space(masked, close_paren + 1)
+        if masked[body:body + 1] == "{":
+            close = _matching_brace(masked, body)
+            inner = _skip_space(masked, body + 1)
+            # The block must hold exactly one statement, the next loop
+            if close == -1 or _skip_space(masked, _statement_end(masked, inner)) != close:
+                break
+            i = inner
+        else:
+            i = body
+    return depth
+
+def find_directives(code: str) -> list:
+    """Returns the tunable `#pragma omp` directives of the code (lines continued with a backslash are left alone)."""
+    lines = code.split("\n")
+    masked = mask_code(code)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line) + 1)
+    loops_by_line = {loop.line: loop for nest in analyze_program(code).nests for loop in nest.loops()}
+    directives = []
+    for index, line in enumerate(lines):
+        match = _DIRECTIVE_RE.match(line)
+        if not match or line.rstrip().endswith("\\"):
+            continue
+        text = match.group(2)
+        if not re.match(r"(parallel\b|for\b)", text) or re.match(r"parallel\s+(sections|master|single)\b", text):
+            continue
+        max_collapse = _collapse_limit(code, masked, offsets[index + 1], loops_by_line) if re.search(r"\bfor\b", text) else 0
+        directives.append(Directive(index, match.group(1), text, max_collapse))
+    return directives
+
+def _collapse_limit(code: str, masked: str, start: int, loops_by_line: dict) -> int:
+    """
+    How deep the loop after a directive may be collapsed: the perfectly nested loops, limited to those
+    the static analysis found independent and rectangular. Unknown loops are not collapsed further.
+    """
+    first_for = re.search(r"\bfor\b", masked[start:])
+    loop = loops_by_line.get(code.count("\n", 0, start + first_for.start()) + 1) if first_for else None
+    if loop is None:
+        return 1
+    depth = 1
+    while _collapsible(masked, loop):
+        depth += 1
+        loop = loop.children[0]
+    return min(depth, _perfect_nest_depth(masked, start))
+
+def apply_settings(code: str, directives: list, settings: list) -> str:
+    """Rewrites each directive line with its settings (a list parallel to `directives`)."""
+    lines = code.split("\n")
+    for directive, setting in zip(directives, settings):
+        lines[directive.line_index] = directive.render(setting)
+    return "\n".join(lines)
+
+class Autotuner:
+    """
+    Tunes the OpenMP clauses of accepted code empirically: schedule kind and chunk size, collapse depth,
+    proc_bind and thread count. Variants are built concurrently in separate sandboxes, then timed one at
+    a time (so runs don't compete for cores) and must print the same output as the untuned code.
+    The winner is stored in the tuning database, keyed by source and machine.
+    """
+
+    def __init__(self, checker, database: TuningDatabase = None):
+        self.checker = checker
+        self.database = database or TuningDatabase()
+        Logger.info("Autotuner initialized.", AGENT_NAME, LogColors.CHECKER)
+
+    def tune(self, code: str, src_dir: str, project_dir: str = None, include_dirs: list = None, extra_files: list = None,
+             extra_flags: list = None, run_args: list = None, thread_counts: list = None, repetitions: int = None,
+             timeout: float = None):
+        """
+        Args:
+            code (str): Accepted OpenMP code.
+            src_dir, project_dir, include_dirs, extra_files, extra_flags: Same as Checker.compile().
+            run_args (list): Arguments for the timing runs.
+            thread_counts (list): num_threads values to try (default: powers of two up to the core count).
+            repetitions (int): Timing runs per variant; the median is used.
+            timeout (float): Seconds before a run is killed.
+        Returns:
+            tuple: (tuned code, report dict with "cached", "baseline_time", "best_time", "settings", "variants")
+        """
+        run_args = run_args or []
+        repetitions = repetitions or Config.AUTOTUNE_REPETITIONS
+        timeout = timeout or Config.BENCHMARK_TIMEOUT
+        thread_counts = thread_counts or Config.AUTOTUNE_THREADS or _default_thread_counts()
+        directives = find_directives(code)
+        report = {"cached": False, "baseline_time": None, "best_time": None, "settings": None, "variants": 0}
+        if not directives:
+            Logger.info("No tunable OpenMP directives found.", AGENT_NAME, LogColors.CHECKER)
+            return code, report
+
+        key = self.database.make_key(code, {"include_dirs": include_dirs, "extra_files": extra_files, "extra_flags": extra_flags,
+                                            "run_args": run_args, "threads": thread_counts})
+        stored = self.database.get(key)
+        if stored and len(stored.get("settings", [])) == len(directives):
+            Logger.info(f"Reusing tuning result from the database ({stored['best_time']:.4f}s vs "
+                        f"{stored['baseline_time']:.4f}s untuned).", AGENT_NAME, LogColors.CHECKER)
+            report.update(stored, cached=True)
+            return apply_settings(code, directives, stored["settings"]), report
+
+        build = {"src_dir": src_dir, "project_dir": project_dir, "include_dirs": include_dirs, "extra_files": extra_files,
+                 "extra_flags": extra_flags}
+        timing = {"run_args": run_args, "repetitions": repetitions, "timeout": timeout}
+        best_settings = [d.current() for d in directives]
+        results = self._measure([best_settings], code, directives, build, timing, reference=None)
+        baseline_time, reference = results[0]
+        if baseline_time is None:
+            Logger.warning("The accepted code could not be timed; skipping autotuning.", AGENT_NAME)
+            return code, report
+        best_time = baseline_time
+        report["baseline_time"] = baseline_time
+        Logger.info(f"Untuned time: {baseline_time:.4f}s. Sweeping {len(directives)} directive(s).", AGENT_NAME, LogColors.CHECKER)
+
+        for stage, variants in self._stages(directives, thread_counts):
+            candidates = [s for s in (variant(best_settings) for variant in variants) if s != best_settings]
+            candidates = candidates[:max(0, Config.AUTOTUNE_MAX_VARIANTS - report["variants"])]
+            if not candidates:
+                continue
+            measured = self._measure(candidates, code, directives, build, timing, reference)
+            report["variants"] += len(candidates)
+            for settings, (elapsed, _) in zip(candidates, measured):
+                # Require a clear gain so timing noise doesn't pick a variant
+                if elapsed is not None and elapsed < best_time * (1 - Config.AUTOTUNE_MIN_GAIN):
+                    best_time, best_settings = elapsed, settings
+            Logger.info(f"After {stage}: best {best_time:.4f}s.", AGENT_NAME, LogColors.CHECKER)
+
+        report.update(best_time=best_time, settings=best_settings)
+        self.database.put(key, {"baseline_time": baseline_time, "best_time": best_time, "settings": best_settings,
+                                "variants": report["variants"]})
+        Logger.success(f"Autotuning: {baseline_time:.4f}s -> {best_time:.4f}s ({baseline_time / best_time:.2f}x) "
+                       f"over {report['variants']} variant(s).", AGENT_NAME)
+        return apply_settings(code, directives, best_settings), report
+
+    def _stages(self, directives: list, thread_counts: list) -> list:
+        """
+        The sweep as a sequence of stages, each a list of functions mapping the best settings so far to a variant.
+        Stages are searched one after another (coordinate descent) rather than as a full cross product.
+        """
+        def with_all(update, only):
+            return lambda best: [dict(s, **update) if only(d) else s for d, s in zip(directives, best)]
+
+        schedules = []
+        for kind in Config.AUTOTUNE_SCHEDULES:
+            for chunk in Config.AUTOTUNE_CHUNK_SIZES:
+                schedule = kind if chunk is None else f"{kind},{chunk}"
+                schedules.append(with_all({"schedule": schedule}, lambda d: d.is_loop))
+
+        collapses = []
+        for index, directive in enumerate(directives):
+            for depth in range(1, max(directive.max_collapse, directive.collapse or 1) + 1):
+                collapses.append(lambda best, index=index, depth=depth:
+                                 [dict(s, collapse=depth) if k == index else s for k, s in enumerate(best)])
+
+        placements = []
+        for proc_bind in Config.AUTOTUNE_PROC_BIND:
+            for threads in thread_counts:
+                placements.append(with_all({"proc_bind": proc_bind, "num_threads": threads}, lambda d: d.is_parallel))
+        return [("schedule", schedules), ("collapse", collapses), ("proc_bind/threads", placements)]
+
+    def _measure(self, variants: list, code: str, directives: list, build: dict, timing: dict, reference):
+        """
+        Builds the variants concurrently and times them sequentially.
+        Returns:
+            list: (median seconds or None if it failed or its output differs from reference, stdout) per variant.
+        """
+        codes = [apply_settings(code, directives, settings) for settings in variants]
+        return self.checker.measure_variants(codes, True, reference=reference, **build, **timing)
+
+def _default_thread_counts() -> list:
+    cores = os.cpu_count() or 1
+    counts = [None] # Keep the runtime's default
+    threads = 1
+    while threads <= cores:
+        counts.append(threads)
+        threads *= 2
+    if cores not in counts:
+        counts.append(cores)
+    return counts
+
+def format_tuning_report(report: dict) -> str:
+    """Summarizes an autotuning report for the log."""
+    if not report.get("settings"):
+        return "Autotuning made no changes."
+    source = "tuning database" if report["cached"] else f"{report['variants']} variant(s)"
+    return (f"Autotuned from {source}: {report['baseline_time']:.4f}s untuned, {report['best_time']:.4f}s tuned "
+            f"({report['baseline_time'] / report['best_time']:.2f}x).")
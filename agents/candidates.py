@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from groq_client import send_prompt
+from config import Config
+from tracing import propagate
+from utils import Logger
+
+def candidate_variants(num_candidates: int) -> list:
+    """
+    Returns distinct (temperature, prompt hint) pairs for up to num_candidates candidates.
+    The first candidate always uses the default temperature and no hint, so K=1 matches the single-candidate path.
+    The rest walk the temperature/hint combinations diagonally, so consecutive candidates change both; the list
+    is shorter than num_candidates when there are not enough distinct pairs.
+    """
+    variants = [(Config.TEMP, "")]
+    temperatures = Config.CANDIDATE_TEMPERATURES or [Config.TEMP]
+    hints = Config.CANDIDATE_PROMPT_HINTS or [""]
+    order = sorted(product(range(len(temperatures)), range(len(hints))), key=lambda ij: ((ij[1] - ij[0]) % len(hints), ij[0]))
+    for i, j in order:
+        if len(variants) >= num_candidates:
+            break
+        variant = (temperatures[i], hints[j])
+        if variant not in variants:
+            variants.append(variant)
+    return variants
+
+def generate_candidates(prompt: str, num_candidates: int, agent_name: str, color: str) -> list:
+    """
+    Sends num_candidates variants of a prompt concurrently.
+    Concurrency is still bounded by the process-wide LLM slots in concurrency.py.
+    Args:
+        prompt (str): The base prompt.
+        num_candidates (int): How many candidates to generate.
+        agent_name (str): Caller's name, for logging.
+        color (str): Caller's log color.
+    Returns:
+        list: The candidate codes, in variant order.
+    """
+    variants = candidate_variants(num_candidates)
+    if len(variants) < num_candidates:
+        Logger.warning(f"Only {len(variants)} distinct temperature/hint pairs are configured; generating {len(variants)} candidates instead of {num_candidates}.", agent_name)
+    Logger.info(f"Generating {len(variants)} candidates concurrently.", agent_name, color)
+
+    def _one(variant):
+        temperature, hint = variant
+        variant_prompt = f"{prompt}\n{hint}" if hint else prompt
+        return send_prompt(variant_prompt, temperature=temperature)
+
+    with ThreadPoolExecutor(max_workers=len(variants)) as executor:
+        candidates = list(executor.map(propagate(_one), variants))
+    return candidates
@@ -1,10 +1,24 @@
 import subprocess
 import os
+import hashlib
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from build_cache import ObjectCache
+from build_sandbox import BuildSandbox, release_path, sweep_stale_sandboxes
+from concurrency import compile_slot
+from tracing import span, propagate
 from utils import Logger, LogColors # Assuming Logger and LogColors are in utils.py
 
 AGENT_NAME = "Checker"
 
+object_cache = ObjectCache() # Shared by every Checker in the process so batch runs reuse objects too
+
 class Checker:
+    def __init__(self):
+        self._baseline_cache = {} # Serial timings keyed by a hash of the original code and run settings
+
     def compile(self, code: str, use_openmp: bool, src_dir: str, project_dir: str = None, include_dirs: list = None, 
                 extra_files: list = None, extra_flags: list = None):
         """
@@ -21,6 +35,26 @@ class Checker:
             tuple: (bool, str) where bool is True on success, False on failure,
                    and str contains error messages if compilation failed.
         """
+        success, errors, _ = self.build(code, use_openmp, src_dir, project_dir, include_dirs, extra_files, extra_flags)
+        return success, errors
+
+    def build(self, code: str, use_openmp: bool, src_dir: str, project_dir: str = None, include_dirs: list = None,
+              extra_files: list = None, extra_flags: list = None, keep_executable: bool = False):
+        """
+        Compiles the given C code and optionally keeps the resulting executable.
+        Args:
+            code (str): The C code to compile.
+            use_openmp (bool): Whether to include OpenMP flags.
+            src_dir (str): The directory where the temp C file will be created.
+            project_dir (str): The root directory of the C project (compilation runs here).
+            include_dirs (list): List of include directories relative to project_dir.
+            extra_files (list): List of additional C files to compile (relative to project_dir).
+            extra_flags (list): Additional compiler flags.
+            keep_executable (bool): Leave the executable on disk for the caller to run (and delete).
+        Returns:
+            tuple: (bool, str, str) - success flag, error messages, and the absolute executable path
+                   (None unless keep_executable is set and compilation succeeded).
+        """
         
         # If project_dir not provided, use src_dir as fallback
         if not project_dir:
@@ -38,13 +72,17 @@ class Checker:
         extra_files = extra_files or []
         extra_flags = extra_flags or []
 
+        # Every build gets its own sandbox directory, so concurrent checks never share file names
+        sweep_stale_sandboxes()
+        try:
+            sandbox = BuildSandbox(absolute_src_dir)
+        except OSError as e:
+            Logger.error(f"Failed to create build sandbox: {e}", AGENT_NAME)
+            return False, f"IOError: Failed to create build sandbox. Details: {e}", None
         temp_c_filename = "temp_generated_code.c" # Name for the temporary C file
         temp_exe_filename = "temp_compiled_exe"   # Name for the temporary executable
-        
-        # Path for the temporary C file (relative to src_dir)
-        temp_c_filepath_abs = os.path.join(absolute_src_dir, temp_c_filename)
-        # Path for the executable (relative to project_dir)
-        temp_exe_filepath_abs = os.path.join(absolute_project_dir, temp_exe_filename)
+        temp_c_filepath_abs = sandbox.file(temp_c_filename)
+        temp_exe_filepath_abs = sandbox.file(temp_exe_filename)
 
         Logger.info(f"Attempting to compile code. OpenMP: {use_openmp}", AGENT_NAME, LogColors.CHECKER)
         Logger.debug(f"Writing code to temporary file: {temp_c_filepath_abs}", AGENT_NAME, LogColors.CHECKER)
@@ -55,95 +93,428 @@ class Checker:
                 f.write(code)
         except IOError as e:
             Logger.error(f"Failed to write temporary C file '{temp_c_filepath_abs}': {e}", AGENT_NAME)
-            return False, f"IOError: Failed to write temporary file {temp_c_filepath_abs}. Details: {e}"
+            sandbox.cleanup()
+            return False, f"IOError: Failed to write temporary file {temp_c_filepath_abs}. Details: {e}", None
 
-        # Determine the appropriate compiler
-        compiler = "mpicc" if not use_openmp and "MPI_" in code.upper() else "gcc"
+        # Determine the appropriate compiler: MPI code (including hybrid MPI+OpenMP) needs the mpicc wrapper
+        compiler = "mpicc" if "MPI_" in code.upper() else "gcc"
         Logger.info(f"Using compiler: {compiler}", AGENT_NAME, LogColors.CHECKER)
         
-        # Start building the compilation command
-        cmd = [compiler]
+        # Flags shared by every tier
+        common_flags = []
         
         # Add -fopenmp flag if using OpenMP
         if use_openmp:
-            cmd.append("-fopenmp")
-        
-        # Add optimization flag
-        cmd.append("-O3")
+            common_flags.append("-fopenmp")
         
-        # Add include directories with -I flags
+        # Add include directories with -I flags (relative paths resolve against project_dir, the cwd)
         for include_dir in include_dirs:
-            # Make the include path relative to the project directory
-            if os.path.isabs(include_dir):
-                # If absolute path provided, use as is
-                cmd.extend(["-I", include_dir])
-            else:
-                # If relative path, make it relative to project_dir for the command
-                cmd.extend(["-I", include_dir])
+            common_flags.extend(["-I", include_dir])
         
-        # Add any extra files to compile
-        for extra_file in extra_files:
-            # Make the file path relative to the project directory
-            if os.path.isabs(extra_file):
-                # If absolute path provided, use as is
-                cmd.append(extra_file)
-            else:
-                # If relative path, keep it relative for the command since cwd will be project_dir
-                cmd.append(extra_file)
-        
-        # Add the temporary C file to compile (make path relative to project_dir)
-        temp_c_path_rel_to_project = os.path.relpath(temp_c_filepath_abs, absolute_project_dir)
-        cmd.append(temp_c_path_rel_to_project)
-        
-        # Add extra flags
-        cmd.extend(extra_flags)
-        
-        # Add output file flag
-        cmd.extend(["-o", temp_exe_filename])
-        
-        Logger.info(f"Compilation command: {' '.join(cmd)}", AGENT_NAME, LogColors.CHECKER)
-        Logger.info(f"Executing command in directory: {absolute_project_dir}", AGENT_NAME, LogColors.CHECKER)
+        # The generated file lives in the sandbox; quoted includes still find headers next to the original source
+        source_flags = sandbox.compile_flags()
 
         try:
-            # Execute the compilation command with cwd set to the project directory
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                cwd=absolute_project_dir,
-                timeout=60 # Timeout after 60 seconds
-            )
+            # Tier 1: syntax-only check of the generated file. Most LLM mistakes are caught here in a fraction of the full build time.
+            syntax_cmd = [compiler, "-fsyntax-only"] + common_flags + source_flags + [temp_c_filepath_abs] + extra_flags
+            Logger.info(f"Syntax check command: {' '.join(syntax_cmd)}", AGENT_NAME, LogColors.CHECKER)
+            with span("compile.syntax", "compile", compiler=compiler) as trace:
+                result = self._run_compiler(syntax_cmd, absolute_project_dir)
+                trace.set(ok=result.returncode == 0)
+            if result.returncode != 0:
+                return self._compile_failed(result, compiler, absolute_project_dir, sandbox, "Syntax check")
+
+            # Tier 2: extra files become cached objects, built once and reused across attempts and runs
+            object_flags = common_flags + ["-O3"] + extra_flags
+            extra_inputs = []
+            for extra_file in extra_files:
+                if not ObjectCache.is_cacheable(object_flags):
+                    extra_inputs.append(extra_file)
+                    continue
+                with span("compile.objects", "compile", file=extra_file):
+                    object_path, object_errors = object_cache.get_or_build(compiler, object_flags, extra_file, absolute_project_dir)
+                if object_path is None:
+                    Logger.error(f"Failed to compile extra file {extra_file}:\n{object_errors}", AGENT_NAME)
+                    sandbox.cleanup()
+                    return False, object_errors, None
+                extra_inputs.append(object_path)
+
+            # Tier 3: optimize the generated file and link
+            cmd = [compiler] + common_flags + source_flags + ["-O3"] + extra_inputs + [temp_c_filepath_abs] + extra_flags + ["-o", temp_exe_filepath_abs]
+            Logger.info(f"Compilation command: {' '.join(cmd)}", AGENT_NAME, LogColors.CHECKER)
+            Logger.info(f"Executing command in directory: {absolute_project_dir}", AGENT_NAME, LogColors.CHECKER)
+            with span("compile.link", "compile", compiler=compiler) as trace:
+                result = self._run_compiler(cmd, absolute_project_dir)
+                trace.set(ok=result.returncode == 0)
 
             if result.returncode == 0:
                 Logger.success(f"Compilation successful in {absolute_project_dir}.", AGENT_NAME)
-                # Clean up temporary files on success
-                try:
-                    os.remove(temp_c_filepath_abs)
-                    # temp_exe_filepath_abs might have .exe on Windows even under Cygwin if gcc adds it
-                    if os.path.exists(temp_exe_filepath_abs):
-                        os.remove(temp_exe_filepath_abs)
-                    elif os.path.exists(temp_exe_filepath_abs + ".exe"): # Check for .exe extension
-                         os.remove(temp_exe_filepath_abs + ".exe")
-                except OSError as e:
-                    Logger.warning(f"Could not clean up temporary files: {e}", AGENT_NAME)
-                return True, ""
+                # temp_exe_filepath_abs might have .exe on Windows even under Cygwin if gcc adds it
+                exe_path = temp_exe_filepath_abs
+                if not os.path.exists(exe_path) and os.path.exists(temp_exe_filepath_abs + ".exe"):
+                    exe_path = temp_exe_filepath_abs + ".exe"
+                # Clean up the sandbox on success, unless the caller wants to run the executable (see release_executable)
+                if not keep_executable:
+                    sandbox.cleanup()
+                return True, "", (exe_path if keep_executable else None)
             else:
-                Logger.warning(f"Compilation failed. Return code: {result.returncode}", AGENT_NAME)
-                error_message = result.stderr if result.stderr else result.stdout # Some compilers output to stdout
-                Logger.error(f"Compiler errors from {compiler} (in {absolute_project_dir}):\n{error_message}", AGENT_NAME)
-                return False, error_message
+                return self._compile_failed(result, compiler, absolute_project_dir, sandbox, "Compilation")
         except subprocess.TimeoutExpired:
             Logger.error(f"Compilation timed out in {absolute_project_dir}.", AGENT_NAME)
-            return False, f"Compilation timed out after 60 seconds in {absolute_project_dir}."
+            sandbox.cleanup()
+            return False, f"Compilation timed out after 60 seconds in {absolute_project_dir}.", None
         except FileNotFoundError:
             Logger.error(f"Compiler '{compiler}' not found. Ensure it's in your PATH (especially for Cygwin environment).", AGENT_NAME)
-            return False, f"Compiler '{compiler}' not found. Please install it or check your PATH."
+            sandbox.cleanup()
+            return False, f"Compiler '{compiler}' not found. Please install it or check your PATH.", None
         except Exception as e:
             Logger.error(f"An unexpected error occurred during compilation in {absolute_project_dir}: {e}", AGENT_NAME)
-            # Best effort to clean up the .c file if process crashes before normal cleanup
-            if os.path.exists(temp_c_filepath_abs):
+            sandbox.cleanup()
+            return False, f"Unexpected compilation error in {absolute_project_dir}: {e}", None
+
+    def build_project(self, sources: dict, project_dir: str, include_dirs: list = None, extra_flags: list = None,
+                      use_openmp: bool = True):
+        """
+        Builds a whole program from several translation units in one compiler invocation.
+        Args:
+            sources (dict): {path relative to project_dir: code} for every translation unit of the program.
+            project_dir (str): The project root (compilation runs here; headers are found next to the original files).
+            include_dirs (list): Include directories relative to project_dir.
+            extra_flags (list): Additional compiler and linker flags.
+            use_openmp (bool): Whether to include OpenMP flags.
+        Returns:
+            tuple: (bool, str) - success flag and the compiler's output, with file names relative to project_dir.
+        """
+        absolute_project_dir = os.path.abspath(project_dir)
+        sweep_stale_sandboxes()
+        try:
+            sandbox = BuildSandbox(absolute_project_dir)
+        except OSError as e:
+            Logger.error(f"Failed to create build sandbox: {e}", AGENT_NAME)
+            return False, f"IOError: Failed to create build sandbox. Details: {e}"
+        try:
+            source_paths = []
+            quote_dirs = []
+            for relative_path, code in sources.items():
+                path = sandbox.file(relative_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(code)
+                source_paths.append(path)
+                # `#include "x.h"` is searched next to the original file, which the sandbox copy is not
+                quote_dir = os.path.join(absolute_project_dir, os.path.dirname(relative_path))
+                if quote_dir not in quote_dirs:
+                    quote_dirs.append(quote_dir)
+
+            compiler = "mpicc" if any("MPI_" in code.upper() for code in sources.values()) else "gcc"
+            cmd = [compiler] + (["-fopenmp"] if use_openmp else [])
+            for include_dir in include_dirs or []:
+                cmd.extend(["-I", include_dir])
+            for quote_dir in quote_dirs:
+                cmd.extend(["-iquote", quote_dir])
+            cmd += ["-O3"] + source_paths + (extra_flags or []) + ["-o", sandbox.file("temp_compiled_exe")]
+            Logger.info(f"Combined build of {len(sources)} translation unit(s) with {compiler}.", AGENT_NAME, LogColors.CHECKER)
+            Logger.debug(lambda: f"Combined build command: {' '.join(cmd)}", AGENT_NAME, LogColors.CHECKER)
+            with span("compile.project", "compile", compiler=compiler, units=len(sources)) as trace:
+                result = self._run_compiler(cmd, absolute_project_dir)
+                trace.set(ok=result.returncode == 0)
+            if result.returncode == 0:
+                Logger.success("Combined build succeeded.", AGENT_NAME)
+                return True, ""
+            return False, sandbox.scrub(result.stderr or result.stdout)
+        except subprocess.TimeoutExpired:
+            return False, f"Combined build timed out after 60 seconds in {absolute_project_dir}."
+        except FileNotFoundError:
+            return False, "Compiler not found. Please install gcc/mpicc or check your PATH."
+        except OSError as e:
+            return False, f"IOError: Failed to write the project sources to the sandbox. Details: {e}"
+        finally:
+            sandbox.cleanup()
+
+    def vectorization_report(self, code: str, use_openmp: bool, src_dir: str, project_dir: str = None, include_dirs: list = None,
+                             extra_flags: list = None):
+        """
+        Compiles the code (without linking) at the build's optimization level and captures GCC's vectorizer report.
+        Args:
+            code, use_openmp, src_dir, project_dir, include_dirs, extra_flags: Same as compile().
+        Returns:
+            tuple: (str or None, str) - the -fopt-info-vec-optimized/-missed lines (None on failure) and error messages.
+        """
+        absolute_project_dir = os.path.abspath(project_dir or src_dir)
+        try:
+            sandbox = BuildSandbox(os.path.abspath(src_dir))
+        except OSError as e:
+            return None, f"IOError: Failed to create build sandbox. Details: {e}"
+        source_path = sandbox.file("temp_generated_code.c")
+        compiler = "mpicc" if "MPI_" in code.upper() else "gcc"
+        cmd = [compiler, "-c", "-O3"] + (["-fopenmp"] if use_openmp else [])
+        for include_dir in include_dirs or []:
+            cmd.extend(["-I", include_dir])
+        cmd += sandbox.compile_flags() + [source_path] + (extra_flags or []) + \
+            ["-fopt-info-vec-optimized", "-fopt-info-vec-missed", "-o", sandbox.file("temp_generated_code.o")]
+        try:
+            with open(source_path, "w") as f:
+                f.write(code)
+            with span("compile.vectorization_report", "compile", compiler=compiler) as trace:
+                result = self._run_compiler(cmd, absolute_project_dir)
+                trace.set(ok=result.returncode == 0)
+            if result.returncode != 0:
+                return None, sandbox.scrub(result.stderr or result.stdout)
+            return sandbox.scrub(result.stderr), ""
+        except (OSError, subprocess.TimeoutExpired) as e:
+            return None, f"Vectorization report failed: {e}"
+        finally:
+            sandbox.cleanup()
+
+    @staticmethod
+    def release_executable(exe_path: str):
+        """Deletes an executable returned by build(keep_executable=True), together with its build sandbox."""
+        if exe_path:
+            release_path(exe_path)
+
+    def _run_compiler(self, cmd: list, cwd: str):
+        """Runs one compiler invocation under the process-wide compile limit."""
+        with compile_slot():
+            return subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                cwd=cwd,
+                timeout=60 # Timeout after 60 seconds
+            )
+
+    def _compile_failed(self, result, compiler: str, absolute_project_dir: str, sandbox, stage: str):
+        Logger.warning(f"{stage} failed. Return code: {result.returncode}", AGENT_NAME)
+        error_message = result.stderr if result.stderr else result.stdout # Some compilers output to stdout
+        error_message = sandbox.scrub(error_message)
+        Logger.error(f"Compiler errors from {compiler} (in {absolute_project_dir}):\n{error_message}", AGENT_NAME)
+        sandbox.cleanup()
+        return False, error_message, None
+
+    def time_executable(self, exe_path: str, run_args: list, env: dict, repetitions: int, timeout: float, cwd: str):
+        """
+        Runs an executable repeatedly and measures wall time.
+        Returns:
+            tuple: (list of elapsed seconds, stdout of the last run, error message or None)
+        """
+        times = []
+        stdout = ""
+        with span("benchmark.run", "runtime", threads=env.get("OMP_NUM_THREADS", "default"), repetitions=repetitions):
+            for _ in range(repetitions):
+                start = time.perf_counter()
                 try:
-                    os.remove(temp_c_filepath_abs)
-                except OSError:
-                    pass # Ignore cleanup error during an existing error
-            return False, f"Unexpected compilation error in {absolute_project_dir}: {e}"
\ No newline at end of file
+                    result = subprocess.run(
+                        [exe_path] + list(run_args),
+                        capture_output=True,
+                        text=True,
+                        cwd=cwd,
+                        env=env,
+                        timeout=timeout
+                    )
+                except subprocess.TimeoutExpired:
+                    return times, stdout, f"Execution timed out after {timeout} seconds."
+                elapsed = time.perf_counter() - start
+                if result.returncode != 0:
+                    stderr_tail = "\n".join(result.stderr.splitlines()[-20:])
+                    return times, result.stdout, f"Execution failed with return code {result.returncode}.\n{stderr_tail}"
+                times.append(elapsed)
+                stdout = result.stdout
+        return times, stdout, None
+
+    def measure_variants(self, codes: list, use_openmp: bool, src_dir: str, project_dir: str = None, include_dirs: list = None,
+                         extra_files: list = None, extra_flags: list = None, run_args: list = None, repetitions: int = None,
+                         timeout: float = None, reference: str = None, env: dict = None):
+        """
+        Builds code variants concurrently and times them one at a time, so the runs don't compete for cores.
+        Args:
+            codes (list): The variants.
+            use_openmp (bool): Whether to build with -fopenmp.
+            src_dir, project_dir, include_dirs, extra_files, extra_flags: Same as compile().
+            run_args (list): Command-line arguments for the timing runs.
+            repetitions (int): Runs per variant; the median is used.
+            timeout (float): Seconds before a single run is killed.
+            reference (str): Expected stdout; a variant printing anything else counts as failed. None accepts any output.
+            env (dict): Environment for the runs (default: this process's).
+        Returns:
+            list: (median seconds or None if it failed to build, run or match reference, stdout) per variant.
+        """
+        repetitions = repetitions or Config.BENCHMARK_REPETITIONS
+        timeout = timeout or Config.BENCHMARK_TIMEOUT
+        cwd = os.path.abspath(project_dir or src_dir)
+
+        def _build(variant_code):
+            success, _, exe = self.build(variant_code, use_openmp, src_dir, project_dir, include_dirs, extra_files, extra_flags,
+                                         keep_executable=True)
+            return exe if success else None
+
+        with ThreadPoolExecutor(max_workers=max(1, min(len(codes), Config.MAX_CONCURRENT_COMPILES))) as executor:
+            executables = list(executor.map(propagate(_build), codes))
+
+        results = []
+        try:
+            for exe in executables:
+                if exe is None:
+                    results.append((None, None))
+                    continue
+                times, stdout, error = self.time_executable(exe, run_args or [], env or dict(os.environ), repetitions, timeout, cwd)
+                if error or (reference is not None and stdout != reference):
+                    results.append((None, stdout))
+                else:
+                    results.append((statistics.median(times), stdout))
+        finally:
+            for exe in executables:
+                if exe:
+                    self.release_executable(exe)
+        return results
+
+    def benchmark(self, original_code: str, parallel_code: str, use_openmp: bool, src_dir: str, project_dir: str = None,
+                  include_dirs: list = None, extra_files: list = None, extra_flags: list = None, thread_counts: list = None,
+                  repetitions: int = None, timeout: float = None, run_args: list = None, parallel_exe: str = None):
+        """
+        Builds the original and the parallelized code and times both.
+        The serial baseline runs once per (code, settings) and is reused across attempts;
+        the parallel build runs once per OMP_NUM_THREADS value in thread_counts.
+        Args:
+            original_code (str): The serial C code.
+            parallel_code (str): The parallelized C code.
+            use_openmp (bool): Whether the parallel code uses OpenMP.
+            src_dir, project_dir, include_dirs, extra_files, extra_flags: Same as compile().
+            thread_counts (list): OMP_NUM_THREADS values to run the parallel build with.
+            repetitions (int): Runs per configuration; the median is reported.
+            timeout (float): Seconds before a single run is killed.
+            run_args (list): Command-line arguments passed to both executables.
+            parallel_exe (str): An already built executable of parallel_code (from build with keep_executable);
+                it is used instead of rebuilding and is deleted afterwards.
+        Returns:
+            dict: {"success", "skipped", "error", "serial_median", "runs", "best", "output_matches"},
+                  where each entry of "runs" is {"threads", "median", "speedup", "efficiency"}.
+        """
+        thread_counts = thread_counts or Config.BENCHMARK_THREADS
+        repetitions = repetitions or Config.BENCHMARK_REPETITIONS
+        timeout = timeout or Config.BENCHMARK_TIMEOUT
+        run_args = run_args or []
+        cwd = os.path.abspath(project_dir or src_dir)
+        report = {"success": False, "skipped": False, "error": None, "serial_median": None,
+                  "runs": [], "best": None, "output_matches": None}
+
+        try:
+            if not use_openmp:
+                report["skipped"] = True
+                report["error"] = "Checker.benchmark times OpenMP code; MPI code is run by MPIHarness."
+                Logger.info(report["error"], AGENT_NAME, LogColors.CHECKER)
+                return report
+
+            baseline, error = self.serial_baseline(original_code, src_dir, project_dir, include_dirs, extra_files,
+                                                   extra_flags, run_args, repetitions, timeout, cwd)
+            if error:
+                report["error"] = error
+                return report
+            report["serial_median"] = baseline["median"]
+            Logger.info(f"Serial median time: {baseline['median']:.4f}s", AGENT_NAME, LogColors.CHECKER)
+
+            if not parallel_exe:
+                success, errors, parallel_exe = self.build(parallel_code, use_openmp, src_dir, project_dir, include_dirs,
+                                                           extra_files, extra_flags, keep_executable=True)
+                if not success:
+                    report["error"] = errors
+                    return report
+
+            for threads in thread_counts:
+                env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+                times, parallel_stdout, error = self.time_executable(parallel_exe, run_args, env, repetitions, timeout, cwd)
+                if error:
+                    report["error"] = f"Parallel code with OMP_NUM_THREADS={threads}: {error}"
+                    return report
+                median = statistics.median(times)
+                speedup = baseline["median"] / median if median > 0 else 0.0
+                report["runs"].append({"threads": threads, "median": median, "speedup": speedup, "efficiency": speedup / threads})
+                report["output_matches"] = report["output_matches"] is not False and parallel_stdout == baseline["stdout"]
+                Logger.info(f"OMP_NUM_THREADS={threads}: median {median:.4f}s, speedup {speedup:.2f}x", AGENT_NAME, LogColors.CHECKER)
+        finally:
+            self.release_executable(parallel_exe)
+
+        report["best"] = max(report["runs"], key=lambda r: r["speedup"])
+        report["success"] = True
+        return report
+
+    def check_output(self, original_code: str, code: str, src_dir: str, project_dir: str = None, include_dirs: list = None,
+                     extra_files: list = None, extra_flags: list = None, run_args: list = None, timeout: float = None,
+                     threads: int = None):
+        """
+        Runs OpenMP code once and compares its output with the serial original's: the correctness check for code
+        that is not benchmarked.
+        Args:
+            original_code (str): The serial C code.
+            code (str): The OpenMP code.
+            src_dir, project_dir, include_dirs, extra_files, extra_flags: Same as compile().
+            run_args (list): Command-line arguments for both runs.
+            timeout (float): Seconds before a run is killed.
+            threads (int): OMP_NUM_THREADS for the run (default: the largest of Config.BENCHMARK_THREADS).
+        Returns:
+            tuple: (True if the outputs match, False if they differ or the code fails to build or run, None if the
+                   original itself cannot be run; problem or None)
+        """
+        run_args = run_args or []
+        timeout = timeout or Config.BENCHMARK_TIMEOUT
+        cwd = os.path.abspath(project_dir or src_dir)
+        baseline, error = self.serial_baseline(original_code, src_dir, project_dir, include_dirs, extra_files, extra_flags,
+                                               run_args, 1, timeout, cwd)
+        if error:
+            return None, error
+        success, errors, exe = self.build(code, True, src_dir, project_dir, include_dirs, extra_files, extra_flags,
+                                          keep_executable=True)
+        if not success:
+            return False, f"it failed to compile:\n{errors}"
+        try:
+            env = dict(os.environ, OMP_NUM_THREADS=str(threads or max(Config.BENCHMARK_THREADS)))
+            _, stdout, error = self.time_executable(exe, run_args, env, 1, timeout, cwd)
+        finally:
+            self.release_executable(exe)
+        if error:
+            return False, f"it failed at runtime: {error}"
+        if stdout != baseline["stdout"]:
+            return False, "its output differs from the serial version"
+        return True, None
+
+    def serial_baseline(self, original_code: str, src_dir: str, project_dir: str, include_dirs: list, extra_files: list,
+                        extra_flags: list, run_args: list, repetitions: int, timeout: float, cwd: str):
+        """
+        Builds and times the original code. Cached, since the original does not change between attempts.
+        Returns:
+            tuple: ({"median", "stdout"} or None, error message or None)
+        """
+        baseline_key = hashlib.sha256(repr((original_code, include_dirs, extra_files, extra_flags, run_args,
+                                            repetitions, cwd)).encode("utf-8")).hexdigest()
+        baseline = self._baseline_cache.get(baseline_key)
+        if baseline is not None:
+            return baseline, None
+
+        Logger.info("Building serial baseline for benchmarking.", AGENT_NAME, LogColors.CHECKER)
+        success, errors, serial_exe = self.build(original_code, False, src_dir, project_dir, include_dirs,
+                                                 extra_files, extra_flags, keep_executable=True)
+        if not success:
+            return None, f"Serial baseline failed to compile:\n{errors}"
+        try:
+            times, serial_stdout, error = self.time_executable(serial_exe, run_args, dict(os.environ),
+                                                                repetitions, timeout, cwd)
+        finally:
+            self.release_executable(serial_exe)
+        if error:
+            return None, f"Serial baseline failed to run: {error}"
+        baseline = {"median": statistics.median(times), "stdout": serial_stdout}
+        self._baseline_cache[baseline_key] = baseline
+        return baseline, None
+
+def format_benchmark_report(report: dict) -> str:
+    """Renders a benchmark report as a plain-text table (also used as refine feedback)."""
+    if report.get("error") and not report.get("runs"):
+        return report["error"]
+    lines = [f"Serial median time: {report['serial_median']:.4f}s"]
+    lines.append(f"{'Threads':>7}  {'Median (s)':>10}  {'Speedup':>7}  {'Efficiency':>10}")
+    for run in report["runs"]:
+        lines.append(f"{run['threads']:>7}  {run['median']:>10.4f}  {run['speedup']:>6.2f}x  {run['efficiency'] * 100:>9.1f}%")
+    if report.get("output_matches") is False:
+        lines.append("Note: program output differs from the serial version.")
+    if report.get("error"):
+        lines.append(report["error"])
+    return "\n".join(lines)
@@ -0,0 +1,83 @@
+from groq_client import send_prompt
+from agents.candidates import generate_candidates
+from agents.patch_refine import refine_with_patch
+from config import Config
+from loop_analysis import format_analysis_note
+from utils import Logger, LogColors
+
+AGENT_NAME = "HybridExpert"
+
+class HybridExpert:
+    """
+    Two-level parallelization: MPI ranks own contiguous blocks of the outer loop and data,
+    and OpenMP threads share the loops each rank runs on its block.
+    """
+
+    def __init__(self):
+        Logger.info("HybridExpert initialized.", AGENT_NAME, LogColors.HYBRID_EXPERT)
+        self.original_code_for_refinement = ""
+
+    def process(self, mcp_msg):
+        Logger.info("Processing code for hybrid MPI+OpenMP parallelization.", AGENT_NAME, LogColors.HYBRID_EXPERT)
+        code = mcp_msg["payload"]["code"]
+        self.original_code_for_refinement = code
+
+        prompt = Config.HYBRID_PROCESS_PROMPT_TEMPLATE.format(code=code)
+        hot_regions = mcp_msg["payload"].get("hot_regions")
+        if hot_regions:
+            # As with MPI, the decomposition spans the whole program, so the file is sent whole
+            summary = "; ".join(f"{r['name']} (lines {r['start_line']}-{r['end_line']}, {r['share'] * 100:.1f}% of runtime)" for r in hot_regions)
+            prompt += f"\nProfiling shows the runtime is concentrated in: {summary}. Distribute and thread these regions and leave cold code serial."
+        analysis_note = format_analysis_note(mcp_msg["payload"].get("analysis") or [])
+        if analysis_note:
+            prompt += f"\n{analysis_note}"
+        Logger.debug(lambda: f"Process prompt:\n{prompt}", AGENT_NAME, LogColors.HYBRID_EXPERT)
+
+        num_candidates = mcp_msg["metadata"].get("num_candidates", 1)
+        if num_candidates > 1:
+            candidates = generate_candidates(prompt, num_candidates, AGENT_NAME, LogColors.HYBRID_EXPERT)
+            new_code = candidates[0]
+            Logger.info(f"Received {len(candidates)} candidate hybrid versions from LLM.", AGENT_NAME, LogColors.HYBRID_EXPERT)
+        else:
+            new_code = send_prompt(prompt)
+            Logger.info("Received processed hybrid code from LLM.", AGENT_NAME, LogColors.HYBRID_EXPERT)
+            Logger.debug(lambda: f"New hybrid code (raw from LLM):\n---\n{new_code}\n---", AGENT_NAME, LogColors.HYBRID_EXPERT)
+            candidates = [new_code]
+
+        return {
+            "agent_id": AGENT_NAME,
+            "context_id": mcp_msg["context_id"],
+            "payload": {"code": new_code, "original_code": code, "candidates": candidates},
+            "metadata": mcp_msg["metadata"]
+        }
+
+    def refine(self, mcp_msg):
+        Logger.info("Refining hybrid code based on errors.", AGENT_NAME, LogColors.HYBRID_EXPERT)
+        attempted_code = mcp_msg["payload"]["code"]
+        errors = mcp_msg["payload"].get("errors", "No specific errors provided.")
+        original_code = mcp_msg["payload"].get("original_code", self.original_code_for_refinement)
+
+        if not original_code:
+            Logger.warning("Original code not available for hybrid refinement context.", AGENT_NAME)
+            original_code = attempted_code
+
+        if mcp_msg["metadata"].get("refine_mode", Config.REFINE_MODE) == "patch":
+            patched_code = refine_with_patch(Config.HYBRID_PATCH_REFINE_PROMPT_TEMPLATE, attempted_code, errors,
+                                             AGENT_NAME, LogColors.HYBRID_EXPERT)
+            if patched_code is not None:
+                mcp_msg["payload"]["code"] = patched_code
+                return mcp_msg
+
+        prompt = Config.HYBRID_REFINE_PROMPT_TEMPLATE.format(
+            original_code=original_code,
+            attempted_code=attempted_code,
+            errors=errors
+        )
+        Logger.debug(lambda: f"Refine prompt:\n{prompt}", AGENT_NAME, LogColors.HYBRID_EXPERT)
+
+        refined_code = send_prompt(prompt)
+        Logger.info("Received refined hybrid code from LLM.", AGENT_NAME, LogColors.HYBRID_EXPERT)
+        Logger.debug(lambda: f"Refined hybrid code (raw from LLM):\n---\n{refined_code}\n---", AGENT_NAME, LogColors.HYBRID_EXPERT)
+
+        mcp_msg["payload"]["code"] = refined_code
+        return mcp_msg
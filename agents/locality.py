@@ -0,0 +1,173 @@
+import re
+from agents.candidates import generate_candidates
+from config import Config
+from loop_analysis import analyze_program
+from tuning_db import TuningDatabase
+from utils import Logger, LogColors
+
+AGENT_NAME = "LocalityOptimizer"
+
+_TILE_DEFINE_RE = re.compile(r"^(\s*#\s*define\s+)(TILE\w*)(\s+)(\d+)\b", re.M)
+_AOS_ACCESS_RE = re.compile(r"\b\w+\s*\[[^\]\n]*\]\s*\.\s*[A-Za-z_]\w*") # pts[i].x
+
+def find_tile_macros(code: str) -> dict:
+    """Returns {macro name: size} for the TILE_* macros a proposal defines, in order of definition."""
+    return {match.group(2): int(match.group(4)) for match in _TILE_DEFINE_RE.finditer(code)}
+
+def set_tile_sizes(code: str, sizes: dict) -> str:
+    """Rewrites the values of the given TILE_* macros."""
+    def _replace(match):
+        if match.group(2) not in sizes:
+            return match.group(0)
+        return f"{match.group(1)}{match.group(2)}{match.group(3)}{sizes[match.group(2)]}"
+    return _TILE_DEFINE_RE.sub(_replace, code)
+
+def locality_targets(code: str, analysis=None) -> list:
+    """
+    The hot loop nests worth restructuring for locality: nests of two or more loops, or nests reading an array of
+    structs. Hot means at least LOCALITY_HOT_SHARE of the estimated work, or trip counts the analysis cannot know.
+    Returns:
+        list: One description line per nest, for the prompt.
+    """
+    analysis = analysis or analyze_program(code)
+    total_work = sum(nest.work for nest in analysis.nests) or 1.0
+    lines = code.split("\n")
+    targets = []
+    for nest in analysis.nests:
+        if nest.trip_counts_known and nest.work / total_work < Config.LOCALITY_HOT_SHARE:
+            continue
+        depth = 1 + max(loop.depth - nest.root.depth for loop in nest.loops())
+        array_of_structs = bool(_AOS_ACCESS_RE.search("\n".join(lines[nest.start_line - 1:nest.end_line])))
+        if depth < 2 and not array_of_structs:
+            continue
+        description = f"- lines {nest.start_line}-{nest.end_line} (function {nest.function}): {depth}-deep loop nest"
+        if array_of_structs:
+            description += ", reads fields of an array of structs"
+        targets.append(description)
+    return targets
+
+class LocalityOptimizer:
+    """
+    Makes the serial code cache-friendly before an expert parallelizes it. The LLM proposes loop interchange, tiling
+    (with tile sizes as TILE_* macros) and array-of-structs to struct-of-arrays rewrites; tile sizes are then tuned by
+    compiling and timing. A proposal is kept only if it prints the same output and is measurably faster than the
+    best version so far. Results are stored in the tuning database, keyed by source and machine.
+    """
+
+    def __init__(self, checker, database: TuningDatabase = None):
+        self.checker = checker
+        self.database = database or TuningDatabase()
+        Logger.info("LocalityOptimizer initialized.", AGENT_NAME, LogColors.LOCALITY)
+
+    def optimize(self, code: str, src_dir: str, project_dir: str = None, include_dirs: list = None, extra_files: list = None,
+                 extra_flags: list = None, run_args: list = None, repetitions: int = None, timeout: float = None, analysis=None):
+        """
+        Args:
+            code (str): The serial code.
+            src_dir, project_dir, include_dirs, extra_files, extra_flags: Same as Checker.compile().
+            run_args (list): Arguments for the timing runs.
+            repetitions (int): Timing runs per variant; the median is used.
+            timeout (float): Seconds before a run is killed.
+            analysis (ProgramAnalysis): Precomputed analysis of code; computed here if omitted.
+        Returns:
+            tuple: (code, report dict with "cached", "targets", "baseline_time", "best_time", "tile_sizes", "variants",
+                   "rounds", "kept")
+        """
+        run_args = run_args or []
+        report = {"cached": False, "targets": 0, "baseline_time": None, "best_time": None, "tile_sizes": None,
+                  "variants": 0, "rounds": 0, "kept": 0}
+        targets = locality_targets(code, analysis)
+        report["targets"] = len(targets)
+        if not targets:
+            Logger.info("No hot multi-level or array-of-structs loop nests; nothing to restructure.", AGENT_NAME, LogColors.LOCALITY)
+            return code, report
+
+        key = self.database.make_key(code, {"locality": True, "include_dirs": include_dirs, "extra_files": extra_files,
+                                            "extra_flags": extra_flags, "run_args": run_args})
+        stored = self.database.get(key)
+        if stored and "code" in stored:
+            Logger.info("Reusing the locality result from the tuning database.", AGENT_NAME, LogColors.LOCALITY)
+            report.update({k: stored[k] for k in report if k in stored}, cached=True)
+            return stored["code"] or code, report
+
+        def measure(codes, reference):
+            return self.checker.measure_variants(codes, False, src_dir, project_dir, include_dirs, extra_files, extra_flags,
+                                                 run_args, repetitions or Config.LOCALITY_REPETITIONS, timeout, reference)
+
+        (baseline_time, reference), = measure([code], None)
+        if baseline_time is None:
+            Logger.warning("The serial code could not be timed; skipping locality optimization.", AGENT_NAME)
+            return code, report
+        report["baseline_time"] = best_time = baseline_time
+        best_code = code
+        Logger.info(f"Serial time: {baseline_time:.4f}s. Asking for locality transformations of {len(targets)} nest(s).",
+                    AGENT_NAME, LogColors.LOCALITY)
+
+        feedback = ""
+        for round_index in range(Config.LOCALITY_MAX_ROUNDS):
+            report["rounds"] = round_index + 1
+            prompt = Config.LOCALITY_PROMPT_TEMPLATE.format(code=best_code, hot_loops="\n".join(targets), feedback=feedback)
+            proposals = [p for p in generate_candidates(prompt, Config.LOCALITY_CANDIDATES, AGENT_NAME, LogColors.LOCALITY)
+                         if p.strip() and not p.startswith("// LLM") and p.strip() != best_code.strip()]
+            if not proposals:
+                Logger.info("No transformation proposed.", AGENT_NAME, LogColors.LOCALITY)
+                break
+
+            measured = measure(proposals, reference)
+            report["variants"] += len(proposals)
+            round_best = None
+            for proposal, (elapsed, _) in zip(proposals, measured):
+                if elapsed is None:
+                    continue
+                proposal, elapsed = self._tune_tiles(proposal, elapsed, measure, reference, report)
+                if round_best is None or elapsed < round_best[1]:
+                    round_best = (proposal, elapsed)
+
+            if round_best is None:
+                feedback = ("A previous proposal failed to compile, crashed, or changed the program's output. "
+                            "Keep the results bit-for-bit identical.\n")
+            elif round_best[1] >= best_time * (1 - Config.LOCALITY_MIN_GAIN):
+                feedback = (f"A previous proposal was not faster ({round_best[1]:.4f}s vs {best_time:.4f}s); "
+                            "try a different transformation.\n")
+            else:
+                Logger.success(f"Kept locality variant: {best_time:.4f}s -> {round_best[1]:.4f}s.", AGENT_NAME)
+                best_code, best_time = round_best
+                report["kept"] += 1
+                feedback = ""
+                continue
+            Logger.info(f"Round {round_index + 1}: no proposal beat {best_time:.4f}s.", AGENT_NAME, LogColors.LOCALITY)
+
+        report.update(best_time=best_time, tile_sizes=find_tile_macros(best_code) if report["kept"] else None)
+        self.database.put(key, dict(report, code=best_code if report["kept"] else None))
+        return best_code, report
+
+    def _tune_tiles(self, code: str, elapsed: float, measure, reference: str, report: dict):
+        """
+        Coordinate descent over the proposal's TILE_* macros: each macro in turn is swept over LOCALITY_TILE_SIZES
+        with the others fixed, keeping a size only if it is at least LOCALITY_MIN_GAIN faster.
+        Returns:
+            tuple: (code with the best sizes, its time)
+        """
+        sizes = find_tile_macros(code)
+        for name in list(sizes):
+            options = [dict(sizes, **{name: size}) for size in Config.LOCALITY_TILE_SIZES if size != sizes[name]]
+            if not options:
+                continue
+            measured = measure([set_tile_sizes(code, option) for option in options], reference)
+            report["variants"] += len(options)
+            for option, (option_time, _) in zip(options, measured):
+                if option_time is not None and option_time < elapsed * (1 - Config.LOCALITY_MIN_GAIN):
+                    sizes, elapsed = option, option_time
+            Logger.info(f"{name}={sizes[name]}: {elapsed:.4f}s.", AGENT_NAME, LogColors.LOCALITY)
+        return set_tile_sizes(code, sizes), elapsed
+
+def format_locality_report(report: dict) -> str:
+    """Summarizes a locality report for the log."""
+    if not report["kept"]:
+        if not report["targets"]:
+            return "Locality optimization: no hot loop nest to restructure."
+        return "Locality optimization made no changes."
+    source = "tuning database" if report["cached"] else f"{report['variants']} variant(s) in {report['rounds']} round(s)"
+    tiles = f", tiles {report['tile_sizes']}" if report.get("tile_sizes") else ""
+    return (f"Locality optimization from {source}: serial {report['baseline_time']:.4f}s -> {report['best_time']:.4f}s "
+            f"({report['baseline_time'] / report['best_time']:.2f}x){tiles}.")
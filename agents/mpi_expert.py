@@ -1,5 +1,8 @@
 from groq_client import send_prompt
+from agents.candidates import generate_candidates
+from agents.patch_refine import refine_with_patch
 from config import Config
+from loop_analysis import format_analysis_note
 from utils import Logger, LogColors # Import Logger
 
 AGENT_NAME = "MPIExpert"
@@ -15,16 +18,31 @@ class MPIExpert:
         self.original_code_for_refinement = code
 
         prompt = Config.MPI_PROCESS_PROMPT_TEMPLATE.format(code=code)
-        Logger.debug(f"Process prompt:\n{prompt}", AGENT_NAME, LogColors.MPI_EXPERT)
+        hot_regions = mcp_msg["payload"].get("hot_regions")
+        if hot_regions:
+            # MPI decomposition spans the whole program, so the file is still sent whole; point the model at the hot spots
+            summary = "; ".join(f"{r['name']} (lines {r['start_line']}-{r['end_line']}, {r['share'] * 100:.1f}% of runtime)" for r in hot_regions)
+            prompt += f"\nProfiling shows the runtime is concentrated in: {summary}. Distribute the work of these regions and leave cold code serial."
+        analysis_note = format_analysis_note(mcp_msg["payload"].get("analysis") or [])
+        if analysis_note:
+            prompt += f"\n{analysis_note}"
+        Logger.debug(lambda: f"Process prompt:\n{prompt}", AGENT_NAME, LogColors.MPI_EXPERT)
 
-        new_code = send_prompt(prompt)
-        Logger.info("Received processed MPI code from LLM.", AGENT_NAME, LogColors.MPI_EXPERT)
-        Logger.debug(f"New MPI code (raw from LLM):\n---\n{new_code}\n---", AGENT_NAME, LogColors.MPI_EXPERT)
+        num_candidates = mcp_msg["metadata"].get("num_candidates", 1)
+        if num_candidates > 1:
+            candidates = generate_candidates(prompt, num_candidates, AGENT_NAME, LogColors.MPI_EXPERT)
+            new_code = candidates[0]
+            Logger.info(f"Received {len(candidates)} candidate MPI versions from LLM.", AGENT_NAME, LogColors.MPI_EXPERT)
+        else:
+            new_code = send_prompt(prompt)
+            Logger.info("Received processed MPI code from LLM.", AGENT_NAME, LogColors.MPI_EXPERT)
+            Logger.debug(lambda: f"New MPI code (raw from LLM):\n---\n{new_code}\n---", AGENT_NAME, LogColors.MPI_EXPERT)
+            candidates = [new_code]
 
         return {
             "agent_id": AGENT_NAME,
             "context_id": mcp_msg["context_id"],
-            "payload": {"code": new_code, "original_code": code}, 
+            "payload": {"code": new_code, "original_code": code, "candidates": candidates}, 
             "metadata": mcp_msg["metadata"]
         }
 
@@ -38,16 +56,23 @@ class MPIExpert:
             Logger.warning("Original code not available for MPI refinement context.", AGENT_NAME)
             original_code = attempted_code
 
+        if mcp_msg["metadata"].get("refine_mode", Config.REFINE_MODE) == "patch":
+            patched_code = refine_with_patch(Config.MPI_PATCH_REFINE_PROMPT_TEMPLATE, attempted_code, errors,
+                                             AGENT_NAME, LogColors.MPI_EXPERT)
+            if patched_code is not None:
+                mcp_msg["payload"]["code"] = patched_code
+                return mcp_msg
+
         prompt = Config.MPI_REFINE_PROMPT_TEMPLATE.format(
             original_code=original_code,
             attempted_code=attempted_code,
             errors=errors
         )
-        Logger.debug(f"Refine prompt:\n{prompt}", AGENT_NAME, LogColors.MPI_EXPERT)
+        Logger.debug(lambda: f"Refine prompt:\n{prompt}", AGENT_NAME, LogColors.MPI_EXPERT)
 
         refined_code = send_prompt(prompt)
         Logger.info("Received refined MPI code from LLM.", AGENT_NAME, LogColors.MPI_EXPERT)
-        Logger.debug(f"Refined MPI code (raw from LLM):\n---\n{refined_code}\n---", AGENT_NAME, LogColors.MPI_EXPERT)
+        Logger.debug(lambda: f"Refined MPI code (raw from LLM):\n---\n{refined_code}\n---", AGENT_NAME, LogColors.MPI_EXPERT)
         
         mcp_msg["payload"]["code"] = refined_code
         return mcp_msg
\ No newline at end of file
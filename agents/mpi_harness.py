@@ -0,0 +1,250 @@
+import csv
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import time
+from config import Config
+from tracing import span
+from utils import Logger, LogColors
+
+AGENT_NAME = "MPIHarness"
+
+class MPIHarness:
+    """
+    Runs MPI builds locally with `mpirun -np N` for a list of rank counts and measures strong scaling
+    (fixed input) and, given a size-parameterized input, weak scaling (input grows with the ranks).
+    Hybrid MPI+OpenMP builds are run for every (ranks x OMP_NUM_THREADS) layout.
+    Layouts needing more cores than the machine has are oversubscribed; runs past the timeout are treated
+    as deadlocks and their whole process group is killed.
+    """
+
+    def __init__(self, checker):
+        self.checker = checker
+        self._open_mpi = None
+        Logger.info("MPIHarness initialized.", AGENT_NAME, LogColors.CHECKER)
+
+    def is_available(self) -> bool:
+        return shutil.which(Config.MPI_LAUNCHER) is not None
+
+    def _is_open_mpi(self) -> bool:
+        if self._open_mpi is None:
+            try:
+                version = subprocess.run([Config.MPI_LAUNCHER, "--version"], capture_output=True, text=True, timeout=30)
+                self._open_mpi = "Open MPI" in version.stdout + version.stderr
+            except (OSError, subprocess.TimeoutExpired):
+                self._open_mpi = False
+        return self._open_mpi
+
+    def launch_command(self, ranks: int, threads: int = None) -> list:
+        """The launcher command line for `ranks` processes, with Open MPI's opt-ins where they are needed."""
+        cmd = [Config.MPI_LAUNCHER, "-np", str(ranks)]
+        if self._is_open_mpi():
+            if ranks > (os.cpu_count() or 1):
+                cmd.append("--oversubscribe") # MPICH oversubscribes without asking
+            if threads:
+                # Open MPI binds each rank to one core by default, which would stack a rank's threads on it
+                cmd += ["--bind-to", "none"]
+            if hasattr(os, "geteuid") and os.geteuid() == 0:
+                cmd.append("--allow-run-as-root")
+        return cmd + list(Config.MPI_LAUNCHER_ARGS)
+
+    def run(self, original_code: str, parallel_code: str, src_dir: str, project_dir: str = None, include_dirs: list = None,
+            extra_files: list = None, extra_flags: list = None, rank_counts: list = None, repetitions: int = None,
+            timeout: float = None, run_args: list = None, weak_args: str = None, weak_base: int = None,
+            parallel_exe: str = None, thread_counts: list = None):
+        """
+        Times the serial original and the MPI build across rank counts (and thread counts, for hybrid code).
+        Args:
+            original_code (str): The serial C code.
+            parallel_code (str): The MPI C code.
+            src_dir, project_dir, include_dirs, extra_files, extra_flags: Same as Checker.compile().
+            rank_counts (list): Values of -np to run with.
+            repetitions (int): Runs per rank count; the median is reported.
+            timeout (float): Seconds before a run is considered deadlocked and killed.
+            run_args (list): Arguments for the strong-scaling runs (and the serial baseline).
+            weak_args (str): Argument string for weak-scaling runs, with {ranks} and {n} placeholders,
+                where n = weak_base * ranks; weak scaling is skipped when None.
+            weak_base (int): Problem size per rank for weak scaling.
+            parallel_exe (str): An already built executable of parallel_code; deleted afterwards.
+            thread_counts (list): OMP_NUM_THREADS values for hybrid code; None for pure MPI.
+                Weak scaling uses the thread count of the best strong-scaling layout.
+        Returns:
+            dict: {"success", "skipped", "error", "deadlock", "serial_median", "strong", "weak", "best",
+                   "output_matches", "scales", "oversubscribed"}. Each "strong" entry is
+                  {"ranks", "threads", "median", "speedup", "efficiency"} (threads is None for pure MPI);
+                  each "weak" entry is {"ranks", "threads", "n", "median", "efficiency"}.
+        """
+        rank_counts = sorted(set(rank_counts or Config.MPI_RANKS))
+        repetitions = repetitions or Config.BENCHMARK_REPETITIONS
+        timeout = timeout or Config.BENCHMARK_TIMEOUT
+        thread_counts = sorted(set(thread_counts)) if thread_counts else [None]
+        run_args = run_args or []
+        cwd = os.path.abspath(project_dir or src_dir)
+        cores = os.cpu_count() or 1
+        report = {"success": False, "skipped": False, "error": None, "deadlock": False, "serial_median": None,
+                  "strong": [], "weak": [], "best": None, "output_matches": None, "scales": None,
+                  "oversubscribed": max(rank_counts) * (max(thread_counts) or 1) > cores}
+
+        try:
+            if not self.is_available():
+                report["skipped"] = True
+                report["error"] = f"'{Config.MPI_LAUNCHER}' was not found; MPI code is only compile-checked."
+                Logger.warning(report["error"], AGENT_NAME)
+                return report
+
+            baseline, error = self.checker.serial_baseline(original_code, src_dir, project_dir, include_dirs, extra_files,
+                                                           extra_flags, run_args, repetitions, timeout, cwd)
+            if error:
+                report["error"] = error
+                return report
+            report["serial_median"] = baseline["median"]
+
+            if not parallel_exe:
+                success, errors, parallel_exe = self.checker.build(parallel_code, False, src_dir, project_dir, include_dirs,
+                                                                   extra_files, extra_flags, keep_executable=True)
+                if not success:
+                    report["error"] = errors
+                    return report
+
+            for ranks in rank_counts:
+                for threads in thread_counts:
+                    layout = f"{ranks} rank(s)" + (f" x {threads} thread(s)" if threads else "")
+                    times, stdout, error = self.time_ranks(parallel_exe, ranks, run_args, repetitions, timeout, cwd, threads)
+                    if error:
+                        report["deadlock"] = "timed out" in error
+                        report["error"] = f"{layout}: {error}"
+                        return report
+                    median = statistics.median(times)
+                    speedup = baseline["median"] / median if median > 0 else 0.0
+                    report["strong"].append({"ranks": ranks, "threads": threads, "median": median, "speedup": speedup,
+                                             "efficiency": speedup / (ranks * (threads or 1))})
+                    report["output_matches"] = report["output_matches"] is not False and stdout == baseline["stdout"]
+                    Logger.info(f"{layout}: median {median:.4f}s, speedup {speedup:.2f}x", AGENT_NAME, LogColors.CHECKER)
+
+            if weak_args:
+                weak_base = weak_base or 1
+                threads = max(report["strong"], key=lambda r: r["speedup"])["threads"]
+                for ranks in rank_counts:
+                    n = weak_base * ranks
+                    args = weak_args.format(ranks=ranks, n=n).split()
+                    times, _, error = self.time_ranks(parallel_exe, ranks, args, repetitions, timeout, cwd, threads)
+                    if error:
+                        report["deadlock"] = "timed out" in error
+                        report["error"] = f"Weak scaling, {ranks} rank(s) with n={n}: {error}"
+                        return report
+                    report["weak"].append({"ranks": ranks, "threads": threads, "n": n, "median": statistics.median(times)})
+                reference = report["weak"][0]["median"]
+                for entry in report["weak"]:
+                    # Ideal weak scaling keeps the time constant as ranks and problem size grow together
+                    entry["efficiency"] = reference / entry["median"] if entry["median"] > 0 else 0.0
+        finally:
+            self.checker.release_executable(parallel_exe)
+
+        report["best"] = max(report["strong"], key=lambda r: r["speedup"])
+        # More workers must actually help: the largest layout has to beat the smallest. Oversubscribed
+        # layouts share cores and cannot be expected to get faster, so they are left out of this judgement.
+        fitting = {}
+        for run in report["strong"]:
+            workers = run["ranks"] * (run["threads"] or 1)
+            if workers <= cores:
+                fitting[workers] = min(fitting.get(workers, run["median"]), run["median"])
+        report["scales"] = len(fitting) < 2 or fitting[max(fitting)] < fitting[min(fitting)]
+        report["success"] = True
+        return report
+
+    def time_ranks(self, exe_path: str, ranks: int, run_args: list, repetitions: int, timeout: float, cwd: str,
+                    threads: int = None):
+        """
+        Runs the executable under the launcher `repetitions` times, with OMP_NUM_THREADS=threads if given.
+        Returns:
+            tuple: (list of elapsed seconds, stdout of the last run, error message or None)
+        """
+        times = []
+        stdout = ""
+        cmd = self.launch_command(ranks, threads) + [exe_path] + list(run_args)
+        env = dict(os.environ, OMP_NUM_THREADS=str(threads)) if threads else None
+        with span("benchmark.mpi_run", "runtime", ranks=ranks, threads=threads, repetitions=repetitions):
+            for _ in range(repetitions):
+                start = time.perf_counter()
+                # A new session lets a deadlock be cleaned up with every rank, not just the launcher
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=cwd,
+                                           env=env, start_new_session=True)
+                try:
+                    out, err = process.communicate(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    self._kill(process)
+                    return times, stdout, f"Execution timed out after {timeout} seconds (possible deadlock)."
+                elapsed = time.perf_counter() - start
+                if process.returncode != 0:
+                    stderr_tail = "\n".join(err.splitlines()[-20:])
+                    return times, out, f"Execution failed with return code {process.returncode}.\n{stderr_tail}"
+                times.append(elapsed)
+                stdout = out
+        return times, stdout, None
+
+    def _kill(self, process):
+        """
+        Stops a hung launch. SIGTERM first, since the launcher forwards it to ranks that it may have put in
+        their own process groups; SIGKILL for whatever is left.
+        """
+        for sig, grace in ((signal.SIGTERM, 5), (signal.SIGKILL, None)):
+            try:
+                os.killpg(process.pid, sig)
+            except OSError:
+                pass
+            try:
+                process.communicate(timeout=grace)
+                return
+            except subprocess.TimeoutExpired:
+                continue
+
+def format_scaling_report(report: dict) -> str:
+    """Renders strong- and weak-scaling results as plain-text tables (also used as refine feedback)."""
+    if report.get("error") and not report.get("strong"):
+        return report["error"]
+    hybrid = any(run.get("threads") for run in report["strong"])
+    def _layout(run):
+        return f"{run['ranks']:>5}  {run['threads']:>7}" if hybrid else f"{run['ranks']:>5}"
+    layout_header = f"{'Ranks':>5}  {'Threads':>7}" if hybrid else f"{'Ranks':>5}"
+    lines = [f"Serial median time: {report['serial_median']:.4f}s", "Strong scaling (fixed input):",
+             f"{layout_header}  {'Median (s)':>10}  {'Speedup':>7}  {'Efficiency':>10}"]
+    for run in report["strong"]:
+        lines.append(f"{_layout(run)}  {run['median']:>10.4f}  {run['speedup']:>6.2f}x  {run['efficiency'] * 100:>9.1f}%")
+    if report.get("weak"):
+        lines += ["Weak scaling (input grows with the ranks):", f"{layout_header}  {'n':>10}  {'Median (s)':>10}  {'Efficiency':>10}"]
+        for run in report["weak"]:
+            lines.append(f"{_layout(run)}  {run['n']:>10}  {run['median']:>10.4f}  {run['efficiency'] * 100:>9.1f}%")
+    if report.get("oversubscribed"):
+        lines.append(f"Note: layouts needing more than {os.cpu_count()} cores were oversubscribed.")
+    if report.get("output_matches") is False:
+        lines.append("Note: program output differs from the serial version.")
+    if report.get("scales") is False:
+        lines.append("Note: the run time does not decrease as more ranks/threads are used.")
+    if report.get("error"):
+        lines.append(report["error"])
+    return "\n".join(lines)
+
+def write_scaling_csv(report: dict, prefix: str) -> list:
+    """Writes <prefix>_strong.csv (and <prefix>_weak.csv when measured). Returns the paths written."""
+    paths = []
+    if report.get("strong"):
+        path = f"{prefix}_strong.csv"
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ranks", "threads", "time_s", "speedup", "efficiency"])
+            writer.writerow([0, "", f"{report['serial_median']:.6f}", "1.000", ""]) # Serial baseline as rank 0
+            for run in report["strong"]:
+                writer.writerow([run["ranks"], run.get("threads") or "", f"{run['median']:.6f}", f"{run['speedup']:.3f}",
+                                 f"{run['efficiency']:.3f}"])
+        paths.append(path)
+    if report.get("weak"):
+        path = f"{prefix}_weak.csv"
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ranks", "threads", "n", "time_s", "efficiency"])
+            for run in report["weak"]:
+                writer.writerow([run["ranks"], run.get("threads") or "", run["n"], f"{run['median']:.6f}", f"{run['efficiency']:.3f}"])
+        paths.append(path)
+    return paths
@@ -1,5 +1,14 @@
-from groq_client import send_prompt
+import re
+from concurrent.futures import ThreadPoolExecutor
+from groq_client import send_prompt, estimate_tokens
+from agents.candidates import generate_candidates
+from agents.patch_refine import refine_with_patch
+from agents.profiler import format_hot_region_note
+from c_regions import (find_functions, find_loop_nests, build_context, extract_function, missing_includes,
+                       add_includes, splice, region_containing_line)
 from config import Config
+from loop_analysis import format_analysis_note
+from tracing import propagate
 from utils import Logger, LogColors # Import Logger
 
 AGENT_NAME = "OMPExpert"
@@ -14,19 +23,41 @@ class OMPSExpert:
         Logger.info("Processing code for OpenMP parallelization.", AGENT_NAME, LogColors.OMP_EXPERT)
         code = mcp_msg["payload"]["code"]
         self.original_code_for_refinement = code
+        num_candidates = mcp_msg["metadata"].get("num_candidates", 1)
+        hot_regions = mcp_msg["payload"].get("hot_regions")
+        analysis = mcp_msg["payload"].get("analysis") or []
 
-        prompt = Config.OMP_PROCESS_PROMPT_TEMPLATE.format(code=code)
-        Logger.debug(f"Process prompt:\n{prompt}", AGENT_NAME, LogColors.OMP_EXPERT)
+        if hot_regions or estimate_tokens(code) > Config.CHUNK_THRESHOLD_TOKENS:
+            candidates = self._process_regions(code, num_candidates, hot_regions, analysis)
+            if candidates:
+                return {
+                    "agent_id": AGENT_NAME,
+                    "context_id": mcp_msg["context_id"],
+                    "payload": {"code": candidates[0], "original_code": code, "candidates": candidates},
+                    "metadata": mcp_msg["metadata"]
+                }
+            Logger.info("No loop regions found; sending the whole file instead.", AGENT_NAME, LogColors.OMP_EXPERT)
 
-        new_code = send_prompt(prompt)
-        Logger.info("Received processed code from LLM.", AGENT_NAME, LogColors.OMP_EXPERT)
-        Logger.debug(f"New OpenMP code (raw from LLM):\n---\n{new_code}\n---", AGENT_NAME, LogColors.OMP_EXPERT)
+        prompt = Config.OMP_PROCESS_PROMPT_TEMPLATE.format(code=code)
+        analysis_note = format_analysis_note(analysis)
+        if analysis_note:
+            prompt = f"{prompt}\n{analysis_note}"
+        Logger.debug(lambda: f"Process prompt:\n{prompt}", AGENT_NAME, LogColors.OMP_EXPERT)
 
+        if num_candidates > 1:
+            candidates = generate_candidates(prompt, num_candidates, AGENT_NAME, LogColors.OMP_EXPERT)
+            new_code = candidates[0]
+            Logger.info(f"Received {len(candidates)} candidate OpenMP versions from LLM.", AGENT_NAME, LogColors.OMP_EXPERT)
+        else:
+            new_code = send_prompt(prompt)
+            Logger.info("Received processed code from LLM.", AGENT_NAME, LogColors.OMP_EXPERT)
+            Logger.debug(lambda: f"New OpenMP code (raw from LLM):\n---\n{new_code}\n---", AGENT_NAME, LogColors.OMP_EXPERT)
+            candidates = [new_code]
 
         return {
             "agent_id": AGENT_NAME,
             "context_id": mcp_msg["context_id"],
-            "payload": {"code": new_code, "original_code": code}, # Include original_code
+            "payload": {"code": new_code, "original_code": code, "candidates": candidates}, # Include original_code
             "metadata": mcp_msg["metadata"]
         }
 
@@ -40,18 +71,199 @@ class OMPSExpert:
             Logger.warning("Original code not available for refinement context. Refinement might be less effective.", AGENT_NAME)
             original_code = attempted_code 
 
+        # Patch mode first: the cheapest round trip, and the only one that never re-emits the file
+        if mcp_msg["metadata"].get("refine_mode", Config.REFINE_MODE) == "patch":
+            patched_code = refine_with_patch(Config.OMP_PATCH_REFINE_PROMPT_TEMPLATE, attempted_code, errors,
+                                             AGENT_NAME, LogColors.OMP_EXPERT)
+            if patched_code is not None:
+                mcp_msg["payload"]["code"] = patched_code
+                return mcp_msg
+
+        if estimate_tokens(attempted_code) > Config.CHUNK_THRESHOLD_TOKENS:
+            refined_code = self._refine_regions(original_code, attempted_code, errors)
+            if refined_code is not None:
+                mcp_msg["payload"]["code"] = refined_code
+                return mcp_msg
+            Logger.info("Errors could not be mapped to individual functions; refining the whole file.", AGENT_NAME, LogColors.OMP_EXPERT)
+
         prompt = Config.OMP_REFINE_PROMPT_TEMPLATE.format(
             original_code=original_code,
             attempted_code=attempted_code,
             errors=errors
         )
-        Logger.debug(f"Refine prompt:\n{prompt}", AGENT_NAME, LogColors.OMP_EXPERT)
+        Logger.debug(lambda: f"Refine prompt:\n{prompt}", AGENT_NAME, LogColors.OMP_EXPERT)
 
         refined_code = send_prompt(prompt)
         Logger.info("Received refined OpenMP code from LLM.", AGENT_NAME, LogColors.OMP_EXPERT)
-        Logger.debug(f"Refined OpenMP code (raw from LLM):\n---\n{refined_code}\n---", AGENT_NAME, LogColors.OMP_EXPERT)
+        Logger.debug(lambda: f"Refined OpenMP code (raw from LLM):\n---\n{refined_code}\n---", AGENT_NAME, LogColors.OMP_EXPERT)
 
         # Update the message payload for the next step (compilation or further refinement)
         mcp_msg["payload"]["code"] = refined_code
         
-        return mcp_msg
\ No newline at end of file
+        return mcp_msg
+
+    def _select_regions(self, code: str, hot_regions: list = None, analysis: list = None) -> list:
+        """
+        Picks the regions worth sending to the LLM. With profiling data these are exactly the hot regions;
+        otherwise every function containing a loop, or, for functions that are themselves too large,
+        their outermost loop nests. Without profiling data, regions whose loop nests the static analysis
+        rated not worth parallelizing are skipped.
+        Returns:
+            list: (region, enclosing function or None, prompt note) tuples.
+        """
+        analysis = analysis or []
+        functions = find_functions(code)
+        selected = []
+
+        def _note(region, hot_note: str = "") -> str:
+            return "\n".join(n for n in (hot_note, format_analysis_note(analysis, region.start_line, region.end_line)) if n)
+
+        def _worth_sending(region) -> bool:
+            verdicts = [n["verdict"] for n in analysis if region.start_line <= n["start_line"] and n["end_line"] <= region.end_line]
+            return not verdicts or any(v != "none" for v in verdicts)
+
+        if hot_regions:
+            by_name = {f.name: f for f in functions}
+            for hot in hot_regions:
+                function = by_name.get(hot["function"])
+                if function is None:
+                    continue
+                note = format_hot_region_note(hot)
+                if hot["kind"] == "function" and estimate_tokens(function.text) <= Config.CHUNK_THRESHOLD_TOKENS:
+                    selected.append((function, None, _note(function, note)))
+                    continue
+                nests = find_loop_nests(code, function)
+                if hot["kind"] == "loop":
+                    nests = [n for n in nests if n.start_line == hot["start_line"]]
+                selected.extend((nest, function, _note(nest, note)) for nest in nests)
+            return selected
+
+        for function in functions:
+            if not function.has_loop() or not _worth_sending(function):
+                continue
+            if estimate_tokens(function.text) > Config.CHUNK_THRESHOLD_TOKENS:
+                selected.extend((nest, function, _note(nest)) for nest in find_loop_nests(code, function) if _worth_sending(nest))
+            else:
+                selected.append((function, None, _note(function)))
+        return selected
+
+    def _process_regions(self, code: str, num_candidates: int, hot_regions: list = None, analysis: list = None) -> list:
+        """
+        Parallelizes a file one region at a time, processing independent regions concurrently,
+        and splices the results back into the original file.
+        Returns:
+            list: Candidate versions of the full file (empty if no regions were selected).
+        """
+        selected = self._select_regions(code, hot_regions, analysis)
+        if not selected:
+            return []
+        context = build_context(code)
+        reason = "Profiling selected" if hot_regions else "File is large; parallelizing"
+        Logger.info(f"{reason} {len(selected)} region(s) separately: {[r.name for r, _, _ in selected]}", AGENT_NAME, LogColors.OMP_EXPERT)
+
+        def _one(item):
+            region, enclosing, note = item
+            is_function = enclosing is None
+            prompt = Config.OMP_REGION_PROMPT_TEMPLATE.format(
+                region_kind="function" if is_function else "loop nest",
+                region_kind_title="Function" if is_function else "Loop nest",
+                # A loop nest is shown with its enclosing function so local declarations are visible
+                context=context if is_function else f"{context}\n\n// Enclosing function:\n{enclosing.text}",
+                code=region.text
+            )
+            if note:
+                prompt = f"{prompt}\n{note}"
+            if num_candidates > 1:
+                return generate_candidates(prompt, num_candidates, AGENT_NAME, LogColors.OMP_EXPERT)
+            return [send_prompt(prompt)]
+
+        with ThreadPoolExecutor(max_workers=len(selected)) as executor:
+            responses = list(executor.map(propagate(_one), selected))
+
+        candidates = []
+        for k in range(max(len(r) for r in responses)):
+            replacements = {}
+            includes = []
+            for (region, enclosing, _), region_responses in zip(selected, responses):
+                response = region_responses[min(k, len(region_responses) - 1)]
+                new_text = self._region_from_response(region, enclosing is None, response)
+                if new_text is None:
+                    Logger.warning(f"LLM response for region '{region.name}' did not contain it; keeping the original.", AGENT_NAME)
+                    continue
+                replacements[region] = new_text
+                includes.extend(i for i in missing_includes(code, response) if i not in includes)
+            candidates.append(add_includes(splice(code, replacements), includes))
+        Logger.info(f"Spliced {len(selected)} region(s) back into the file.", AGENT_NAME, LogColors.OMP_EXPERT)
+        return candidates
+
+    def _region_from_response(self, region, is_function: bool, response: str):
+        """Extracts the rewritten region from an LLM response, or returns None if it is missing."""
+        if response.startswith("// LLM"):
+            return None
+        if is_function:
+            return extract_function(response, region.name)
+        # Loop nests: drop any include lines, which are spliced in separately
+        body = "\n".join(line for line in response.splitlines() if not re.match(r"\s*#\s*include\b", line)).strip("\n")
+        if not body.strip():
+            return None
+        # Keep the original indentation of the first line
+        indent = region.text[:len(region.text) - len(region.text.lstrip())]
+        return body if body.startswith(indent) else indent + body.lstrip()
+
+    def _refine_regions(self, original_code: str, attempted_code: str, errors: str):
+        """
+        Refines only the functions that the compiler errors point at, concurrently, and splices them back.
+        Returns:
+            str or None: The refined file, or None if some error cannot be attributed to a function.
+        """
+        attempted_functions = find_functions(attempted_code)
+        original_functions = {f.name: f for f in find_functions(original_code)}
+        errors_by_region = {}
+        current = None
+        for line in errors.splitlines():
+            location = re.match(r"([^:\s]+):(\d+)(?::\d+)?:\s*(fatal error|error|warning|note):", line)
+            if location:
+                current = None
+                if "temp_generated_code" not in location.group(1):
+                    if location.group(3) in ("error", "fatal error"):
+                        return None # Error in another file: needs the whole picture
+                    continue
+                region = region_containing_line(attempted_functions, int(location.group(2)))
+                if region is None:
+                    if location.group(3) in ("error", "fatal error"):
+                        return None
+                    continue
+                current = region
+            if current is not None:
+                errors_by_region.setdefault(current, []).append(line)
+        if not errors_by_region:
+            return None
+
+        context = build_context(attempted_code, attempted_functions)
+        Logger.info(f"Refining {len(errors_by_region)} function(s) separately: {[r.name for r in errors_by_region]}", AGENT_NAME, LogColors.OMP_EXPERT)
+
+        def _one(region):
+            original = original_functions.get(region.name)
+            prompt = Config.OMP_REGION_REFINE_PROMPT_TEMPLATE.format(
+                region_kind="function",
+                context=context,
+                original_code=original.text if original else region.text,
+                attempted_code=region.text,
+                errors="\n".join(errors_by_region[region])
+            )
+            return send_prompt(prompt)
+
+        regions = list(errors_by_region)
+        with ThreadPoolExecutor(max_workers=len(regions)) as executor:
+            responses = list(executor.map(propagate(_one), regions))
+
+        replacements = {}
+        includes = []
+        for region, response in zip(regions, responses):
+            new_text = self._region_from_response(region, True, response)
+            if new_text is None:
+                return None
+            replacements[region] = new_text
+            includes.extend(i for i in missing_includes(attempted_code, response) if i not in includes)
+        Logger.info("Received refined regions from LLM.", AGENT_NAME, LogColors.OMP_EXPERT)
+        return add_includes(splice(attempted_code, replacements), includes)
@@ -1,10 +1,24 @@
 import json
 import time
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from agents.omp_expert import OMPSExpert
 from agents.mpi_expert import MPIExpert
-from agents.checker import Checker
+from agents.hybrid_expert import HybridExpert
+from agents.checker import Checker, format_benchmark_report
+from agents.autotuner import Autotuner, format_tuning_report
+from agents.mpi_harness import MPIHarness, format_scaling_report
+from agents.profiler import Profiler
+from agents.rule_based import RuleBasedParallelizer
+from agents.vectorizer import Vectorizer, format_vectorization_report
+from agents.locality import LocalityOptimizer, format_locality_report
 from config import Config
+from diagnostics import digest_diagnostics, root_error_count
+from llm_backends import get_backend
+from loop_analysis import analyze_program
+from run_store import RunStore
+from tracing import span, trace_context, propagate
 from utils import Logger, LogColors # Import Logger
 
 AGENT_NAME = "Orchestrator"
@@ -15,19 +29,417 @@ class Orchestrator:
         Logger.info("Orchestrator initialized. Initializing sub-agents...", AGENT_NAME, LogColors.ORCHESTRATOR)
         self.omp = OMPSExpert()
         self.mpi = MPIExpert()
+        self.hybrid = HybridExpert()
         self.checker = Checker()
+        self.profiler = Profiler(self.checker)
+        self.rule_based = RuleBasedParallelizer()
+        self.autotuner = Autotuner(self.checker)
+        self.mpi_harness = MPIHarness(self.checker)
+        self.vectorizer = Vectorizer(self.checker)
+        self.locality = LocalityOptimizer(self.checker)
+        self.run_store = RunStore()
+        self.last_attempts = 0 # Attempts used by the most recent run, for batch reporting
+        self.last_benchmark = None # Benchmark report of the most recent run, if benchmarking was enabled
+        self.last_analysis = None # Static loop analysis of the most recent run
+        self.last_tuning = None # Autotuning report of the most recent run, if autotuning was enabled
+        self.last_vectorization = None # Vectorization report of the most recent run, if vectorization was enabled
+        self.last_locality = None # Locality report of the most recent run, if locality optimization was enabled
+        self.last_run_key = None # Run store key of the most recent run
         Logger.info("All sub-agents initialized.", AGENT_NAME, LogColors.ORCHESTRATOR)
 
-    def choose_expert(self, code: str):
-        if "MPI_" in code.upper(): # Check for MPI keywords
-            Logger.info("MPI keyword detected in code, choosing MPIExpert.", AGENT_NAME, LogColors.ORCHESTRATOR)
-            return self.mpi
+    def choose_expert(self, code: str, analysis=None, paradigm: str = None):
+        """
+        Picks the expert from the static loop analysis' cost model.
+        Args:
+            code (str): The original C code.
+            analysis (ProgramAnalysis): Precomputed analysis of the code; computed here if omitted.
+            paradigm (str): "openmp", "mpi" or "hybrid" to override the cost model; None or "auto" to follow it.
+        Returns:
+            The expert to use, or None when the code is not worth parallelizing.
+        """
+        experts = {"openmp": self.omp, "mpi": self.mpi, "hybrid": self.hybrid}
+        if paradigm in experts:
+            Logger.info(f"Paradigm forced to {paradigm}.", AGENT_NAME, LogColors.ORCHESTRATOR)
+            return experts[paradigm]
+        analysis = analysis or analyze_program(code)
+        Logger.info(f"Static analysis of {len(analysis.nests)} loop nest(s) recommends {analysis.paradigm}: {analysis.reason}.",
+                    AGENT_NAME, LogColors.ORCHESTRATOR)
+        if analysis.paradigm == "none":
+            return None if Config.ANALYSIS_ALLOW_SKIP else self.omp
+        return experts[analysis.paradigm]
+
+    def _benchmark_settings(self, compilation_context: dict):
+        """
+        Resolves the runtime benchmark settings for a run.
+        compilation_context["benchmark"] may be True or a dict overriding any of
+        threads/repetitions/timeout/run_args/min_speedup; Config supplies the defaults.
+        Returns None when benchmarking is disabled.
+        """
+        requested = compilation_context.get("benchmark", Config.BENCHMARK_ENABLED)
+        if not requested:
+            return None
+        overrides = requested if isinstance(requested, dict) else {}
+        settings = {
+            "threads": Config.BENCHMARK_THREADS,
+            "ranks": Config.MPI_RANKS,
+            "weak_args": None,
+            "weak_base": None,
+            "repetitions": Config.BENCHMARK_REPETITIONS,
+            "timeout": Config.BENCHMARK_TIMEOUT,
+            "run_args": [],
+            "min_speedup": Config.BENCHMARK_MIN_SPEEDUP,
+        }
+        settings.update({k: v for k, v in overrides.items() if v is not None})
+        return settings
+
+    def _check_output_settings(self, compilation_context: dict) -> dict:
+        """
+        Build and run keyword arguments for Checker.check_output(). Run arguments and timeout come from whichever of
+        the benchmark/autotune/locality/profile settings gives them, since the program needs the same input for all.
+        """
+        settings = {
+            "project_dir": compilation_context.get("project_dir"),
+            "include_dirs": compilation_context.get("include_dirs"),
+            "extra_files": compilation_context.get("extra_files"),
+            "extra_flags": compilation_context.get("extra_flags"),
+            "run_args": None,
+            "timeout": None
+        }
+        for stage in ("benchmark", "autotune", "locality", "profile"):
+            options = compilation_context.get(stage)
+            if isinstance(options, dict):
+                for key in ("run_args", "timeout"):
+                    if settings[key] is None:
+                        settings[key] = options.get(key)
+        return settings
+
+    def _hot_regions(self, original_code: str, source_path: str, compilation_context: dict):
+        """
+        Runs the profiling pre-pass if compilation_context["profile"] (True or a dict with
+        run_args/top_n/timeout) or Config.PROFILE_ENABLED asks for it.
+        Returns:
+            list or None: The hot regions to hand to the expert, or None to let it see the whole file.
+        """
+        requested = compilation_context.get("profile", Config.PROFILE_ENABLED)
+        if not requested:
+            return None
+        options = requested if isinstance(requested, dict) else {}
+        Logger.info("Profiling the original code to find hot regions.", AGENT_NAME, LogColors.ORCHESTRATOR)
+        with span("profiler.profile", "runtime"):
+            profile = self.profiler.profile(
+                code=original_code,
+                src_dir=os.path.dirname(source_path),
+                project_dir=compilation_context.get("project_dir"),
+                include_dirs=compilation_context.get("include_dirs"),
+                extra_files=compilation_context.get("extra_files"),
+                extra_flags=compilation_context.get("extra_flags"),
+                run_args=options.get("run_args"),
+                timeout=options.get("timeout"),
+                top_n=options.get("top_n")
+            )
+        if profile["error"]:
+            Logger.warning("Profiling failed; the expert will see the whole file.", AGENT_NAME)
+            return None
+        return profile["hot_regions"] or None
+
+    def _vectorize(self, code: str, original_code: str, source_path: str, compilation_context: dict) -> str:
+        """
+        Gets the accepted OpenMP code's hot inner loops to vectorize if compilation_context["vectorize"]
+        or Config.VECTORIZE_ENABLED asks for it. Variants must keep the output, and with benchmarking enabled the speed.
+        Returns:
+            str: The vectorized code, or the code unchanged when vectorization is disabled or gains nothing.
+        """
+        if not compilation_context.get("vectorize", Config.VECTORIZE_ENABLED):
+            return code
+        run_settings = self._check_output_settings(compilation_context)
+        Logger.info("Checking which hot loops GCC vectorizes.", AGENT_NAME, LogColors.ORCHESTRATOR)
+        with span("vectorizer.vectorize", "compile") as trace:
+            code, report = self.vectorizer.vectorize(
+                code=code,
+                original_code=original_code,
+                src_dir=os.path.dirname(source_path),
+                project_dir=compilation_context.get("project_dir"),
+                include_dirs=compilation_context.get("include_dirs"),
+                extra_files=compilation_context.get("extra_files"),
+                extra_flags=compilation_context.get("extra_flags"),
+                benchmark_settings=self._benchmark_settings(compilation_context),
+                refine_mode=compilation_context.get("refine_mode"),
+                run_args=run_settings["run_args"],
+                timeout=run_settings["timeout"]
+            )
+            trace.set(hot_loops=report["hot_loops"], missed=report["missed_after"], rounds=report["rounds"])
+        self.last_vectorization = report
+        Logger.info(format_vectorization_report(report), AGENT_NAME, LogColors.ORCHESTRATOR)
+        return code
+
+    def _improve_locality(self, code: str, analysis, source_path: str, compilation_context: dict):
+        """
+        Restructures the serial code for cache locality before it is parallelized, if compilation_context["locality"]
+        (True or a dict with run_args/repetitions/timeout) or Config.LOCALITY_ENABLED asks for it.
+        Returns:
+            tuple: (code, analysis) - the code the expert should parallelize and its loop analysis.
+        """
+        requested = compilation_context.get("locality", Config.LOCALITY_ENABLED)
+        if not requested:
+            return code, analysis
+        options = requested if isinstance(requested, dict) else {}
+        Logger.info("Optimizing the serial code's cache locality before parallelizing it.", AGENT_NAME, LogColors.ORCHESTRATOR)
+        with span("locality.optimize", "runtime") as trace:
+            optimized_code, report = self.locality.optimize(
+                code=code,
+                src_dir=os.path.dirname(source_path),
+                project_dir=compilation_context.get("project_dir"),
+                include_dirs=compilation_context.get("include_dirs"),
+                extra_files=compilation_context.get("extra_files"),
+                extra_flags=compilation_context.get("extra_flags"),
+                run_args=options.get("run_args"),
+                repetitions=options.get("repetitions"),
+                timeout=options.get("timeout"),
+                analysis=analysis
+            )
+            trace.set(cached=report["cached"], variants=report["variants"], kept=report["kept"])
+        self.last_locality = report
+        Logger.info(format_locality_report(report), AGENT_NAME, LogColors.ORCHESTRATOR)
+        if optimized_code == code:
+            return code, analysis
+        # The expert, the rule-based path and benchmarks all work from the restructured code from here on
+        analysis = analyze_program(optimized_code)
+        self.last_analysis = analysis
+        return optimized_code, analysis
+
+    def _autotune(self, code: str, source_path: str, compilation_context: dict) -> str:
+        """
+        Tunes the accepted OpenMP code's clauses if compilation_context["autotune"] (True or a dict with
+        run_args/threads/repetitions/timeout) or Config.AUTOTUNE_ENABLED asks for it.
+        Returns:
+            str: The tuned code, or the code unchanged when autotuning is disabled.
+        """
+        requested = compilation_context.get("autotune", Config.AUTOTUNE_ENABLED)
+        if not requested:
+            return code
+        options = requested if isinstance(requested, dict) else {}
+        Logger.info("Autotuning the accepted OpenMP code.", AGENT_NAME, LogColors.ORCHESTRATOR)
+        with span("autotuner.tune", "runtime") as trace:
+            tuned_code, report = self.autotuner.tune(
+                code=code,
+                src_dir=os.path.dirname(source_path),
+                project_dir=compilation_context.get("project_dir"),
+                include_dirs=compilation_context.get("include_dirs"),
+                extra_files=compilation_context.get("extra_files"),
+                extra_flags=compilation_context.get("extra_flags"),
+                run_args=options.get("run_args"),
+                thread_counts=options.get("threads"),
+                repetitions=options.get("repetitions"),
+                timeout=options.get("timeout")
+            )
+            trace.set(cached=report["cached"], variants=report["variants"])
+        self.last_tuning = report
+        Logger.info(format_tuning_report(report), AGENT_NAME, LogColors.ORCHESTRATOR)
+        return tuned_code
+
+    def _try_rule_based(self, original_code: str, analysis, source_path: str, compilation_context: dict):
+        """
+        LLM-free fast path: inserts OpenMP pragmas on provably safe loops and checks the result like any candidate.
+        Returns:
+            str or None: The accepted code, or None to continue with the OpenMP expert.
+        """
+        if not compilation_context.get("rule_based", Config.RULE_BASED_ENABLED):
+            return None
+        with span("rule_based.transform", "expert"):
+            code = self.rule_based.transform(original_code, analysis)
+        if code is None:
+            return None
+        Logger.info("Checking the rule-based version before calling the LLM.", AGENT_NAME, LogColors.ORCHESTRATOR)
+        with span("checker.evaluate", "compile", candidates=1, rule_based=True) as trace:
+            outcome = self._evaluate_candidates([code], True, original_code, source_path, compilation_context)
+            trace.set(accepted=outcome["accepted"], stage=outcome["stage"])
+        if outcome["accepted"] and (outcome["report"] or {}).get("output_matches") is not True:
+            # Nothing ran it yet (no benchmarking, or a skipped one): compiling is no proof the pragmas are safe
+            with span("checker.check_output", "runtime", rule_based=True):
+                matches, problem = self.checker.check_output(original_code, code, os.path.dirname(source_path),
+                                                             **self._check_output_settings(compilation_context))
+            if not matches:
+                Logger.warning(f"Rule-based version failed the output check: {problem}.", AGENT_NAME)
+                outcome["accepted"], outcome["stage"] = False, "runtime"
+        if not outcome["accepted"]:
+            Logger.warning(f"Rule-based version was rejected at the {outcome['stage']} stage; falling back to the LLM.", AGENT_NAME)
+            self.last_benchmark = None
+            return None
+        Logger.success("✅ Rule-based version accepted; no LLM call needed.", AGENT_NAME)
+        return code
+
+    def _evaluate_candidates(self, candidate_codes: list, use_openmp: bool, original_code: str, source_path: str,
+                             compilation_context: dict, hybrid: bool = False):
+        """
+        Compiles every candidate (concurrently when there are several) and, when benchmarking is enabled,
+        times the ones that compiled. The fastest correct candidate wins; without benchmarking the first
+        candidate that compiles wins.
+        Returns:
+            dict: {"accepted", "code", "errors", "stage", "report"} where stage is "compile" or "runtime"
+                  and code/errors describe the winner (or the most promising candidate to refine).
+        """
+        benchmark_settings = self._benchmark_settings(compilation_context)
+        build_kwargs = {
+            "use_openmp": use_openmp,
+            "src_dir": os.path.dirname(source_path),
+            "project_dir": compilation_context.get("project_dir"),
+            "include_dirs": compilation_context.get("include_dirs"),
+            "extra_files": compilation_context.get("extra_files"),
+            "extra_flags": compilation_context.get("extra_flags"),
+            # Keep the executable if it is about to be benchmarked
+            "keep_executable": benchmark_settings is not None
+        }
+
+        if len(candidate_codes) == 1:
+            builds = [self.checker.build(code=candidate_codes[0], **build_kwargs)]
         else:
-            Logger.info("Defaulting to OMPExpert.", AGENT_NAME, LogColors.ORCHESTRATOR)
-            return self.omp
+            with ThreadPoolExecutor(max_workers=len(candidate_codes)) as executor:
+                builds = list(executor.map(propagate(lambda code: self.checker.build(code=code, **build_kwargs)), candidate_codes))
+
+        compiled = [(code, exe) for code, (ok, _, exe) in zip(candidate_codes, builds) if ok]
+        if not compiled:
+            # Refine the candidate that came closest to compiling
+            code, (_, errors, _) = min(zip(candidate_codes, builds), key=lambda cb: root_error_count(cb[1][1]))
+            return {"accepted": False, "code": code, "errors": errors, "stage": "compile", "report": None}
+
+        Logger.success(f"✅ Compilation succeeded for {len(compiled)} of {len(candidate_codes)} candidate(s)!", AGENT_NAME)
+        if benchmark_settings is None:
+            return {"accepted": True, "code": compiled[0][0], "errors": "", "stage": "compile", "report": None}
+
+        if hybrid or not use_openmp:
+            return self._evaluate_mpi_candidates(compiled, original_code, source_path, compilation_context, benchmark_settings, hybrid)
+
+        # Benchmark one candidate at a time so the runs don't compete for cores
+        Logger.info("Benchmarking the compiled code against the serial original.", AGENT_NAME, LogColors.ORCHESTRATOR)
+        results = []
+        for code, exe in compiled:
+            report = self.checker.benchmark(
+                original_code=original_code,
+                parallel_code=code,
+                use_openmp=use_openmp,
+                src_dir=os.path.dirname(source_path),
+                project_dir=compilation_context.get("project_dir"),
+                include_dirs=compilation_context.get("include_dirs"),
+                extra_files=compilation_context.get("extra_files"),
+                extra_flags=compilation_context.get("extra_flags"),
+                thread_counts=benchmark_settings["threads"],
+                repetitions=benchmark_settings["repetitions"],
+                timeout=benchmark_settings["timeout"],
+                run_args=benchmark_settings["run_args"],
+                parallel_exe=exe
+            )
+            results.append((code, report))
+
+        code, report = results[0]
+        if report["skipped"]:
+            return {"accepted": True, "code": code, "errors": "", "stage": "runtime", "report": report}
+
+        ran = [(c, r) for c, r in results if r["success"]]
+        if not ran:
+            self.last_benchmark = report
+            errors = f"The code compiles but failed at runtime:\n{format_benchmark_report(report)}"
+            return {"accepted": False, "code": code, "errors": errors, "stage": "runtime", "report": report}
+
+        # Candidates whose output differs from the serial run rank below those that match
+        code, report = max(ran, key=lambda cr: (cr[1]["output_matches"] is not False, cr[1]["best"]["speedup"]))
+        self.last_benchmark = report
+        if len(ran) > 1:
+            Logger.info(f"Tournament winner: {report['best']['speedup']:.2f}x out of {len(ran)} runnable candidates.", AGENT_NAME, LogColors.ORCHESTRATOR)
+        if report["output_matches"] is False:
+            errors = (
+                "The code runs, but its output differs from the serial version, so the parallelization is not correct "
+                "(look for data races, missing private/reduction clauses and loop-carried dependencies).\n"
+                f"{format_benchmark_report(report)}"
+            )
+            return {"accepted": False, "code": code, "errors": errors, "stage": "runtime", "report": report}
+        if report["best"]["speedup"] >= benchmark_settings["min_speedup"]:
+            Logger.success(f"✅ Best speedup {report['best']['speedup']:.2f}x with {report['best']['threads']} threads.", AGENT_NAME)
+            Logger.info(f"Benchmark results:\n{format_benchmark_report(report)}", AGENT_NAME, LogColors.ORCHESTRATOR)
+            return {"accepted": True, "code": code, "errors": "", "stage": "runtime", "report": report}
+
+        errors = (
+            f"The code compiles but is not faster than the serial version "
+            f"(best speedup {report['best']['speedup']:.2f}x, required {benchmark_settings['min_speedup']:.2f}x). "
+            f"Reduce parallel overhead (e.g. parallelize outer loops, avoid critical sections and false sharing).\n"
+            f"{format_benchmark_report(report)}"
+        )
+        return {"accepted": False, "code": code, "errors": errors, "stage": "runtime", "report": report}
+
+    def _evaluate_mpi_candidates(self, compiled: list, original_code: str, source_path: str, compilation_context: dict,
+                                 benchmark_settings: dict, hybrid: bool = False) -> dict:
+        """
+        Runs each compiled MPI candidate under mpirun across the configured rank counts (times the thread
+        counts, for hybrid MPI+OpenMP code). A candidate is accepted if it runs, scales (more workers are
+        faster) and reaches the minimum speedup; otherwise the measurements become the refine feedback.
+        """
+        Logger.info("Running the MPI build across " + ("rank x thread layouts." if hybrid else "rank counts."),
+                    AGENT_NAME, LogColors.ORCHESTRATOR)
+        results = []
+        for code, exe in compiled:
+            report = self.mpi_harness.run(
+                original_code=original_code,
+                parallel_code=code,
+                src_dir=os.path.dirname(source_path),
+                project_dir=compilation_context.get("project_dir"),
+                include_dirs=compilation_context.get("include_dirs"),
+                extra_files=compilation_context.get("extra_files"),
+                extra_flags=compilation_context.get("extra_flags"),
+                rank_counts=benchmark_settings.get("ranks"),
+                repetitions=benchmark_settings["repetitions"],
+                timeout=benchmark_settings["timeout"],
+                run_args=benchmark_settings["run_args"],
+                weak_args=benchmark_settings.get("weak_args"),
+                weak_base=benchmark_settings.get("weak_base"),
+                parallel_exe=exe,
+                thread_counts=benchmark_settings["threads"] if hybrid else None
+            )
+            results.append((code, report))
+
+        code, report = results[0]
+        if report["skipped"]:
+            return {"accepted": True, "code": code, "errors": "", "stage": "runtime", "report": report}
+
+        ran = [(c, r) for c, r in results if r["success"]]
+        if not ran:
+            self.last_benchmark = report
+            problem = "deadlocked or timed out" if report["deadlock"] else "failed at runtime"
+            errors = f"The MPI code compiles but {problem}:\n{format_scaling_report(report)}"
+            return {"accepted": False, "code": code, "errors": errors, "stage": "runtime", "report": report}
+
+        code, report = max(ran, key=lambda cr: (cr[1]["output_matches"] is not False, cr[1]["scales"], cr[1]["best"]["speedup"]))
+        self.last_benchmark = report
+        if report["output_matches"] is False:
+            errors = (
+                "The MPI code runs, but its output differs from the serial version, so the decomposition is not correct "
+                "(check the data distribution and boundaries, the reductions, and that only rank 0 prints the result).\n"
+                f"{format_scaling_report(report)}"
+            )
+            return {"accepted": False, "code": code, "errors": errors, "stage": "runtime", "report": report}
+        if report["scales"] and report["best"]["speedup"] >= benchmark_settings["min_speedup"]:
+            threads = f" x {report['best']['threads']} threads" if report["best"]["threads"] else ""
+            Logger.success(f"✅ Best speedup {report['best']['speedup']:.2f}x with {report['best']['ranks']} ranks{threads}.", AGENT_NAME)
+            Logger.info(f"Scaling results:\n{format_scaling_report(report)}", AGENT_NAME, LogColors.ORCHESTRATOR)
+            return {"accepted": True, "code": code, "errors": "", "stage": "runtime", "report": report}
+
+        problem = ("does not get faster as more ranks/threads are used" if not report["scales"] else
+                   f"is not faster than the serial version (best speedup {report['best']['speedup']:.2f}x, "
+                   f"required {benchmark_settings['min_speedup']:.2f}x)")
+        errors = (
+            f"The MPI code runs but {problem}. Reduce communication and synchronization "
+            f"(e.g. distribute larger contiguous blocks, replace point-to-point loops with collectives, avoid serializing on rank 0).\n"
+            f"{format_scaling_report(report)}"
+        )
+        return {"accepted": False, "code": code, "errors": errors, "stage": "runtime", "report": report}
 
     def run(self, source_path: str, compilation_context: dict = None):
         Logger.info(f"Starting parallelization run for source file: {source_path}", AGENT_NAME, LogColors.ORCHESTRATOR)
+        self.last_attempts = 0
+        self.last_benchmark = None
+        self.last_analysis = None
+        self.last_tuning = None
+        self.last_vectorization = None
+        self.last_locality = None
+        self.last_run_key = None
         # Initialize compilation context if not provided
         if compilation_context is None:
             compilation_context = {}
@@ -43,74 +455,173 @@ class Orchestrator:
             Logger.error(f"Error reading source file {source_path}: {e}", AGENT_NAME)
             raise
 
-        context_id = f"run-{int(time.time())}"
+        context_id = f"run-{int(time.time())}-{uuid.uuid4().hex[:6]}" # Unique even when runs start in the same second
         Logger.info(f"Generated Context ID: {context_id}", AGENT_NAME, LogColors.ORCHESTRATOR)
 
-        expert = self.choose_expert(original_code)
-        expert_name = "OMPExpert" if expert == self.omp else "MPIExpert"
+        # Every span recorded during this run is tagged with its context_id (and, below, the attempt number)
+        with trace_context(context_id=context_id, source=os.path.basename(source_path)), \
+                span("orchestrator.run", "orchestrator") as trace:
+            result = self._run_attempts(original_code, source_path, compilation_context, context_id)
+            trace.set(attempts=self.last_attempts)
+            return result
+
+    def _run_attempts(self, original_code: str, source_path: str, compilation_context: dict, context_id: str):
+        with span("analysis.loops", "analysis") as trace:
+            analysis = analyze_program(original_code)
+            trace.set(nests=len(analysis.nests), paradigm=analysis.paradigm)
+        self.last_analysis = analysis
+        expert = self.choose_expert(original_code, analysis, compilation_context.get("paradigm"))
+        if expert is None:
+            Logger.success("No loop nest is worth parallelizing; returning the code unchanged.", AGENT_NAME)
+            return original_code
+        expert_name = {self.omp: "OMPExpert", self.mpi: "MPIExpert", self.hybrid: "HybridExpert"}[expert]
         Logger.info(f"Chosen expert: {expert_name}", AGENT_NAME, LogColors.ORCHESTRATOR)
 
+        run_key = None
+        resumed_attempts = []
+        if self.run_store.enabled:
+            model = get_backend().model
+            run_key = self.last_run_key = RunStore.make_key(original_code, compilation_context, expert_name, model, source_path)
+            resume = compilation_context.get("resume", True)
+            stored = self.run_store.get(run_key) if resume else None
+            if stored and stored["status"] == "succeeded":
+                Logger.success(f"Identical run {run_key[:12]} already succeeded; returning its stored result.", AGENT_NAME)
+                self.last_attempts = stored["attempts"]
+                self.last_benchmark = stored["benchmark"]
+                return stored["best_code"]
+            if stored and stored["status"] == "running":
+                resumed_attempts = self.run_store.attempts(run_key)
+                if resumed_attempts:
+                    Logger.info(f"Resuming interrupted run {run_key[:12]} after attempt {resumed_attempts[-1]['attempt']}.",
+                                AGENT_NAME, LogColors.ORCHESTRATOR)
+            self.run_store.begin(run_key, source_path, expert_name, model, compilation_context, fresh=not resumed_attempts)
+
+        try:
+            result = self._attempt_loop(expert, expert_name, analysis, original_code, source_path, compilation_context,
+                                        context_id, run_key, {a["attempt"]: a for a in resumed_attempts})
+        except RuntimeError:
+            if run_key:
+                self.run_store.finish(run_key, "failed", attempts=self.last_attempts)
+            raise
+        if run_key:
+            self.run_store.finish(run_key, "succeeded", result, self.last_attempts, self.last_benchmark)
+        return result
+
+    def _attempt_loop(self, expert, expert_name: str, analysis, original_code: str, source_path: str, compilation_context: dict,
+                      context_id: str, run_key: str, resumed: dict):
+        """
+        The process/check/refine loop. Attempts found in resumed (checkpoints of an interrupted run, by attempt number)
+        are replayed from the store instead of calling the expert, and re-checked only if the checker never finished them.
+        """
+        original_code, analysis = self._improve_locality(original_code, analysis, source_path, compilation_context)
+        if expert == self.omp:
+            rule_based_code = self._try_rule_based(original_code, analysis, source_path, compilation_context)
+            if rule_based_code is not None:
+                return self._autotune(self._vectorize(rule_based_code, original_code, source_path, compilation_context),
+                                      source_path, compilation_context)
+
         current_code_to_process = original_code
+        initial_payload = {"code": current_code_to_process, "analysis": analysis.to_dicts()}
+        hot_regions = self._hot_regions(original_code, source_path, compilation_context)
+        if hot_regions:
+            initial_payload["hot_regions"] = hot_regions
         
         # Initial message for the first processing attempt
         mcp_msg_to_expert = {
             "agent_id": AGENT_NAME,
             "context_id": context_id,
-            "payload": {"code": current_code_to_process}, 
-            "metadata": {"use_openmp": expert == self.omp, "retry_attempt": 0}
+            "payload": initial_payload, 
+            "metadata": {
+                "use_openmp": expert != self.mpi, # Hybrid code is built with -fopenmp too
+                "retry_attempt": 0,
+                "num_candidates": compilation_context.get("num_candidates") or Config.NUM_CANDIDATES
+            }
         }
 
         for attempt in range(MAX_RETRIES + 1): # MAX_RETRIES for refine, so MAX_RETRIES+1 total attempts including initial
             Logger.info(f"--- Attempt {attempt + 1} of {MAX_RETRIES + 1} (Retry {attempt} of {MAX_RETRIES}) ---", AGENT_NAME, LogColors.ORCHESTRATOR)
+            self.last_attempts = attempt + 1
             
-            if attempt == 0: # Initial processing call
-                Logger.info(f"Calling {expert_name}.process...", AGENT_NAME, LogColors.ORCHESTRATOR)
-                
-                processed_msg_from_expert = expert.process(mcp_msg_to_expert)
-            else: # Refinement call
-                Logger.info(f"Calling {expert_name}.refine...", AGENT_NAME, LogColors.ORCHESTRATOR)
-                
-                processed_msg_from_expert = expert.refine(mcp_msg_to_expert)
-
-            current_attempted_code = processed_msg_from_expert["payload"]["code"]
-            metadata_from_expert = processed_msg_from_expert["metadata"]
-
-            Logger.info("Attempting to compile the code generated by the expert.", AGENT_NAME, LogColors.ORCHESTRATOR)
-            
-            # Enhanced compile call with compilation context
-            success, errors = self.checker.compile(
-                code=current_attempted_code,
-                use_openmp=metadata_from_expert.get("use_openmp", expert == self.omp),
-                src_dir=os.path.dirname(source_path),
-                project_dir=compilation_context.get("project_dir"),
-                include_dirs=compilation_context.get("include_dirs"),
-                extra_files=compilation_context.get("extra_files"),
-                extra_flags=compilation_context.get("extra_flags")
-            )
+            with trace_context(attempt=attempt + 1):
+                saved = resumed.get(attempt + 1)
+                if saved and saved["candidates"]:
+                    Logger.info(f"Reusing the expert's stored answer for attempt {attempt + 1}.", AGENT_NAME, LogColors.ORCHESTRATOR)
+                    use_openmp = expert != self.mpi
+                    candidate_codes = saved["candidates"]
+                else:
+                    started = time.perf_counter()
+                    if attempt == 0: # Initial processing call
+                        Logger.info(f"Calling {expert_name}.process...", AGENT_NAME, LogColors.ORCHESTRATOR)
+
+                        with span("expert.process", "expert", expert=expert_name):
+                            processed_msg_from_expert = expert.process(mcp_msg_to_expert)
+                    else: # Refinement call
+                        Logger.info(f"Calling {expert_name}.refine...", AGENT_NAME, LogColors.ORCHESTRATOR)
+
+                        with span("expert.refine", "expert", expert=expert_name):
+                            processed_msg_from_expert = expert.refine(mcp_msg_to_expert)
 
-            if success:
-                Logger.success("✅ Compilation succeeded!", AGENT_NAME)
-                return current_attempted_code
+                    metadata_from_expert = processed_msg_from_expert["metadata"]
+                    use_openmp = metadata_from_expert.get("use_openmp", expert != self.mpi)
+                    candidate_codes = processed_msg_from_expert["payload"].get("candidates") or [processed_msg_from_expert["payload"]["code"]]
+                    if run_key:
+                        self.run_store.checkpoint(run_key, attempt + 1, kind="refine" if attempt else "process", candidates=candidate_codes,
+                                                  llm_seconds=time.perf_counter() - started)
+
+                if saved and saved["stage"]:
+                    outcome = {"accepted": saved["accepted"], "code": saved["code"], "errors": saved["errors"] or "", "stage": saved["stage"]}
+                    self.last_benchmark = saved["report"]
+                else:
+                    Logger.info(f"Attempting to compile the {len(candidate_codes)} candidate(s) generated by the expert.", AGENT_NAME, LogColors.ORCHESTRATOR)
+                    started = time.perf_counter()
+                    with span("checker.evaluate", "compile", candidates=len(candidate_codes)) as trace:
+                        outcome = self._evaluate_candidates(candidate_codes, use_openmp, original_code, source_path, compilation_context,
+                                                            hybrid=expert == self.hybrid)
+                        trace.set(accepted=outcome["accepted"], stage=outcome["stage"])
+                    if run_key:
+                        self.run_store.checkpoint(run_key, attempt + 1, code=outcome["code"], errors=outcome["errors"], stage=outcome["stage"],
+                                                  accepted=outcome["accepted"], report=outcome.get("report"),
+                                                  check_seconds=time.perf_counter() - started)
+            current_attempted_code = outcome["code"]
+            errors = outcome["errors"]
+            if outcome["accepted"]:
+                if expert != self.omp:
+                    return current_attempted_code
+                return self._autotune(self._vectorize(current_attempted_code, original_code, source_path, compilation_context),
+                                      source_path, compilation_context)
+
+            if outcome["stage"] == "runtime":
+                Logger.warning(f"Runtime check failed on attempt {attempt + 1}.", AGENT_NAME)
+                Logger.error(errors, AGENT_NAME)
+                if attempt >= MAX_RETRIES:
+                    Logger.error("Maximum retry attempts reached. Parallelization failed.", AGENT_NAME)
+                    raise RuntimeError(f"Failed to produce a faster parallel version after {MAX_RETRIES + 1} attempts. Last results:\n{errors}")
             else:
                 Logger.warning(f"Compilation failed on attempt {attempt + 1}.", AGENT_NAME)
+                if Config.DIAGNOSTIC_DIGEST_ENABLED:
+                    # The expert gets the deduplicated, root-cause-first digest rather than the raw compiler output
+                    raw_errors, errors = errors, digest_diagnostics(errors)
+                    Logger.debug(lambda: f"Raw compiler output:\n{raw_errors}", AGENT_NAME, LogColors.ORCHESTRATOR)
+                    Logger.info(f"Compiler output digested from {len(raw_errors)} to {len(errors)} chars.", AGENT_NAME, LogColors.ORCHESTRATOR)
                 Logger.error(f"Compilation errors: {errors}", AGENT_NAME)
                 if attempt >= MAX_RETRIES:
                     Logger.error("Maximum retry attempts reached. Parallelization failed.", AGENT_NAME)
                     raise RuntimeError(f"Failed to parallelize and compile after {MAX_RETRIES + 1} attempts. Last errors:\n{errors}")
 
-                # Prepare message for the next refinement iteration
-                mcp_msg_to_expert = {
-                    "agent_id": AGENT_NAME,
-                    "context_id": context_id,
-                    "payload": {
-                        "code": current_attempted_code,
-                        "original_code": original_code,
-                        "errors": errors
-                    },
-                    "metadata": {
-                        "use_openmp": metadata_from_expert.get("use_openmp", expert == self.omp),
-                        "retry_attempt": attempt + 1
-                    }
+            # Prepare message for the next refinement iteration
+            mcp_msg_to_expert = {
+                "agent_id": AGENT_NAME,
+                "context_id": context_id,
+                "payload": {
+                    "code": current_attempted_code,
+                    "original_code": original_code,
+                    "errors": errors
+                },
+                "metadata": {
+                    "use_openmp": use_openmp,
+                    "retry_attempt": attempt + 1,
+                    "refine_mode": compilation_context.get("refine_mode") or Config.REFINE_MODE
                 }
+            }
         # Should not be reached if MAX_RETRIES is handled correctly in loop
         raise RuntimeError("Failed after configured retries.")
\ No newline at end of file
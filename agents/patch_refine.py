@@ -0,0 +1,39 @@
+from groq_client import send_prompt, estimate_tokens
+from patching import PatchError, apply_patch, number_lines
+from utils import Logger
+
+def refine_with_patch(prompt_template: str, attempted_code: str, errors: str, agent_name: str, color: str):
+    """
+    Patch-mode refinement: sends the attempted code (with line numbers) and the diagnostics, and applies
+    the diff or line edits the model returns. Neither the original code nor a full regenerated file
+    crosses the wire, which keeps refine rounds small and clear of the output token cap.
+    Args:
+        prompt_template (str): A *_PATCH_REFINE_PROMPT_TEMPLATE with {numbered_code} and {errors} placeholders.
+        attempted_code (str): The code that failed.
+        errors (str): Compiler or runtime diagnostics.
+        agent_name (str): Caller's name, for logging.
+        color (str): Caller's log color.
+    Returns:
+        str or None: The patched code, or None if the caller should fall back to full-file regeneration.
+    """
+    prompt = prompt_template.format(numbered_code=number_lines(attempted_code), errors=errors)
+    Logger.debug(lambda: f"Patch refine prompt:\n{prompt}", agent_name, color)
+
+    response = send_prompt(prompt)
+    if response.startswith("// LLM"):
+        Logger.warning(f"Patch request failed: {response}", agent_name)
+        return None
+    Logger.debug(lambda: f"Patch (raw from LLM):\n---\n{response}\n---", agent_name, color)
+
+    try:
+        patched_code = apply_patch(attempted_code, response)
+    except PatchError as e:
+        Logger.warning(f"Patch did not apply ({e}); falling back to full-file refinement.", agent_name)
+        return None
+    if patched_code.strip() == attempted_code.strip():
+        Logger.warning("Patch made no changes; falling back to full-file refinement.", agent_name)
+        return None
+
+    Logger.info(f"Applied patch from LLM (~{estimate_tokens(prompt)} prompt + ~{estimate_tokens(response)} response tokens).",
+                agent_name, color)
+    return patched_code
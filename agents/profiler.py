@@ -0,0 +1,162 @@
+import glob
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from c_regions import find_functions, find_loop_nests
+from config import Config
+from utils import Logger, LogColors
+
+AGENT_NAME = "Profiler"
+
+PROFILE_FLAGS = ["-pg", "--coverage", "-fno-inline"] # gprof timing + gcov line counts; no inlining so functions stay visible
+
+class Profiler:
+    """
+    Profile-guided hot-region selection.
+    Builds the original code with gprof and gcov instrumentation through the Checker's compile path,
+    runs it on a user-supplied input, and ranks functions (by gprof time) and loop nests
+    (by gcov execution counts within their function) by their share of the runtime.
+    """
+
+    def __init__(self, checker):
+        self.checker = checker
+        Logger.info("Profiler initialized.", AGENT_NAME, LogColors.CHECKER)
+
+    def profile(self, code: str, src_dir: str, project_dir: str = None, include_dirs: list = None,
+                extra_files: list = None, extra_flags: list = None, run_args: list = None,
+                timeout: float = None, top_n: int = None):
+        """
+        Profiles the serial code.
+        Args:
+            code (str): The original C code.
+            src_dir, project_dir, include_dirs, extra_files, extra_flags: Same as Checker.compile().
+            run_args (list): Command-line arguments for the profiling run (the representative input).
+            timeout (float): Seconds before the profiling run is killed.
+            top_n (int): Number of hot regions to return.
+        Returns:
+            dict: {"functions": [...], "loops": [...], "hot_regions": [...], "error": str or None}.
+                  Each hot region is {"kind": "function"|"loop", "name", "function", "start_line", "end_line", "share"},
+                  with share the estimated fraction of total runtime.
+        """
+        run_args = run_args or []
+        timeout = timeout or Config.BENCHMARK_TIMEOUT
+        top_n = top_n or Config.PROFILE_TOP_N
+        cwd = os.path.abspath(project_dir or src_dir)
+        result = {"functions": [], "loops": [], "hot_regions": [], "error": None}
+
+        Logger.info("Building instrumented binary for profiling.", AGENT_NAME, LogColors.CHECKER)
+        success, errors, exe_path = self.checker.build(code, False, src_dir, project_dir, include_dirs, extra_files,
+                                                       list(extra_flags or []) + PROFILE_FLAGS, keep_executable=True)
+        if not success:
+            result["error"] = f"Instrumented build failed:\n{errors}"
+            Logger.warning(result["error"], AGENT_NAME)
+            return result
+
+        gmon_dir = tempfile.mkdtemp(prefix="paragineers_gmon_")
+        try:
+            env = dict(os.environ, GMON_OUT_PREFIX=os.path.join(gmon_dir, "gmon"))
+            try:
+                run = subprocess.run([exe_path] + run_args, capture_output=True, text=True, cwd=cwd, env=env, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                result["error"] = f"Profiling run timed out after {timeout} seconds."
+                Logger.warning(result["error"], AGENT_NAME)
+                return result
+            if run.returncode != 0:
+                result["error"] = f"Profiling run failed with return code {run.returncode}."
+                Logger.warning(result["error"], AGENT_NAME)
+                return result
+
+            function_times = self._gprof_times(exe_path, glob.glob(os.path.join(gmon_dir, "gmon*")))
+            line_counts = self._gcov_line_counts(exe_path)
+        finally:
+            shutil.rmtree(gmon_dir, ignore_errors=True)
+            # The coverage notes and data sit next to the executable, so releasing its sandbox removes them too
+            self.checker.release_executable(exe_path)
+
+        self._rank(code, function_times, line_counts, top_n, result)
+        if result["hot_regions"]:
+            summary = ", ".join(f"{r['name']} ({r['share'] * 100:.1f}%)" for r in result["hot_regions"])
+            Logger.info(f"Hot regions: {summary}", AGENT_NAME, LogColors.CHECKER)
+        else:
+            Logger.info("Profiling found no hot regions above the threshold.", AGENT_NAME, LogColors.CHECKER)
+        return result
+
+    def _gprof_times(self, exe_path: str, gmon_files: list) -> dict:
+        """Parses gprof's flat profile into {function: self seconds}."""
+        if not gmon_files:
+            return {}
+        try:
+            output = subprocess.run(["gprof", "-b", "-p", exe_path] + gmon_files, capture_output=True, text=True, timeout=60).stdout
+        except (OSError, subprocess.TimeoutExpired) as e:
+            Logger.warning(f"gprof failed: {e}", AGENT_NAME)
+            return {}
+        times = {}
+        for line in output.splitlines():
+            # "  %   cumulative   self              self     total" rows: pct cum self [calls self/call total/call] name
+            match = re.match(r"\s*([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+(?:\d+\s+[\d.]+\s+[\d.]+\s+)?(\S+)\s*$", line)
+            if match:
+                times[match.group(4)] = float(match.group(3))
+        return times
+
+    def _gcov_line_counts(self, exe_path: str) -> dict:
+        """Runs gcov on the generated file's coverage data and returns {line number: execution count}."""
+        gcda_files = [p for p in glob.glob(os.path.join(os.path.dirname(exe_path), "*.gcda")) if "temp_generated_code" in os.path.basename(p)]
+        if not gcda_files:
+            return {}
+        try:
+            output = subprocess.run(["gcov", "-t", "-o", gcda_files[0], gcda_files[0]], capture_output=True, text=True,
+                                    cwd=os.path.dirname(exe_path), timeout=60).stdout
+        except (OSError, subprocess.TimeoutExpired) as e:
+            Logger.warning(f"gcov failed: {e}", AGENT_NAME)
+            return {}
+        counts = {}
+        for line in output.splitlines():
+            match = re.match(r"\s*(\d+)\*?:\s*(\d+):", line)
+            if match:
+                counts[int(match.group(2))] = int(match.group(1))
+        return counts
+
+    def _rank(self, code: str, function_times: dict, line_counts: dict, top_n: int, result: dict):
+        functions = [f for f in find_functions(code)]
+        counts_of = lambda start, end: sum(c for line, c in line_counts.items() if start <= line <= end)
+        function_counts = {f.name: counts_of(f.start_line, f.end_line) for f in functions}
+
+        # Prefer measured time; very short runs accumulate no gprof samples, so fall back to execution counts
+        total_time = sum(function_times.get(f.name, 0.0) for f in functions)
+        if total_time > 0:
+            weights = {f.name: function_times.get(f.name, 0.0) / total_time for f in functions}
+        else:
+            total_count = sum(function_counts.values())
+            weights = {name: (count / total_count if total_count else 0.0) for name, count in function_counts.items()}
+
+        for function in functions:
+            result["functions"].append({"name": function.name, "share": weights[function.name],
+                                        "start_line": function.start_line, "end_line": function.end_line})
+            function_count = function_counts[function.name]
+            for nest in find_loop_nests(code, function):
+                nest_share = weights[function.name] * (counts_of(nest.start_line, nest.end_line) / function_count) if function_count else 0.0
+                result["loops"].append({"name": nest.name, "function": function.name, "share": nest_share,
+                                        "start_line": nest.start_line, "end_line": nest.end_line})
+        result["functions"].sort(key=lambda r: r["share"], reverse=True)
+        result["loops"].sort(key=lambda r: r["share"], reverse=True)
+
+        # A function is reported as a whole when most of its time is in loops we'd send anyway; otherwise its hottest loops
+        hot = []
+        for function in result["functions"]:
+            if function["share"] < Config.PROFILE_MIN_SHARE:
+                continue
+            loops = [l for l in result["loops"] if l["function"] == function["name"] and l["share"] >= Config.PROFILE_MIN_SHARE]
+            if function["name"] == "main" and loops:
+                # main usually holds setup and I/O as well; send just its hot loops
+                hot.extend(dict(l, kind="loop") for l in loops)
+            else:
+                hot.append(dict(function, kind="function", function=function["name"]))
+        hot.sort(key=lambda r: r["share"], reverse=True)
+        result["hot_regions"] = hot[:top_n]
+
+def format_hot_region_note(region: dict) -> str:
+    """One-line profiling note appended to an expert prompt for a hot region."""
+    kind = "function" if region["kind"] == "function" else "loop nest"
+    return f"Profiling note: this {kind} accounts for about {region['share'] * 100:.1f}% of the measured runtime."
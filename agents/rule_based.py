@@ -0,0 +1,154 @@
+import re
+from c_regions import mask_code, find_functions
+from loop_analysis import _TYPE_RE
+from utils import Logger, LogColors
+
+AGENT_NAME = "RuleBased"
+
+_OMP_REDUCTION_OPS = {"+": "+", "*": "*", "&": "&", "|": "|", "^": "^", "max": "max", "min": "min"}
+
+class RuleBasedParallelizer:
+    """
+    LLM-free fast path for textbook loops.
+    Inserts `#pragma omp parallel for` (with private/reduction/collapse clauses) on the loop nests the
+    static analysis rated worth parallelizing, but only where the stricter checks below prove the
+    transformation safe. If any such nest cannot be proven, the file is left to the OpenMP expert.
+    """
+
+    def __init__(self):
+        Logger.info("RuleBasedParallelizer initialized.", AGENT_NAME, LogColors.OMP_EXPERT)
+
+    def transform(self, code: str, analysis):
+        """
+        Args:
+            code (str): The original C code.
+            analysis (ProgramAnalysis): loop_analysis.analyze_program(code).
+        Returns:
+            str or None: The code with pragmas inserted, or None if some worthwhile nest is not provably safe
+                         (or there is nothing to do).
+        """
+        targets = [n for n in analysis.nests if n.verdict != "none"]
+        if not targets:
+            return None
+        masked = mask_code(code)
+        functions = {f.name: f for f in find_functions(code)}
+        pragmas = []
+        for nest in targets:
+            if nest.parallel_loop is None:
+                Logger.info(f"No loop of {nest.name} is provably parallel; leaving the file to the LLM.", AGENT_NAME, LogColors.OMP_EXPERT)
+                return None
+            reason = self._unsafe_reason(code, masked, functions.get(nest.function), nest)
+            if reason:
+                Logger.info(f"Cannot prove {nest.name} safe ({reason}); leaving the file to the LLM.", AGENT_NAME, LogColors.OMP_EXPERT)
+                return None
+            pragmas.append((nest.parallel_loop.start, self._pragma(nest)))
+
+        # Insert bottom-up so earlier offsets stay valid
+        for offset, pragma in sorted(pragmas, reverse=True):
+            line_start = code.rfind("\n", 0, offset) + 1
+            prefix = code[line_start:offset]
+            if prefix.strip():
+                # The loop shares its line with other code: start it on a fresh line
+                indent = re.match(r"[ \t]*", prefix).group(0)
+                code = f"{code[:offset].rstrip(' ')}\n{indent}{pragma}\n{indent}{code[offset:]}"
+            else:
+                code = f"{code[:line_start]}{prefix}{pragma}\n{code[line_start:]}"
+        Logger.info(f"Inserted OpenMP pragmas into {len(pragmas)} loop nest(s) without the LLM: "
+                    f"{[n.name for n in targets]}", AGENT_NAME, LogColors.OMP_EXPERT)
+        return code
+
+    def _collapsed_loops(self, nest) -> list:
+        loops = [nest.parallel_loop]
+        for _ in range(nest.collapse - 1):
+            loops.append(loops[-1].children[0])
+        return loops
+
+    def _unsafe_reason(self, code: str, masked: str, function, nest):
+        """Returns why the nest's chosen loop cannot be parallelized mechanically, or None if it can."""
+        loop = nest.parallel_loop
+        if loop is None or function is None:
+            return "no parallel loop found"
+        loops = self._collapsed_loops(nest)
+        line_start = code.rfind("\n", 0, loop.start) + 1
+        previous_line = code[code.rfind("\n", 0, max(0, line_start - 1)) + 1:line_start]
+        if re.search(r"#\s*pragma\s+omp\b", previous_line + code[line_start:loop.start]):
+            return "already has an OpenMP pragma"
+        if any(l.calls for l in loops):
+            return f"calls {', '.join(sorted({c for l in loops for c in l.calls}))}, which may have side effects"
+        if any(l.trip_count is None and l.upper is None for l in loops):
+            return "loop bounds could not be parsed"
+        if any(l.step is None for l in loops):
+            return "loop increment is not a constant step"
+
+        # Array element writes in other functions (through pointers) could alias what the loop reads
+        body = masked[loop.body_start:loop.end]
+        function_masked = masked[function.start:function.end]
+        written = set(re.findall(r"(?<![\w.>])([A-Za-z_]\w*)\s*(?:\[[^;]*?\])+\s*(?:[-+*/%&|^]?=(?!=)|\+\+|--)", body))
+        accessed = set(re.findall(r"(?<![\w.>])([A-Za-z_]\w*)\s*\[", body))
+        pointers = {name for name in accessed if self._is_unrestricted_pointer(function_masked, name)}
+        if written & pointers and len(pointers) > 1:
+            return f"pointers {', '.join(sorted(pointers))} may alias"
+        if re.search(r"(?<![\w\]])\*\s*[A-Za-z_(]\w*[^;]*?(?<![=!<>])=(?!=)", body) or "->" in body:
+            return "writes through pointer dereferences"
+        if re.search(r"\.\s*[A-Za-z_]\w*\s*(?:\[[^;]*?\]\s*)*(?:[-+*/%&|^]?=(?!=)|\+\+|--)|(?:\+\+|--)\s*[\w\[\]\s]+\.", body):
+            return "writes struct members"
+
+        # Privates and loop variables declared outside the loop must not be read after it
+        loop_end_in_function = loop.end - function.start
+        outside_vars = [l.var for l in loops if not re.match(r"for\s*\(\s*" + _TYPE_RE, masked[l.start:l.body_start])]
+        for name in outside_vars + [p for l in loops for p in l.private]:
+            if self._used_after(function_masked, name, loop_end_in_function):
+                return f"'{name}' is used after the loop"
+        # A private starts uninitialized in every iteration, so it must be assigned on every path before use
+        innermost = loops[-1]
+        inner_vars = {l.var for l in nest.loops()}
+        for name in (p for l in loops for p in l.private if p not in inner_vars):
+            if not self._assigned_unconditionally(masked[innermost.body_start:innermost.end], name):
+                return f"'{name}' is only assigned conditionally"
+        for reduction, operator in ((r, o) for l in loops for r, o in l.reductions.items()):
+            if operator not in _OMP_REDUCTION_OPS:
+                return f"unsupported reduction operator '{operator}' on '{reduction}'"
+        return None
+
+    def _is_unrestricted_pointer(self, function_masked: str, name: str) -> bool:
+        """True if `name` is declared as a pointer (parameter or local) without restrict."""
+        declaration = re.search(r"\*\s*(?:const\s+)?(restrict\s+|__restrict__\s+|__restrict\s+)?" + re.escape(name) + r"\b", function_masked)
+        return bool(declaration) and not declaration.group(1)
+
+    def _assigned_unconditionally(self, body: str, name: str) -> bool:
+        """True if the first write to `name` is a top-level statement of the loop body (not under if/else/?:/a loop)."""
+        write = re.search(r"(?<![\w.>])" + re.escape(name) + r"\s*=(?!=)", body)
+        if write is None:
+            return False
+        top_depth = 1 if body.lstrip().startswith("{") else 0
+        depth = body[:write.start()].count("{") - body[:write.start()].count("}")
+        statement_start = max(body.rfind(c, 0, write.start()) for c in ";{}") + 1
+        statement = body[statement_start:write.start()]
+        return depth == top_depth and not re.search(r"\b(if|else|for|while|do)\b|\?", statement)
+
+    def _used_after(self, function_masked: str, name: str, position: int) -> bool:
+        """True if the first mention of `name` after `position` reads it (rather than assigning it a new value)."""
+        mention = re.search(r"(?<![\w.>])" + re.escape(name) + r"\b", function_masked[position:])
+        if mention is None:
+            return False
+        after = function_masked[position + mention.end():]
+        return not re.match(r"\s*=(?!=)", after)
+
+    def _pragma(self, nest) -> str:
+        loops = self._collapsed_loops(nest)
+        clauses = []
+        if nest.collapse > 1:
+            clauses.append(f"collapse({nest.collapse})")
+        collapsed_vars = {l.var for l in loops}
+        private = [p for p in dict.fromkeys(p for l in loops for p in l.private) if p not in collapsed_vars]
+        if private:
+            clauses.append(f"private({', '.join(private)})")
+        by_operator = {}
+        for l in loops:
+            for var, operator in l.reductions.items():
+                names = by_operator.setdefault(_OMP_REDUCTION_OPS[operator], [])
+                if var not in names:
+                    names.append(var)
+        for operator, names in by_operator.items():
+            clauses.append(f"reduction({operator}:{', '.join(names)})")
+        return " ".join(["#pragma omp parallel for"] + clauses)
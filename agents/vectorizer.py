@@ -0,0 +1,243 @@
+import os
+import re
+from groq_client import send_prompt
+from agents.patch_refine import refine_with_patch
+from config import Config
+from diagnostics import digest_diagnostics
+from loop_analysis import analyze_program
+from utils import Logger, LogColors
+
+AGENT_NAME = "Vectorizer"
+
+_REPORT_RE = re.compile(r"^(?P<file>[^:\s]+):(?P<line>\d+):(?P<column>\d+): (?P<kind>optimized|missed): +(?P<message>.*)$")
+_GIMPLE_RE = re.compile(r":\s*[^:]*\b_\d+\b.*$") # Internal statement dumps such as ": _5 = *_4;" mean nothing to the model
+
+def parse_vectorizer_report(text: str, file_name: str = "temp_generated_code.c") -> dict:
+    """
+    Groups GCC's -fopt-info-vec-optimized/-missed output by loop.
+    A loop inlined into several callers is reported once per copy; it counts as vectorized if any copy was.
+    Args:
+        text (str): The compiler's report.
+        file_name (str): Only lines about this file are kept (headers are not ours to change).
+    Returns:
+        dict: loop line -> {"vectorized", "vector_bytes", "versioned", "reasons"}.
+    """
+    loops = {}
+    current = None
+    for raw_line in text.splitlines():
+        match = _REPORT_RE.match(raw_line.strip())
+        if not match:
+            continue
+        if os.path.basename(match["file"]) != file_name:
+            current = None
+            continue
+        line, message = int(match["line"]), match["message"].strip()
+        if message.startswith("loop vectorized"):
+            entry = loops.setdefault(line, _new_entry())
+            entry["vectorized"] = True
+            vector_bytes = re.search(r"(\d+) byte vectors", message)
+            if vector_bytes:
+                entry["vector_bytes"] = max(entry["vector_bytes"] or 0, int(vector_bytes.group(1)))
+            current = None
+        elif "versioned for vectorization" in message:
+            loops.setdefault(line, _new_entry())["versioned"] = True
+        elif message.startswith("couldn't vectorize loop"):
+            current = loops.setdefault(line, _new_entry())
+        elif message.startswith("not vectorized") and current is not None:
+            reason = _GIMPLE_RE.sub("", message[len("not vectorized"):].lstrip(": ")).strip()
+            reason = f"{reason.rstrip('.')} (line {line})" if reason else f"unknown reason (line {line})"
+            if reason not in current["reasons"]:
+                current["reasons"].append(reason)
+    return loops
+
+def _new_entry() -> dict:
+    return {"vectorized": False, "vector_bytes": None, "versioned": False, "reasons": []}
+
+def hot_inner_loops(code: str) -> list:
+    """
+    The innermost loops of nests holding at least VECTORIZE_HOT_SHARE of the estimated work. Nests whose trip counts
+    are unknown (typically loops over function parameters, called from elsewhere) cannot be ruled out and count too.
+    Returns:
+        list: (first line, last line) of each loop. GCC reports a loop at its header, or at the line of its exit test
+              when the body can leave early.
+    """
+    analysis = analyze_program(code)
+    total_work = sum(nest.work for nest in analysis.nests) or 1.0
+    headers = []
+    for nest in analysis.nests:
+        if nest.trip_counts_known and nest.work / total_work < Config.VECTORIZE_HOT_SHARE:
+            continue
+        for loop in nest.loops():
+            if not loop.children:
+                headers.append((loop.line, code.count("\n", 0, loop.end) + 1))
+    return headers
+
+def format_vectorizer_feedback(loops: list) -> str:
+    """Renders (line, entry) pairs of hot loops as the report the LLM sees."""
+    lines = []
+    for line, entry in loops:
+        if entry["vectorized"]:
+            lines.append(f"line {line}: vectorized only behind a runtime aliasing check (pointers may overlap)")
+        else:
+            lines.append(f"line {line}: not vectorized: {'; '.join(entry['reasons']) or 'no reason given'}")
+    return "\n".join(lines)
+
+class Vectorizer:
+    """
+    Makes the hot inner loops of accepted code SIMD-vectorizable. GCC's vectorizer report says which loops
+    it missed and why; the LLM edits those loops, and a variant is kept only if it vectorizes more hot loops
+    (and, when benchmarking, produces the same output without getting slower).
+    """
+
+    def __init__(self, checker):
+        Logger.info("Vectorizer initialized.", AGENT_NAME, LogColors.VECTORIZER)
+        self.checker = checker
+
+    def inspect(self, code: str, build_kwargs: dict):
+        """
+        Returns:
+            tuple: (missed, versioned, seen, errors) - the hot loops GCC did not vectorize and those it vectorized only
+                   behind a runtime aliasing check, as lists of (line, entry); the number of hot loops it reported on;
+                   and the compiler errors. missed and versioned are None if the code did not compile.
+        """
+        text, errors = self.checker.vectorization_report(code, True, build_kwargs["src_dir"], build_kwargs["project_dir"],
+                                                         build_kwargs["include_dirs"], build_kwargs["extra_flags"])
+        if text is None:
+            return None, None, 0, errors
+        report = parse_vectorizer_report(text)
+        missed, versioned, seen = [], [], 0
+        for first_line, last_line in hot_inner_loops(code):
+            entry = next((report[l] for l in range(first_line, last_line + 1) if l in report), None)
+            if entry is None:
+                continue # Fully unrolled or optimized away; nothing to vectorize
+            seen += 1
+            if not entry["vectorized"]:
+                missed.append((first_line, entry))
+            elif entry["versioned"]:
+                versioned.append((first_line, entry))
+        return missed, versioned, seen, ""
+
+    def vectorize(self, code: str, original_code: str, src_dir: str, project_dir: str = None, include_dirs: list = None,
+                  extra_files: list = None, extra_flags: list = None, benchmark_settings: dict = None, refine_mode: str = None,
+                  run_args: list = None, timeout: float = None):
+        """
+        Iterates LLM edits until every hot inner loop vectorizes or VECTORIZE_MAX_ROUNDS is used up.
+        Args:
+            code (str): The accepted (OpenMP) code.
+            original_code (str): The serial original, the reference for output and timing checks.
+            src_dir, project_dir, include_dirs, extra_files, extra_flags: Same as Checker.compile().
+            benchmark_settings (dict): The orchestrator's benchmark settings, or None to skip timing. Variants are run
+                                       and compared with the original's output either way.
+            refine_mode (str): "patch" or "full", as for refinement.
+            run_args (list): Program arguments for the output check when not benchmarking.
+            timeout (float): Seconds before that run is killed.
+        Returns:
+            tuple: (code, report) where report is {"hot_loops", "vectorized_before", "missed_after", "rounds", "kept", "error"}.
+        """
+        build_kwargs = {"src_dir": src_dir, "project_dir": project_dir, "include_dirs": include_dirs, "extra_flags": extra_flags}
+        missed, versioned, seen, errors = self.inspect(code, build_kwargs)
+        report = {"hot_loops": seen, "vectorized_before": seen - len(missed or []), "missed_after": len(missed or []),
+                  "rounds": 0, "kept": 0, "error": errors or None}
+        if missed is None:
+            Logger.warning(f"No vectorizer report; leaving the code as it is: {errors}", AGENT_NAME)
+            return code, report
+        if not missed and not versioned:
+            Logger.info(f"All {seen} hot inner loop(s) already vectorize.", AGENT_NAME, LogColors.VECTORIZER)
+            return code, report
+
+        current_speedup = None
+        note = ""
+        for round_index in range(Config.VECTORIZE_MAX_ROUNDS):
+            if not missed and not versioned:
+                break
+            report["rounds"] = round_index + 1
+            Logger.info(f"Round {round_index + 1}: {len(missed)} of {seen} hot inner loop(s) not vectorized.", AGENT_NAME, LogColors.VECTORIZER)
+            feedback = format_vectorizer_feedback(missed + versioned) + note
+            candidate = self._ask(code, feedback, refine_mode or Config.REFINE_MODE)
+            if candidate is None:
+                continue
+
+            new_missed, new_versioned, new_seen, errors = self.inspect(candidate, build_kwargs)
+            if new_missed is None:
+                note = f"\nThe previous edit did not compile:\n{digest_diagnostics(errors) if Config.DIAGNOSTIC_DIGEST_ENABLED else errors}"
+                continue
+            if (len(new_missed), len(new_versioned)) >= (len(missed), len(versioned)):
+                note = "\nThe previous edit did not get any more of these loops vectorized; try a different change."
+                continue
+
+            if benchmark_settings is None:
+                # `omp simd` and `restrict` assert independence; a wrong assertion vectorizes into wrong results
+                matches, problem = self.checker.check_output(original_code, candidate, src_dir, project_dir, include_dirs,
+                                                             extra_files, extra_flags, run_args, timeout)
+                if matches is None:
+                    Logger.warning(f"Vectorized variants cannot be checked against the serial original; keeping the code "
+                                   f"as it is: {problem}", AGENT_NAME)
+                    break
+                if not matches:
+                    Logger.warning(f"Vectorized variant rejected: {problem}.", AGENT_NAME)
+                    note = f"\nThe previous edit was rejected because {problem}."
+                    continue
+            else:
+                if current_speedup is None:
+                    current_speedup, _ = self._speedup(code, original_code, src_dir, project_dir, include_dirs, extra_files,
+                                                       extra_flags, benchmark_settings)
+                speedup, problem = self._speedup(candidate, original_code, src_dir, project_dir, include_dirs, extra_files,
+                                                 extra_flags, benchmark_settings)
+                if problem is None and current_speedup and speedup < current_speedup * (1 - Config.VECTORIZE_TOLERANCE):
+                    problem = f"it was slower ({speedup:.2f}x vs {current_speedup:.2f}x speedup)"
+                if problem:
+                    Logger.warning(f"Vectorized variant rejected: {problem}.", AGENT_NAME)
+                    note = f"\nThe previous edit was rejected because {problem}."
+                    continue
+                current_speedup = speedup
+
+            Logger.success(f"Kept variant: {len(missed) - len(new_missed)} more hot loop(s) vectorized, "
+                           f"{len(new_versioned)} behind aliasing checks (was {len(versioned)}).", AGENT_NAME)
+            code, missed, versioned, seen, note = candidate, new_missed, new_versioned, new_seen, ""
+            report["kept"] += 1
+
+        report["hot_loops"] = seen
+        report["missed_after"] = len(missed)
+        return code, report
+
+    def _ask(self, code: str, feedback: str, refine_mode: str):
+        Logger.debug(lambda: f"Vectorizer report sent to the LLM:\n{feedback}", AGENT_NAME, LogColors.VECTORIZER)
+        if refine_mode == "patch":
+            patched_code = refine_with_patch(Config.VECTORIZE_PATCH_PROMPT_TEMPLATE, code, feedback, AGENT_NAME, LogColors.VECTORIZER)
+            if patched_code is not None:
+                return patched_code
+        response = send_prompt(Config.VECTORIZE_PROMPT_TEMPLATE.format(code=code, report=feedback))
+        if response.startswith("// LLM"):
+            Logger.warning(f"Vectorization request failed: {response}", AGENT_NAME)
+            return None
+        return response
+
+    def _speedup(self, code: str, original_code: str, src_dir: str, project_dir: str, include_dirs: list, extra_files: list,
+                 extra_flags: list, benchmark_settings: dict):
+        """Returns (best speedup over the serial original, problem or None)."""
+        result = self.checker.benchmark(
+            original_code=original_code,
+            parallel_code=code,
+            use_openmp=True,
+            src_dir=src_dir,
+            project_dir=project_dir,
+            include_dirs=include_dirs,
+            extra_files=extra_files,
+            extra_flags=extra_flags,
+            thread_counts=benchmark_settings["threads"],
+            repetitions=benchmark_settings["repetitions"],
+            timeout=benchmark_settings["timeout"],
+            run_args=benchmark_settings["run_args"]
+        )
+        if not result["success"]:
+            return 0.0, f"it failed to run ({(result['error'] or '').splitlines()[0] if result['error'] else 'unknown error'})"
+        if result["output_matches"] is False:
+            return 0.0, "its output differs from the serial version"
+        return result["best"]["speedup"], None
+
+def format_vectorization_report(report: dict) -> str:
+    """One-line summary of a vectorize() report."""
+    if report["error"] and not report["rounds"]:
+        return f"Vectorization skipped: {report['error'].splitlines()[0] if report['error'] else 'no report'}"
+    return (f"Vectorization: {report['hot_loops'] - report['missed_after']} of {report['hot_loops']} hot inner loop(s) vectorized "
+            f"(was {report['vectorized_before']}), {report['kept']} variant(s) kept in {report['rounds']} round(s).")
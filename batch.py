@@ -0,0 +1,122 @@
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import Config
+from utils import Logger, LogColors
+
+AGENT_NAME = "Batch"
+
+_output_path_lock = threading.Lock()
+
+def is_batch_target(target: str) -> bool:
+    """Returns True if the target names a directory or a glob pattern rather than a single file."""
+    return os.path.isdir(target) or glob.has_magic(target)
+
+def collect_sources(target: str, recursive: bool = False) -> list:
+    """
+    Expands a directory or glob pattern into a sorted list of C source files.
+    Args:
+        target (str): A directory (all *.c files inside it) or a glob pattern such as "kernels/**/*.c".
+        recursive (bool): When target is a directory, also search its subdirectories.
+    Returns:
+        list: Paths of the matching .c files.
+    """
+    if os.path.isdir(target):
+        pattern = os.path.join(target, "**", "*.c") if recursive else os.path.join(target, "*.c")
+        matches = glob.glob(pattern, recursive=recursive)
+    else:
+        matches = glob.glob(target, recursive=True)
+    # Skip temp files left behind by an interrupted Checker run
+    return sorted(p for p in matches if os.path.isfile(p) and not os.path.basename(p).startswith("temp_generated_code"))
+
+def make_output_path(results_dir: str, source_path: str, reserve: bool = True) -> str:
+    """
+    Builds a results/output_<name>_<timestamp>.c path that does not collide with an existing file.
+    With reserve=True an empty file is created at the path so concurrent workers cannot pick the same name.
+    """
+    base_name = os.path.splitext(os.path.basename(source_path))[0]
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    with _output_path_lock:
+        output_file_path = os.path.join(results_dir, f"output_{base_name}_{timestamp}.c")
+        counter = 1
+        while os.path.exists(output_file_path):
+            output_file_path = os.path.join(results_dir, f"output_{base_name}_{timestamp}_{counter}.c")
+            counter += 1
+        if reserve:
+            open(output_file_path, "a").close()
+    return output_file_path
+
+def _run_one(source_path: str, compilation_context: dict, results_dir: str) -> dict:
+    """Runs a single orchestration and returns its summary record."""
+    context = dict(compilation_context)
+    if not context.get("project_dir"):
+        context["project_dir"] = os.path.dirname(source_path)
+
+    from agents.orchestrator import Orchestrator # Deferred: the service client imports this module for make_output_path
+
+    # Each file gets its own orchestrator: experts keep per-run state between process and refine
+    orchestrator = Orchestrator()
+    start = time.perf_counter()
+    record = {"source": source_path, "status": "failed", "attempts": 0, "wall_time": 0.0, "output": None, "error": "",
+              "speedup": None}
+    try:
+        parallel_code = orchestrator.run(source_path, context)
+        output_path = make_output_path(results_dir, source_path)
+        with open(output_path, "w") as f:
+            f.write(parallel_code)
+        record["status"] = "ok"
+        record["output"] = output_path
+    except Exception as e:
+        record["error"] = str(e).splitlines()[0] if str(e) else type(e).__name__
+    record["attempts"] = orchestrator.last_attempts
+    if orchestrator.last_benchmark and orchestrator.last_benchmark.get("best"):
+        record["speedup"] = orchestrator.last_benchmark["best"]["speedup"]
+    record["wall_time"] = time.perf_counter() - start
+    return record
+
+def run_batch(sources: list, compilation_context: dict, results_dir: str, max_files: int = None) -> list:
+    """
+    Parallelizes many C files concurrently.
+    LLM calls and compiles from different files overlap; their totals are capped by the
+    limits in concurrency.py, so max_files mainly controls how many files are in progress at once.
+    Args:
+        sources (list): C source files to process.
+        compilation_context (dict): Shared compilation context; project_dir defaults to each file's directory.
+        results_dir (str): Directory where output_<name>_<timestamp>.c files are written.
+        max_files (int): Maximum number of orchestrations running at once.
+    Returns:
+        list: One summary record per source file, in input order.
+    """
+    max_files = max_files or Config.MAX_CONCURRENT_FILES
+    Logger.info(f"Starting batch of {len(sources)} files with up to {max_files} concurrent orchestrations.", AGENT_NAME, LogColors.MAIN)
+
+    records = {}
+    with ThreadPoolExecutor(max_workers=max_files) as executor:
+        futures = {executor.submit(_run_one, src, compilation_context, results_dir): src for src in sources}
+        for future in as_completed(futures):
+            record = future.result()
+            records[record["source"]] = record
+            if record["status"] == "ok":
+                Logger.success(f"[{len(records)}/{len(sources)}] {record['source']} done in {record['wall_time']:.1f}s.", AGENT_NAME)
+            else:
+                Logger.warning(f"[{len(records)}/{len(sources)}] {record['source']} failed: {record['error']}", AGENT_NAME)
+    return [records[src] for src in sources]
+
+def print_summary(records: list, total_wall_time: float = None):
+    """Prints a per-file table of status, attempts, wall time and (when benchmarked) speedup."""
+    name_width = max([len("File")] + [len(r["source"]) for r in records])
+    status_width = max([len("Status")] + [len(r["status"]) for r in records])
+    header = f"{'File':<{name_width}}  {'Status':<{status_width}}  {'Attempts':>8}  {'Time (s)':>9}  {'Speedup':>7}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in records:
+        speedup = f"{r['speedup']:.2f}x" if r.get("speedup") is not None else "-"
+        print(f"{r['source']:<{name_width}}  {r['status']:<{status_width}}  {r['attempts']:>8}  {r['wall_time']:>9.1f}  {speedup:>7}")
+    print("-" * len(header))
+    succeeded = sum(1 for r in records if r["status"] in ("ok", "unchanged"))
+    summary = f"{succeeded}/{len(records)} succeeded"
+    if total_wall_time is not None:
+        summary += f", total wall time {total_wall_time:.1f}s"
+    print(summary + "\n")
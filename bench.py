@@ -0,0 +1,344 @@
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import shlex
+import sys
+import time
+from agents.orchestrator import Orchestrator
+from agents.checker import Checker
+from agents.mpi_harness import MPIHarness
+from config import Config
+from llm_backends import create_backend, set_backend
+from tracing import tracer, set_tracing_enabled, trace_context
+from tuning_db import machine_signature
+from utils import Logger, LogColors
+
+AGENT_NAME = "Bench"
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_NUMBER_RE = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+def _repo_path(path: str) -> str:
+    return path if os.path.isabs(path) else os.path.join(REPO_DIR, path)
+
+def load_suite(suite_path: str, names: list = None) -> list:
+    """
+    Reads the kernel manifest.
+    Args:
+        suite_path (str): Path of the suite JSON ({"kernels": [{"name", "source", "run_args", "expected", "flags"}, ...]};
+            a kernel may also set "tolerance" to override Config.BENCH_REL_TOL).
+        names (list): Kernel names to keep; all kernels when empty.
+    Returns:
+        list: Kernel dicts with source and expected resolved to absolute paths.
+    """
+    with open(suite_path, "r") as f:
+        kernels = json.load(f)["kernels"]
+    suite_dir = os.path.dirname(os.path.abspath(suite_path))
+    if names:
+        unknown = set(names) - {k["name"] for k in kernels}
+        if unknown:
+            raise ValueError(f"Unknown kernel(s): {', '.join(sorted(unknown))}")
+        kernels = [k for k in kernels if k["name"] in names]
+    for kernel in kernels:
+        kernel["source"] = os.path.join(suite_dir, kernel["source"])
+        kernel["expected"] = os.path.join(suite_dir, kernel["expected"])
+    return kernels
+
+def outputs_match(actual: str, expected: str, rel_tol: float = None) -> bool:
+    """Compares program outputs token by token, allowing numbers to differ by rel_tol (reduction order changes the last digits)."""
+    rel_tol = Config.BENCH_REL_TOL if rel_tol is None else rel_tol
+    actual_tokens, expected_tokens = actual.split(), expected.split()
+    if len(actual_tokens) != len(expected_tokens):
+        return False
+    for a, e in zip(actual_tokens, expected_tokens):
+        if a == e:
+            continue
+        if not (_NUMBER_RE.fullmatch(a) and _NUMBER_RE.fullmatch(e)):
+            return False
+        if not math.isclose(float(a), float(e), rel_tol=rel_tol, abs_tol=rel_tol):
+            return False
+    return True
+
+def run_program(checker: Checker, harness: MPIHarness, code: str, kernel: dict, timeout: float):
+    """
+    Builds code (with OpenMP enabled, and through mpicc when it calls MPI) and runs it once on the kernel's reference input.
+    Returns:
+        tuple: (stdout, error message or None)
+    """
+    src_dir = os.path.dirname(kernel["source"])
+    success, errors, exe = checker.build(code, True, src_dir, src_dir, extra_flags=kernel.get("flags"), keep_executable=True)
+    if not success:
+        return "", errors
+    try:
+        run_args = shlex.split(kernel.get("run_args", ""))
+        if "MPI_" in code.upper():
+            _, stdout, error = harness.time_ranks(exe, Config.BENCH_CHECK_RANKS, run_args, 1, timeout, src_dir)
+        else:
+            _, stdout, error = checker.time_executable(exe, run_args, dict(os.environ), 1, timeout, src_dir)
+        return stdout, error
+    finally:
+        checker.release_executable(exe)
+
+def update_expected(kernels: list, timeout: float):
+    """Regenerates each kernel's reference output from its serial source."""
+    checker = Checker()
+    harness = MPIHarness(checker)
+    for kernel in kernels:
+        with open(kernel["source"], "r") as f:
+            code = f.read()
+        stdout, error = run_program(checker, harness, code, kernel, timeout)
+        if error:
+            Logger.error(f"{kernel['name']}: could not produce a reference output: {error}", AGENT_NAME)
+            continue
+        os.makedirs(os.path.dirname(kernel["expected"]), exist_ok=True)
+        with open(kernel["expected"], "w") as f:
+            f.write(stdout)
+        Logger.success(f"{kernel['name']}: reference output written to {kernel['expected']}", AGENT_NAME)
+
+def _kernel_metrics(name: str) -> dict:
+    """Derives LLM and first-try compile metrics from the spans recorded while the kernel ran."""
+    spans = [s for s in tracer.spans if s.attrs.get("bench_kernel") == name]
+    llm_spans = [s for s in spans if s.name.startswith("llm.send_prompt")]
+    evaluations = sorted((s for s in spans if s.name == "checker.evaluate"), key=lambda s: s.start)
+    # The first LLM attempt decides first-try compile; the rule-based check only counts when no LLM attempt was needed
+    llm_first = [s for s in evaluations if s.attrs.get("attempt") == 1]
+    first = (llm_first or evaluations or [None])[0]
+    return {
+        "first_try_compile": None if first is None else bool(first.attrs.get("accepted") or first.attrs.get("stage") == "runtime"),
+        "llm_calls": len(llm_spans),
+        "replay_misses": sum(1 for s in llm_spans if s.attrs.get("replay_miss")),
+        "prompt_tokens": sum(s.attrs.get("prompt_tokens") or 0 for s in llm_spans),
+        "response_tokens": sum(s.attrs.get("response_tokens") or 0 for s in llm_spans),
+    }
+
+def run_kernel(kernel: dict, compilation_context: dict, checker: Checker, harness: MPIHarness, timeout: float) -> dict:
+    """Parallelizes one kernel and checks the result against its reference output."""
+    name = kernel["name"]
+    context = dict(compilation_context, project_dir=os.path.dirname(kernel["source"]), extra_flags=kernel.get("flags") or None)
+    if context.get("benchmark"):
+        context["benchmark"] = dict(context["benchmark"], run_args=shlex.split(kernel.get("run_args", "")))
+    record = {"kernel": name, "status": "failed", "correct": False, "attempts": 0, "wall_time": 0.0, "speedup": None, "error": ""}
+
+    orchestrator = Orchestrator()
+    start = time.perf_counter()
+    with trace_context(bench_kernel=name):
+        try:
+            code = orchestrator.run(kernel["source"], context)
+            record["status"] = "ok"
+        except Exception as e:
+            code = None
+            record["error"] = str(e).splitlines()[0] if str(e) else type(e).__name__
+    record["wall_time"] = time.perf_counter() - start
+    record["attempts"] = orchestrator.last_attempts
+    if orchestrator.last_benchmark and orchestrator.last_benchmark.get("best"):
+        record["speedup"] = orchestrator.last_benchmark["best"]["speedup"]
+    record.update(_kernel_metrics(name))
+
+    if code is not None:
+        with open(kernel["expected"], "r") as f:
+            expected = f.read()
+        stdout, error = run_program(checker, harness, code, kernel, timeout)
+        record["correct"] = error is None and outputs_match(stdout, expected, kernel.get("tolerance"))
+        if not record["correct"]:
+            record["error"] = error.splitlines()[0] if error else "output differs from the reference"
+    return record
+
+def summarize(records: list) -> dict:
+    """Suite-level aggregates of the per-kernel records."""
+    compiled = [r["first_try_compile"] for r in records if r["first_try_compile"] is not None]
+    speedups = [r["speedup"] for r in records if r["speedup"]]
+    return {
+        "kernels": len(records),
+        "succeeded": sum(1 for r in records if r["status"] == "ok"),
+        "correct": sum(1 for r in records if r["correct"]),
+        "first_try_compile_rate": sum(compiled) / len(compiled) if compiled else None,
+        "mean_attempts": sum(r["attempts"] for r in records) / len(records) if records else 0.0,
+        "llm_calls": sum(r["llm_calls"] for r in records),
+        "replay_misses": sum(r["replay_misses"] for r in records),
+        "tokens": sum(r["prompt_tokens"] + r["response_tokens"] for r in records),
+        "wall_time": sum(r["wall_time"] for r in records),
+        "geomean_speedup": math.exp(sum(math.log(s) for s in speedups) / len(speedups)) if speedups else None,
+    }
+
+def format_report(records: list, summary: dict) -> str:
+    """Per-kernel table plus the suite summary."""
+    header = (f"{'Kernel':<16} {'Status':<6} {'Correct':<7} {'1st try':<7} {'Attempts':>8} {'LLM calls':>9} "
+              f"{'Tokens':>8} {'Time (s)':>9} {'Speedup':>8}")
+    lines = [header, "-" * len(header)]
+    for r in records:
+        first_try = "-" if r["first_try_compile"] is None else ("yes" if r["first_try_compile"] else "no")
+        speedup = f"{r['speedup']:.2f}x" if r["speedup"] else "-"
+        lines.append(f"{r['kernel']:<16} {r['status']:<6} {'yes' if r['correct'] else 'no':<7} {first_try:<7} {r['attempts']:>8} "
+                     f"{r['llm_calls']:>9} {r['prompt_tokens'] + r['response_tokens']:>8} {r['wall_time']:>9.1f} {speedup:>8}")
+    lines.append("-" * len(header))
+    rate = summary["first_try_compile_rate"]
+    geomean = summary["geomean_speedup"]
+    lines.append(
+        f"{summary['correct']}/{summary['kernels']} correct, {summary['succeeded']}/{summary['kernels']} succeeded, "
+        f"first-try compile rate {'-' if rate is None else f'{rate * 100:.0f}%'}, mean attempts {summary['mean_attempts']:.2f}, "
+        f"{summary['llm_calls']} LLM calls ({summary['replay_misses']} replay misses), {summary['tokens']} tokens, "
+        f"{summary['wall_time']:.1f}s, geomean speedup {'-' if geomean is None else f'{geomean:.2f}x'}"
+    )
+    return "\n".join(lines)
+
+def _delta(old, new, fmt: str = "{:+.2f}") -> str:
+    if old is None or new is None:
+        return "-" if old == new else f"{old} -> {new}"
+    return fmt.format(new - old)
+
+def diff_reports(previous: dict, current: dict) -> tuple:
+    """
+    Compares two suite reports.
+    Returns:
+        tuple: (text of the comparison, list of kernel names that regressed in correctness)
+    """
+    old_kernels, new_kernels = previous["kernels"], current["kernels"]
+    lines = [f"Compared with the run of {previous.get('created', 'unknown time')}:"]
+    regressions = []
+    for name, new in new_kernels.items():
+        old = old_kernels.get(name)
+        if old is None:
+            lines.append(f"  {name}: new kernel")
+            continue
+        changes = []
+        if old["correct"] != new["correct"]:
+            changes.append("now correct" if new["correct"] else "NO LONGER CORRECT")
+            if not new["correct"]:
+                regressions.append(name)
+        if old["first_try_compile"] != new["first_try_compile"]:
+            changes.append(f"first-try compile {old['first_try_compile']} -> {new['first_try_compile']}")
+        for key, label in (("attempts", "attempts"), ("llm_calls", "LLM calls")):
+            if old[key] != new[key]:
+                changes.append(f"{label} {old[key]} -> {new[key]}")
+        old_tokens = old["prompt_tokens"] + old["response_tokens"]
+        new_tokens = new["prompt_tokens"] + new["response_tokens"]
+        if abs(new_tokens - old_tokens) > 0.05 * max(old_tokens, 1): # Estimates wobble by a few tokens between live and replay
+            changes.append(f"tokens {old_tokens} -> {new_tokens}")
+        if old["speedup"] and new["speedup"] and abs(new["speedup"] - old["speedup"]) / old["speedup"] > 0.1:
+            changes.append(f"speedup {old['speedup']:.2f}x -> {new['speedup']:.2f}x")
+        if changes:
+            lines.append(f"  {name}: {', '.join(changes)}")
+    for name in old_kernels.keys() - new_kernels.keys():
+        lines.append(f"  {name}: not run this time")
+
+    old_summary, new_summary = previous["summary"], current["summary"]
+    lines.append(
+        f"  suite: correct {_delta(old_summary['correct'], new_summary['correct'], '{:+d}')}, "
+        f"first-try compile rate {_delta(old_summary['first_try_compile_rate'], new_summary['first_try_compile_rate'])}, "
+        f"mean attempts {_delta(old_summary['mean_attempts'], new_summary['mean_attempts'])}, "
+        f"LLM calls {_delta(old_summary['llm_calls'], new_summary['llm_calls'], '{:+d}')}, "
+        f"tokens {_delta(old_summary['tokens'], new_summary['tokens'], '{:+d}')}, "
+        f"wall time {_delta(old_summary['wall_time'], new_summary['wall_time'], '{:+.1f}s')}, "
+        f"geomean speedup {_delta(old_summary['geomean_speedup'], new_summary['geomean_speedup'])}"
+    )
+    if len(lines) == 2:
+        lines.insert(1, "  no per-kernel changes")
+    return "\n".join(lines), regressions
+
+def latest_report(results_dir: str):
+    """Returns the path of the most recent suite report in results_dir, or None."""
+    reports = sorted(glob.glob(os.path.join(results_dir, "bench_*.json")))
+    return reports[-1] if reports else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the C kernel benchmark suite and compare it with the previous run.")
+    parser.add_argument("kernels", nargs="*", help="Kernel names to run (default: the whole suite)")
+    parser.add_argument("--suite", default=Config.BENCH_SUITE, help="Kernel manifest (default: %(default)s)")
+    store = parser.add_mutually_exclusive_group()
+    store.add_argument("--record", metavar="DIR", help="Call the LLM and record every response in DIR")
+    store.add_argument("--replay", metavar="DIR", help="Run offline, answering prompts only from responses recorded in DIR")
+    parser.add_argument("--llm-backend", choices=["groq", "openai"], help="Live backend: Groq (default) or an OpenAI-compatible server")
+    parser.add_argument("--llm-url", help="Base URL of the OpenAI-compatible server, e.g. http://localhost:8000/v1")
+    parser.add_argument("--llm-model", help="Model name to request (and to key recordings by)")
+    parser.add_argument("--baseline", help="Report to compare with (default: the previous run's report)")
+    parser.add_argument("--output", help="Where to write this run's report (default: BENCH_RESULTS_DIR/bench_<timestamp>.json)")
+    parser.add_argument("--no-benchmark", action="store_true", help="Skip runtime benchmarking (no speedups, faster)")
+    parser.add_argument("--threads", type=int, nargs="+", help="OMP_NUM_THREADS values to benchmark with")
+    parser.add_argument("--repetitions", type=int, help="Benchmark runs per configuration")
+    parser.add_argument("--min-speedup", type=float, help="Minimum speedup required to accept a result")
+    parser.add_argument("--run-timeout", type=float, default=Config.BENCHMARK_TIMEOUT, help="Seconds before a run is killed")
+    parser.add_argument("-k", "--candidates", type=int, help="Candidates generated per attempt")
+    parser.add_argument("--refine-mode", choices=["patch", "full"], help="How failed attempts are refined")
+    parser.add_argument("--no-rule-based", action="store_true", help="Always use the LLM, even for loops the rule-based fast path can handle")
+    parser.add_argument("--update-expected", action="store_true", help="Regenerate the reference outputs from the serial kernels and exit")
+    args = parser.parse_args()
+
+    try:
+        kernels = load_suite(_repo_path(args.suite), args.kernels)
+    except (OSError, ValueError) as e:
+        Logger.error(f"Could not load the suite: {e}", AGENT_NAME)
+        sys.exit(2)
+
+    if args.update_expected:
+        update_expected(kernels, args.run_timeout)
+        sys.exit(0)
+
+    try:
+        backend = create_backend(args.llm_backend, args.llm_url, args.llm_model, args.record, args.replay)
+    except ValueError as e:
+        Logger.error(str(e), AGENT_NAME)
+        sys.exit(2)
+    set_backend(backend)
+    set_tracing_enabled(True) # LLM calls, tokens and first-try compiles are read from the spans
+
+    compilation_context = {
+        "num_candidates": args.candidates,
+        "refine_mode": args.refine_mode,
+        "rule_based": not args.no_rule_based,
+        "resume": False # Every suite run must exercise the LLM and the checker, not return stored results
+    }
+    if not args.no_benchmark:
+        compilation_context["benchmark"] = {
+            "threads": args.threads,
+            "repetitions": args.repetitions,
+            "timeout": args.run_timeout,
+            "min_speedup": args.min_speedup
+        }
+
+    checker = Checker()
+    harness = MPIHarness(checker)
+    records = []
+    for i, kernel in enumerate(kernels, 1):
+        Logger.info(f"[{i}/{len(kernels)}] {kernel['name']}: {kernel.get('description', '')}", AGENT_NAME, LogColors.MAIN)
+        record = run_kernel(kernel, compilation_context, checker, harness, args.run_timeout)
+        records.append(record)
+        if record["correct"]:
+            Logger.success(f"{kernel['name']}: correct after {record['attempts']} attempt(s), {record['wall_time']:.1f}s.", AGENT_NAME)
+        else:
+            Logger.warning(f"{kernel['name']}: {record['error']}", AGENT_NAME)
+
+    summary = summarize(records)
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": machine_signature(),
+        "model": backend.model,
+        "llm": backend.name if backend.name not in ("record", "replay") else f"{backend.name}:{args.record or args.replay}",
+        "settings": {k: v for k, v in vars(args).items() if k not in ("kernels", "update_expected")},
+        "summary": summary,
+        "kernels": {r["kernel"]: r for r in records},
+    }
+    print("\n" + format_report(records, summary) + "\n")
+
+    results_dir = _repo_path(Config.BENCH_RESULTS_DIR)
+    baseline_path = args.baseline or latest_report(results_dir)
+    regressions = []
+    if baseline_path:
+        try:
+            with open(baseline_path, "r") as f:
+                previous = json.load(f)
+            comparison, regressions = diff_reports(previous, report)
+            print(comparison + "\n")
+        except (OSError, ValueError, KeyError) as e:
+            Logger.warning(f"Could not compare with {baseline_path}: {e}", AGENT_NAME)
+
+    output_path = args.output or os.path.join(results_dir, f"bench_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    Logger.info(f"Report written to {output_path}", AGENT_NAME, LogColors.MAIN)
+    # A kernel that used to be correct and no longer is fails the run, so CI can gate on it
+    sys.exit(1 if regressions else 0)
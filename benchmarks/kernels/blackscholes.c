@@ -0,0 +1,38 @@
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+static double cnd(double x) {
+    return 0.5 * erfc(-x / sqrt(2.0));
+}
+
+// Black-Scholes call/put pricing for a batch of options (math-heavy, independent iterations)
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 2000000;
+    double *spot = malloc(sizeof(double) * n);
+    double *strike = malloc(sizeof(double) * n);
+    double *years = malloc(sizeof(double) * n);
+    double *call = malloc(sizeof(double) * n);
+    double *put = malloc(sizeof(double) * n);
+    double rate = 0.02, vol = 0.3;
+    for (int i = 0; i < n; i++) {
+        spot[i] = 50.0 + (i % 100);
+        strike[i] = 60.0 + (i % 37);
+        years[i] = 0.25 + (i % 8) * 0.25;
+    }
+    for (int i = 0; i < n; i++) {
+        double sqrt_t = sqrt(years[i]);
+        double d1 = (log(spot[i] / strike[i]) + (rate + 0.5 * vol * vol) * years[i]) / (vol * sqrt_t);
+        double d2 = d1 - vol * sqrt_t;
+        double discount = strike[i] * exp(-rate * years[i]);
+        call[i] = spot[i] * cnd(d1) - discount * cnd(d2);
+        put[i] = discount * cnd(-d2) - spot[i] * cnd(-d1);
+    }
+    double total = 0.0;
+    for (int i = 0; i < n; i++) {
+        total += call[i] + put[i];
+    }
+    printf("%.6e\n", total);
+    free(spot); free(strike); free(years); free(call); free(put);
+    return 0;
+}
@@ -0,0 +1,40 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+#define K 5
+
+// 2D convolution of an image with a K x K filter
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 2048;
+    float *image = malloc(sizeof(float) * n * n);
+    float *out = malloc(sizeof(float) * n * n);
+    float filter[K][K];
+    for (int i = 0; i < K; i++) {
+        for (int j = 0; j < K; j++) {
+            filter[i][j] = (float)(1 + i + j) / 45.0f;
+        }
+    }
+    for (int i = 0; i < n * n; i++) {
+        image[i] = (float)((i * 31) % 255) / 255.0f;
+        out[i] = 0.0f;
+    }
+    for (int i = K / 2; i < n - K / 2; i++) {
+        for (int j = K / 2; j < n - K / 2; j++) {
+            float acc = 0.0f;
+            for (int fi = 0; fi < K; fi++) {
+                for (int fj = 0; fj < K; fj++) {
+                    acc += filter[fi][fj] * image[(i + fi - K / 2) * n + (j + fj - K / 2)];
+                }
+            }
+            out[i * n + j] = acc;
+        }
+    }
+    double checksum = 0.0;
+    for (int i = 0; i < n * n; i++) {
+        checksum += out[i];
+    }
+    printf("%.6e\n", checksum);
+    free(image);
+    free(out);
+    return 0;
+}
@@ -0,0 +1,50 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Covariance matrix of m variables over n samples (triangular inner loop)
+int main(int argc, char **argv) {
+    int m = argc > 1 ? atoi(argv[1]) : 500;
+    int n = argc > 2 ? atoi(argv[2]) : 1000;
+    double *data = malloc(sizeof(double) * n * m);
+    double *mean = malloc(sizeof(double) * m);
+    double *cov = malloc(sizeof(double) * m * m);
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < m; j++) {
+            data[i * m + j] = (double)(i * j % 97) / m;
+        }
+    }
+    for (int j = 0; j < m; j++) {
+        mean[j] = 0.0;
+        for (int i = 0; i < n; i++) {
+            mean[j] += data[i * m + j];
+        }
+        mean[j] /= n;
+    }
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < m; j++) {
+            data[i * m + j] -= mean[j];
+        }
+    }
+    for (int i = 0; i < m; i++) {
+        for (int j = i; j < m; j++) {
+            double sum = 0.0;
+            for (int k = 0; k < n; k++) {
+                sum += data[k * m + i] * data[k * m + j];
+            }
+            cov[i * m + j] = sum / (n - 1);
+            cov[j * m + i] = cov[i * m + j];
+        }
+    }
+    double trace = 0.0, total = 0.0;
+    for (int i = 0; i < m; i++) {
+        trace += cov[i * m + i];
+        for (int j = 0; j < m; j++) {
+            total += cov[i * m + j];
+        }
+    }
+    printf("%.6e %.6e\n", trace, total);
+    free(data);
+    free(mean);
+    free(cov);
+    return 0;
+}
@@ -0,0 +1,21 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Dot product of two long vectors (sum reduction)
+int main(int argc, char **argv) {
+    long n = argc > 1 ? atol(argv[1]) : 20000000;
+    double *x = malloc(sizeof(double) * n);
+    double *y = malloc(sizeof(double) * n);
+    for (long i = 0; i < n; i++) {
+        x[i] = (double)(i % 1000) / 1000.0;
+        y[i] = (double)((i * 3) % 1000) / 1000.0;
+    }
+    double result = 0.0;
+    for (long i = 0; i < n; i++) {
+        result += x[i] * y[i];
+    }
+    printf("%.6e\n", result);
+    free(x);
+    free(y);
+    return 0;
+}
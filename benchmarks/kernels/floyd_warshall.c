@@ -0,0 +1,30 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// All-pairs shortest paths (outer k loop carries a dependency, inner i/j loops are parallel)
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 600;
+    int *dist = malloc(sizeof(int) * n * n);
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < n; j++) {
+            dist[i * n + j] = (i == j) ? 0 : ((i * 7 + j * 13) % 29 == 0 ? 1 + (i + j) % 9 : 1000000);
+        }
+    }
+    for (int k = 0; k < n; k++) {
+        for (int i = 0; i < n; i++) {
+            for (int j = 0; j < n; j++) {
+                int through = dist[i * n + k] + dist[k * n + j];
+                if (through < dist[i * n + j]) {
+                    dist[i * n + j] = through;
+                }
+            }
+        }
+    }
+    long total = 0;
+    for (int i = 0; i < n * n; i++) {
+        total += dist[i] < 1000000 ? dist[i] : 0;
+    }
+    printf("%ld\n", total);
+    free(dist);
+    return 0;
+}
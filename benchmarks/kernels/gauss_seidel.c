@@ -0,0 +1,28 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// In-place Gauss-Seidel sweeps (reads values updated earlier in the same sweep)
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 1024;
+    int sweeps = argc > 2 ? atoi(argv[2]) : 20;
+    double *u = malloc(sizeof(double) * n * n);
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < n; j++) {
+            u[i * n + j] = (i == 0) ? 1.0 : 0.0;
+        }
+    }
+    for (int s = 0; s < sweeps; s++) {
+        for (int i = 1; i < n - 1; i++) {
+            for (int j = 1; j < n - 1; j++) {
+                u[i * n + j] = 0.25 * (u[(i - 1) * n + j] + u[(i + 1) * n + j] + u[i * n + j - 1] + u[i * n + j + 1]);
+            }
+        }
+    }
+    double checksum = 0.0;
+    for (int i = 0; i < n * n; i++) {
+        checksum += u[i];
+    }
+    printf("%.6e\n", checksum);
+    free(u);
+    return 0;
+}
@@ -0,0 +1,51 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Rank-2 update followed by two matrix-vector products (PolyBench gemver)
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 3000;
+    double alpha = 1.5, beta = 1.2;
+    double *a = malloc(sizeof(double) * n * n);
+    double *u1 = malloc(sizeof(double) * n), *v1 = malloc(sizeof(double) * n);
+    double *u2 = malloc(sizeof(double) * n), *v2 = malloc(sizeof(double) * n);
+    double *w = malloc(sizeof(double) * n), *x = malloc(sizeof(double) * n);
+    double *y = malloc(sizeof(double) * n), *z = malloc(sizeof(double) * n);
+    for (int i = 0; i < n; i++) {
+        u1[i] = i;
+        u2[i] = (i + 1) / (double)n / 2.0;
+        v1[i] = (i + 1) / (double)n / 4.0;
+        v2[i] = (i + 1) / (double)n / 6.0;
+        y[i] = (i + 1) / (double)n / 8.0;
+        z[i] = (i + 1) / (double)n / 9.0;
+        x[i] = 0.0;
+        w[i] = 0.0;
+        for (int j = 0; j < n; j++) {
+            a[i * n + j] = (double)(i * j % n) / n;
+        }
+    }
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < n; j++) {
+            a[i * n + j] = a[i * n + j] + u1[i] * v1[j] + u2[i] * v2[j];
+        }
+    }
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < n; j++) {
+            x[i] = x[i] + beta * a[j * n + i] * y[j];
+        }
+    }
+    for (int i = 0; i < n; i++) {
+        x[i] = x[i] + z[i];
+    }
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < n; j++) {
+            w[i] = w[i] + alpha * a[i * n + j] * x[j];
+        }
+    }
+    double checksum = 0.0;
+    for (int i = 0; i < n; i++) {
+        checksum += w[i];
+    }
+    printf("%.6e\n", checksum);
+    free(a); free(u1); free(v1); free(u2); free(v2); free(w); free(x); free(y); free(z);
+    return 0;
+}
@@ -0,0 +1,31 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Explicit 1D heat equation, 3-point stencil
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 1000000;
+    int steps = argc > 2 ? atoi(argv[2]) : 100;
+    double *u = malloc(sizeof(double) * n);
+    double *next = malloc(sizeof(double) * n);
+    for (int i = 0; i < n; i++) {
+        u[i] = (i > n / 4 && i < n / 2) ? 100.0 : 0.0;
+    }
+    next[0] = u[0];
+    next[n - 1] = u[n - 1];
+    for (int t = 0; t < steps; t++) {
+        for (int i = 1; i < n - 1; i++) {
+            next[i] = u[i] + 0.2 * (u[i - 1] - 2.0 * u[i] + u[i + 1]);
+        }
+        double *tmp = u;
+        u = next;
+        next = tmp;
+    }
+    double checksum = 0.0;
+    for (int i = 0; i < n; i++) {
+        checksum += u[i] * (i % 7);
+    }
+    printf("%.6e\n", checksum);
+    free(u);
+    free(next);
+    return 0;
+}
@@ -0,0 +1,26 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+#define BINS 256
+
+// Histogram of pseudo-random bytes (scattered increments)
+int main(int argc, char **argv) {
+    long n = argc > 1 ? atol(argv[1]) : 50000000;
+    unsigned char *data = malloc(n);
+    unsigned int state = 12345u;
+    for (long i = 0; i < n; i++) {
+        state = state * 1103515245u + 12345u;
+        data[i] = (unsigned char)(state >> 16);
+    }
+    long hist[BINS] = {0};
+    for (long i = 0; i < n; i++) {
+        hist[data[i]]++;
+    }
+    long weighted = 0;
+    for (int b = 0; b < BINS; b++) {
+        weighted += hist[b] * (b + 1);
+    }
+    printf("%ld %ld %ld\n", hist[0], hist[BINS - 1], weighted);
+    free(data);
+    return 0;
+}
@@ -0,0 +1,34 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// 5-point Jacobi relaxation on an n x n grid with fixed boundaries
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 1024;
+    int steps = argc > 2 ? atoi(argv[2]) : 100;
+    double *u = malloc(sizeof(double) * n * n);
+    double *v = malloc(sizeof(double) * n * n);
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < n; j++) {
+            u[i * n + j] = (i == 0 || j == 0) ? 1.0 : 0.0;
+            v[i * n + j] = u[i * n + j];
+        }
+    }
+    for (int t = 0; t < steps; t++) {
+        for (int i = 1; i < n - 1; i++) {
+            for (int j = 1; j < n - 1; j++) {
+                v[i * n + j] = 0.25 * (u[(i - 1) * n + j] + u[(i + 1) * n + j] + u[i * n + j - 1] + u[i * n + j + 1]);
+            }
+        }
+        double *tmp = u;
+        u = v;
+        v = tmp;
+    }
+    double checksum = 0.0;
+    for (int i = 0; i < n * n; i++) {
+        checksum += u[i];
+    }
+    printf("%.6e\n", checksum);
+    free(u);
+    free(v);
+    return 0;
+}
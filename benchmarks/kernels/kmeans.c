@@ -0,0 +1,63 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+#define DIM 4
+#define CLUSTERS 8
+
+// k-means: assign points to the nearest centroid and recompute centroids
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 1000000;
+    int iterations = argc > 2 ? atoi(argv[2]) : 5;
+    float *points = malloc(sizeof(float) * n * DIM);
+    int *labels = malloc(sizeof(int) * n);
+    float centroids[CLUSTERS][DIM];
+    for (int i = 0; i < n * DIM; i++) {
+        points[i] = (float)((i * 2654435761u) % 1000) / 100.0f;
+    }
+    for (int c = 0; c < CLUSTERS; c++) {
+        for (int d = 0; d < DIM; d++) {
+            centroids[c][d] = points[c * DIM + d];
+        }
+    }
+    for (int it = 0; it < iterations; it++) {
+        for (int i = 0; i < n; i++) {
+            int best = 0;
+            float best_dist = 1e30f;
+            for (int c = 0; c < CLUSTERS; c++) {
+                float dist = 0.0f;
+                for (int d = 0; d < DIM; d++) {
+                    float diff = points[i * DIM + d] - centroids[c][d];
+                    dist += diff * diff;
+                }
+                if (dist < best_dist) {
+                    best_dist = dist;
+                    best = c;
+                }
+            }
+            labels[i] = best;
+        }
+        double sums[CLUSTERS][DIM] = {{0}};
+        long counts[CLUSTERS] = {0};
+        for (int i = 0; i < n; i++) {
+            counts[labels[i]]++;
+            for (int d = 0; d < DIM; d++) {
+                sums[labels[i]][d] += points[i * DIM + d];
+            }
+        }
+        for (int c = 0; c < CLUSTERS; c++) {
+            for (int d = 0; d < DIM; d++) {
+                if (counts[c] > 0) {
+                    centroids[c][d] = (float)(sums[c][d] / counts[c]);
+                }
+            }
+        }
+    }
+    long label_sum = 0;
+    for (int i = 0; i < n; i++) {
+        label_sum += labels[i];
+    }
+    printf("%ld %.3f\n", label_sum, centroids[0][0]);
+    free(points);
+    free(labels);
+    return 0;
+}
@@ -0,0 +1,33 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+#define MAX_ITER 200
+
+// Mandelbrot set escape-time counts (irregular work per point)
+int main(int argc, char **argv) {
+    int width = argc > 1 ? atoi(argv[1]) : 800;
+    int height = argc > 2 ? atoi(argv[2]) : 600;
+    int *counts = malloc(sizeof(int) * width * height);
+    for (int y = 0; y < height; y++) {
+        for (int x = 0; x < width; x++) {
+            double cr = -2.0 + 3.0 * x / width;
+            double ci = -1.2 + 2.4 * y / height;
+            double zr = 0.0, zi = 0.0;
+            int iter = 0;
+            while (zr * zr + zi * zi < 4.0 && iter < MAX_ITER) {
+                double t = zr * zr - zi * zi + cr;
+                zi = 2.0 * zr * zi + ci;
+                zr = t;
+                iter++;
+            }
+            counts[y * width + x] = iter;
+        }
+    }
+    long total = 0;
+    for (int i = 0; i < width * height; i++) {
+        total += counts[i];
+    }
+    printf("%ld\n", total);
+    free(counts);
+    return 0;
+}
@@ -0,0 +1,34 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Dense matrix multiplication C = A * B
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 512;
+    double *a = malloc(sizeof(double) * n * n);
+    double *b = malloc(sizeof(double) * n * n);
+    double *c = malloc(sizeof(double) * n * n);
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < n; j++) {
+            a[i * n + j] = (double)((i * 7 + j * 3) % 17) / 17.0;
+            b[i * n + j] = (double)((i * 5 + j * 11) % 13) / 13.0;
+        }
+    }
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < n; j++) {
+            double sum = 0.0;
+            for (int k = 0; k < n; k++) {
+                sum += a[i * n + k] * b[k * n + j];
+            }
+            c[i * n + j] = sum;
+        }
+    }
+    double checksum = 0.0;
+    for (int i = 0; i < n * n; i++) {
+        checksum += c[i];
+    }
+    printf("%.6e\n", checksum);
+    free(a);
+    free(b);
+    free(c);
+    return 0;
+}
@@ -0,0 +1,26 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Minimum, maximum and argmax of a signal
+int main(int argc, char **argv) {
+    long n = argc > 1 ? atol(argv[1]) : 30000000;
+    double *signal = malloc(sizeof(double) * n);
+    for (long i = 0; i < n; i++) {
+        signal[i] = (double)((i * 7919) % 100003) - 50000.0;
+    }
+    double lo = signal[0];
+    double hi = signal[0];
+    long argmax = 0;
+    for (long i = 1; i < n; i++) {
+        if (signal[i] < lo) {
+            lo = signal[i];
+        }
+        if (signal[i] > hi) {
+            hi = signal[i];
+            argmax = i;
+        }
+    }
+    printf("%.1f %.1f %ld\n", lo, hi, argmax);
+    free(signal);
+    return 0;
+}
@@ -0,0 +1,26 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Monte Carlo estimate of pi with a counter-based generator (no shared RNG state between samples)
+static unsigned long long mix(unsigned long long x) {
+    x ^= x >> 33;
+    x *= 0xff51afd7ed558ccdULL;
+    x ^= x >> 33;
+    x *= 0xc4ceb9fe1a85ec53ULL;
+    x ^= x >> 33;
+    return x;
+}
+
+int main(int argc, char **argv) {
+    long samples = argc > 1 ? atol(argv[1]) : 20000000;
+    long inside = 0;
+    for (long i = 0; i < samples; i++) {
+        double x = (mix(2 * i) >> 11) * (1.0 / 9007199254740992.0);
+        double y = (mix(2 * i + 1) >> 11) * (1.0 / 9007199254740992.0);
+        if (x * x + y * y <= 1.0) {
+            inside++;
+        }
+    }
+    printf("%ld %.6f\n", inside, 4.0 * inside / samples);
+    return 0;
+}
@@ -0,0 +1,54 @@
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+// All-pairs gravitational n-body, a few leapfrog steps
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 2000;
+    int steps = argc > 2 ? atoi(argv[2]) : 5;
+    double dt = 0.01;
+    double *px = malloc(sizeof(double) * n), *py = malloc(sizeof(double) * n), *pz = malloc(sizeof(double) * n);
+    double *vx = malloc(sizeof(double) * n), *vy = malloc(sizeof(double) * n), *vz = malloc(sizeof(double) * n);
+    double *ax = malloc(sizeof(double) * n), *ay = malloc(sizeof(double) * n), *az = malloc(sizeof(double) * n);
+    for (int i = 0; i < n; i++) {
+        px[i] = cos(i * 0.1) * (1.0 + i % 10);
+        py[i] = sin(i * 0.1) * (1.0 + i % 10);
+        pz[i] = (i % 5) * 0.1;
+        vx[i] = vy[i] = vz[i] = 0.0;
+    }
+    for (int s = 0; s < steps; s++) {
+        for (int i = 0; i < n; i++) {
+            double fx = 0.0, fy = 0.0, fz = 0.0;
+            for (int j = 0; j < n; j++) {
+                double dx = px[j] - px[i];
+                double dy = py[j] - py[i];
+                double dz = pz[j] - pz[i];
+                double inv = 1.0 / sqrt(dx * dx + dy * dy + dz * dz + 1e-3);
+                double inv3 = inv * inv * inv;
+                fx += dx * inv3;
+                fy += dy * inv3;
+                fz += dz * inv3;
+            }
+            ax[i] = fx;
+            ay[i] = fy;
+            az[i] = fz;
+        }
+        for (int i = 0; i < n; i++) {
+            vx[i] += dt * ax[i];
+            vy[i] += dt * ay[i];
+            vz[i] += dt * az[i];
+            px[i] += dt * vx[i];
+            py[i] += dt * vy[i];
+            pz[i] += dt * vz[i];
+        }
+    }
+    double energy = 0.0;
+    for (int i = 0; i < n; i++) {
+        energy += 0.5 * (vx[i] * vx[i] + vy[i] * vy[i] + vz[i] * vz[i]);
+    }
+    printf("%.6e\n", energy);
+    free(px); free(py); free(pz);
+    free(vx); free(vy); free(vz);
+    free(ax); free(ay); free(az);
+    return 0;
+}
@@ -0,0 +1,15 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Numerical integration of 4 / (1 + x^2) on [0, 1]
+int main(int argc, char **argv) {
+    long steps = argc > 1 ? atol(argv[1]) : 100000000;
+    double step = 1.0 / (double)steps;
+    double sum = 0.0;
+    for (long i = 0; i < steps; i++) {
+        double x = (i + 0.5) * step;
+        sum += 4.0 / (1.0 + x * x);
+    }
+    printf("%.10f\n", step * sum);
+    return 0;
+}
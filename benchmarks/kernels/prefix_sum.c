@@ -0,0 +1,24 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Inclusive prefix sum (loop-carried dependency)
+int main(int argc, char **argv) {
+    long n = argc > 1 ? atol(argv[1]) : 50000000;
+    long *a = malloc(sizeof(long) * n);
+    long *s = malloc(sizeof(long) * n);
+    for (long i = 0; i < n; i++) {
+        a[i] = (i * 13) % 101 - 50;
+    }
+    s[0] = a[0];
+    for (long i = 1; i < n; i++) {
+        s[i] = s[i - 1] + a[i];
+    }
+    long checksum = 0;
+    for (long i = 0; i < n; i += 997) {
+        checksum ^= s[i];
+    }
+    printf("%ld %ld\n", s[n - 1], checksum);
+    free(a);
+    free(s);
+    return 0;
+}
@@ -0,0 +1,28 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// y = a * x + y, repeated
+int main(int argc, char **argv) {
+    long n = argc > 1 ? atol(argv[1]) : 10000000;
+    int reps = argc > 2 ? atoi(argv[2]) : 10;
+    float a = 1.0001f;
+    float *x = malloc(sizeof(float) * n);
+    float *y = malloc(sizeof(float) * n);
+    for (long i = 0; i < n; i++) {
+        x[i] = (float)(i % 100) * 0.01f;
+        y[i] = 1.0f;
+    }
+    for (int r = 0; r < reps; r++) {
+        for (long i = 0; i < n; i++) {
+            y[i] = a * x[i] + y[i];
+        }
+    }
+    double checksum = 0.0;
+    for (long i = 0; i < n; i += 997) {
+        checksum += y[i];
+    }
+    printf("%.6e\n", checksum);
+    free(x);
+    free(y);
+    return 0;
+}
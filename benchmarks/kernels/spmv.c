@@ -0,0 +1,42 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Sparse matrix-vector product in CSR format (banded matrix with irregular row lengths)
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 500000;
+    int reps = argc > 2 ? atoi(argv[2]) : 20;
+    int *row_ptr = malloc(sizeof(int) * (n + 1));
+    int *cols = malloc(sizeof(int) * n * 9);
+    double *vals = malloc(sizeof(double) * n * 9);
+    double *x = malloc(sizeof(double) * n);
+    double *y = malloc(sizeof(double) * n);
+    int nnz = 0;
+    for (int i = 0; i < n; i++) {
+        row_ptr[i] = nnz;
+        int width = 1 + i % 9;
+        for (int k = 0; k < width; k++) {
+            int col = (i + k * 37) % n;
+            cols[nnz] = col;
+            vals[nnz] = 1.0 / (1.0 + k);
+            nnz++;
+        }
+        x[i] = (double)(i % 10) * 0.1;
+    }
+    row_ptr[n] = nnz;
+    for (int r = 0; r < reps; r++) {
+        for (int i = 0; i < n; i++) {
+            double sum = 0.0;
+            for (int k = row_ptr[i]; k < row_ptr[i + 1]; k++) {
+                sum += vals[k] * x[cols[k]];
+            }
+            y[i] = sum;
+        }
+    }
+    double checksum = 0.0;
+    for (int i = 0; i < n; i++) {
+        checksum += y[i];
+    }
+    printf("%d %.6e\n", nnz, checksum);
+    free(row_ptr); free(cols); free(vals); free(x); free(y);
+    return 0;
+}
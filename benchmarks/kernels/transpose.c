@@ -0,0 +1,30 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+// Out-of-place matrix transpose (memory-bound, strided writes)
+int main(int argc, char **argv) {
+    int n = argc > 1 ? atoi(argv[1]) : 2048;
+    int reps = argc > 2 ? atoi(argv[2]) : 10;
+    double *a = malloc(sizeof(double) * n * n);
+    double *b = malloc(sizeof(double) * n * n);
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < n; j++) {
+            a[i * n + j] = i + j * 0.001;
+        }
+    }
+    for (int r = 0; r < reps; r++) {
+        for (int i = 0; i < n; i++) {
+            for (int j = 0; j < n; j++) {
+                b[j * n + i] = a[i * n + j];
+            }
+        }
+    }
+    double checksum = 0.0;
+    for (int i = 0; i < n; i++) {
+        checksum += b[i * n + (i * 7) % n];
+    }
+    printf("%.6e\n", checksum);
+    free(a);
+    free(b);
+    return 0;
+}
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import re
+import subprocess
+import threading
+import uuid
+from config import Config
+from concurrency import compile_slot
+from utils import Logger, LogColors
+
+AGENT_NAME = "BuildCache"
+
+# Flags whose objects embed absolute output paths for runtime data (gcov), so they must not be shared
+_UNCACHEABLE_FLAGS = ("--coverage", "-fprofile-arcs", "-ftest-coverage", "-fprofile-generate")
+_LINE_MARKER_RE = re.compile(r'^# \d+ "([^"<][^"]*)"', re.M) # `# 1 "include/v.h" 1`: the files preprocessing read
+
+class ObjectCache:
+    """
+    Content-addressed cache of compiled object files for the project's extra (unchanging) C files.
+    The key is a hash of the compiler, the compile flags and the *preprocessed* source, so a change
+    to the file or to any header it includes produces a new object. Within one process, the
+    preprocessing step itself is skipped while the size and mtime of the file and of every header
+    it included are unchanged.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        cache_dir = cache_dir or Config.OBJECT_CACHE_DIR
+        if not os.path.isabs(cache_dir):
+            # Relative paths are anchored at the repository root, next to results/
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), cache_dir)
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._memo = {} # (path, compiler, flags) -> (object path, stamps of the files it was preprocessed from), for this process
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_cacheable(flags: list) -> bool:
+        return not any(flag in _UNCACHEABLE_FLAGS for flag in flags)
+
+    def get_or_build(self, compiler: str, flags: list, source: str, cwd: str, timeout: float = 60):
+        """
+        Returns an object file for `source` compiled with `flags`, building it only on a cache miss.
+        Args:
+            compiler (str): Compiler executable (gcc, mpicc, ...).
+            flags (list): Compile flags (without -c/-o or the source).
+            source (str): Source path, absolute or relative to cwd.
+            cwd (str): Directory the compiler runs in (the project directory).
+            timeout (float): Seconds before a compile is killed.
+        Returns:
+            tuple: (object path or None, error message)
+        """
+        source_abs = source if os.path.isabs(source) else os.path.join(cwd, source)
+        if not os.path.isfile(source_abs):
+            return None, f"Cannot read extra file '{source}': no such file"
+
+        memo_key = (source_abs, compiler, tuple(flags))
+        with self._lock:
+            cached = self._memo.get(memo_key)
+        if cached and os.path.exists(cached[0]) and _stamps(list(dict(cached[1])), cwd) == cached[1]:
+            with self._lock:
+                self.hits += 1
+            return cached[0], ""
+
+        # Hash the preprocessed source so header changes invalidate the object too
+        with compile_slot():
+            pre = subprocess.run([compiler, "-E"] + flags + [source], capture_output=True, text=True, cwd=cwd, timeout=timeout)
+        if pre.returncode != 0:
+            return None, pre.stderr or pre.stdout
+        digest = hashlib.sha256()
+        digest.update(repr((compiler, flags)).encode("utf-8"))
+        digest.update(pre.stdout.encode("utf-8"))
+        key = digest.hexdigest()
+        stamps = _stamps([source_abs] + _LINE_MARKER_RE.findall(pre.stdout), cwd)
+        object_path = os.path.join(self.cache_dir, key[:2], f"{key}.o")
+
+        if os.path.exists(object_path):
+            Logger.info(f"Object cache hit for {source}.", AGENT_NAME, LogColors.CHECKER)
+            with self._lock:
+                self.hits += 1
+                self._memo[memo_key] = (object_path, stamps)
+            return object_path, ""
+
+        with self._lock:
+            self.misses += 1
+        Logger.info(f"Compiling {source} to a cached object.", AGENT_NAME, LogColors.CHECKER)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        # Build to a unique temp name and rename, so concurrent builds of the same object never see a partial file
+        tmp_path = f"{object_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with compile_slot():
+            result = subprocess.run([compiler, "-c"] + flags + [source, "-o", tmp_path], capture_output=True, text=True,
+                                    cwd=cwd, timeout=timeout)
+        if result.returncode != 0:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None, result.stderr or result.stdout
+        os.replace(tmp_path, object_path)
+        with self._lock:
+            self._memo[memo_key] = (object_path, stamps)
+        return object_path, ""
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters for this process."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+def _stamps(paths: list, cwd: str) -> tuple:
+    """(path, size, mtime) of each distinct file, with None for files that no longer exist."""
+    stamps = {}
+    for path in paths:
+        path = os.path.normpath(path if os.path.isabs(path) else os.path.join(cwd, path))
+        if path in stamps:
+            continue
+        try:
+            st = os.stat(path)
+            stamps[path] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            stamps[path] = None
+    return tuple(stamps.items())
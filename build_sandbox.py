@@ -0,0 +1,110 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+from config import Config
+from utils import Logger, LogColors
+
+AGENT_NAME = "BuildSandbox"
+
+SANDBOX_PREFIX = "paragineers_build_"
+
+_live_sandboxes = set()
+_live_lock = threading.Lock()
+_stale_swept = False
+
+def sandbox_root() -> str:
+    """Returns the directory sandboxes are created in: Config.BUILD_SANDBOX_ROOT, else tmpfs (/dev/shm) when writable, else the system temp dir."""
+    if Config.BUILD_SANDBOX_ROOT:
+        return Config.BUILD_SANDBOX_ROOT
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+def sweep_stale_sandboxes(max_age_seconds: float = None):
+    """Removes sandboxes left behind by crashed processes (older than max_age_seconds). Runs once per process."""
+    global _stale_swept
+    with _live_lock:
+        if _stale_swept:
+            return
+        _stale_swept = True
+    max_age_seconds = Config.BUILD_SANDBOX_STALE_SECONDS if max_age_seconds is None else max_age_seconds
+    root = sandbox_root()
+    now = time.time()
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(root, name)
+        if not name.startswith(SANDBOX_PREFIX):
+            continue
+        try:
+            if now - os.path.getmtime(path) > max_age_seconds:
+                shutil.rmtree(path, ignore_errors=True)
+                Logger.info(f"Removed stale build sandbox {path}.", AGENT_NAME, LogColors.CHECKER)
+        except OSError:
+            pass
+
+class BuildSandbox:
+    """
+    An isolated, uniquely named build directory (on tmpfs when available).
+    The generated C file and every build artifact live here, so concurrent builds never share
+    file names and cleanup is a single directory removal. Quoted includes that resolved
+    relative to the original source directory keep working via `compile_flags()`.
+    """
+
+    def __init__(self, src_dir: str):
+        self.src_dir = os.path.abspath(src_dir)
+        self.path = tempfile.mkdtemp(prefix=SANDBOX_PREFIX, dir=sandbox_root())
+        with _live_lock:
+            _live_sandboxes.add(self.path)
+
+    def file(self, name: str) -> str:
+        """Absolute path of a file inside the sandbox."""
+        return os.path.join(self.path, name)
+
+    def compile_flags(self) -> list:
+        """
+        Compiler flags that overlay the source directory onto the sandbox: `#include "x.h"` is searched
+        first next to the file (the sandbox), then in the original source directory. Auxiliary outputs
+        (coverage notes, -save-temps files) are kept in the sandbox too.
+        """
+        return ["-iquote", self.src_dir, "-dumpdir", self.path + os.sep]
+
+    def scrub(self, text: str) -> str:
+        """Strips the sandbox path from compiler output so diagnostics read like plain file names."""
+        return text.replace(self.path + os.sep, "")
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        with _live_lock:
+            _live_sandboxes.discard(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+        return False
+
+def release_path(path: str):
+    """Removes the sandbox that contains `path` (e.g. an executable kept for benchmarking)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    with _live_lock:
+        known = directory in _live_sandboxes
+        _live_sandboxes.discard(directory)
+    if known or os.path.basename(directory).startswith(SANDBOX_PREFIX):
+        shutil.rmtree(directory, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+@atexit.register
+def _cleanup_live_sandboxes():
+    with _live_lock:
+        paths = list(_live_sandboxes)
+        _live_sandboxes.clear()
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,316 @@
+import os
+import re
+
+# Lightweight, C-aware source splitting. This is not a full parser: it masks comments,
+# string and character literals and preprocessor lines, then matches braces at file scope.
+# That is enough to find top-level function definitions (and the outermost loop nests inside
+# them) in ordinary C translation units.
+
+_FUNCTION_HEADER_RE = re.compile(r"([A-Za-z_]\w*)\s*\((?:[^()]|\([^()]*\))*\)\s*$", re.S)
+_NON_FUNCTION_KEYWORDS = ("struct", "union", "enum", "typedef")
+_CONTROL_KEYWORDS = {"if", "for", "while", "switch", "return", "sizeof"}
+_LOOP_RE = re.compile(r"\b(for|while|do)\b")
+_INCLUDE_RE = re.compile(r"^\s*#\s*include\s*[<\"][^>\"]+[>\"].*$", re.M)
+_QUOTED_INCLUDE_RE = re.compile(r'^\s*#\s*include\s*"([^"]+)"', re.M)
+
+class CRegion:
+    """A contiguous span of a C file (typically one function definition)."""
+
+    def __init__(self, name: str, start: int, end: int, text: str, start_line: int, end_line: int):
+        self.name = name
+        self.start = start # Character offsets into the original code, end exclusive
+        self.end = end
+        self.text = text
+        self.start_line = start_line # 1-based, inclusive
+        self.end_line = end_line
+
+    def has_loop(self) -> bool:
+        return bool(_LOOP_RE.search(mask_code(self.text)))
+
+    def __repr__(self):
+        return f"CRegion({self.name!r}, lines {self.start_line}-{self.end_line})"
+
+def mask_code(code: str) -> str:
+    """
+    Returns a copy of the code of identical length in which comments, string/char literals
+    and preprocessor directives are replaced by spaces (newlines are kept), so that braces
+    and keywords can be matched safely.
+    """
+    out = list(code)
+    i = 0
+    n = len(code)
+    at_line_start = True
+    while i < n:
+        c = code[i]
+        if at_line_start and c == "#":
+            # Preprocessor directive, including backslash continuations
+            while i < n and code[i] != "\n":
+                if code[i] == "\\" and i + 1 < n and code[i + 1] == "\n":
+                    out[i] = " "
+                    i += 2
+                    continue
+                out[i] = " "
+                i += 1
+            continue
+        if c == "/" and i + 1 < n and code[i + 1] == "/":
+            while i < n and code[i] != "\n":
+                out[i] = " "
+                i += 1
+            continue
+        if c == "/" and i + 1 < n and code[i + 1] == "*":
+            end = code.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            for j in range(i, end):
+                if code[j] != "\n":
+                    out[j] = " "
+            i = end
+            continue
+        if c in ("\"", "'"):
+            quote = c
+            j = i + 1
+            while j < n and code[j] != quote and code[j] != "\n":
+                j += 2 if code[j] == "\\" else 1
+            for k in range(i + 1, min(j, n)):
+                out[k] = " "
+            i = j + 1
+            at_line_start = False
+            continue
+        if c == "\n":
+            at_line_start = True
+        elif not c.isspace():
+            at_line_start = False
+        i += 1
+    return "".join(out)
+
+def _line_of(code: str, offset: int) -> int:
+    return code.count("\n", 0, offset) + 1
+
+def find_functions(code: str) -> list:
+    """
+    Finds the top-level function definitions in a C file.
+    Returns:
+        list: CRegion objects in source order. Each region starts at the beginning of the line
+              holding the function's return type and ends after its closing brace.
+    """
+    masked = mask_code(code)
+    regions = []
+    depth = 0
+    stmt_start = 0 # Start of the current file-scope declaration
+    i = 0
+    n = len(masked)
+    while i < n:
+        c = masked[i]
+        if c == "{":
+            if depth == 0:
+                header = masked[stmt_start:i]
+                match = _FUNCTION_HEADER_RE.search(header)
+                first_word = header.split()[0] if header.split() else ""
+                if match and first_word not in _NON_FUNCTION_KEYWORDS and "=" not in header \
+                        and match.group(1) not in _CONTROL_KEYWORDS:
+                    close = _matching_brace(masked, i)
+                    if close == -1:
+                        break
+                    # Start at the beginning of the header's first non-blank line
+                    start = stmt_start
+                    while start < i and masked[start].isspace():
+                        start += 1
+                    start = code.rfind("\n", 0, start) + 1
+                    end = close + 1
+                    regions.append(CRegion(match.group(1), start, end, code[start:end],
+                                           _line_of(code, start), _line_of(code, close)))
+                    i = end
+                    stmt_start = end
+                    continue
+            depth += 1
+        elif c == "}":
+            depth = max(0, depth - 1)
+            if depth == 0:
+                stmt_start = i + 1
+        elif c == ";" and depth == 0:
+            stmt_start = i + 1
+        i += 1
+    return regions
+
+def _matching_brace(masked: str, open_index: int) -> int:
+    depth = 0
+    for i in range(open_index, len(masked)):
+        if masked[i] == "{":
+            depth += 1
+        elif masked[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def _skip_space(masked: str, i: int) -> int:
+    while i < len(masked) and masked[i].isspace():
+        i += 1
+    return i
+
+def _matching_paren(masked: str, open_index: int) -> int:
+    depth = 0
+    for i in range(open_index, len(masked)):
+        if masked[i] == "(":
+            depth += 1
+        elif masked[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def _statement_end(masked: str, i: int) -> int:
+    """Returns the index just past the statement starting at i (a block, a loop, an if/else or a simple statement)."""
+    i = _skip_space(masked, i)
+    if i >= len(masked):
+        return len(masked)
+    if masked[i] == "{":
+        close = _matching_brace(masked, i)
+        return len(masked) if close == -1 else close + 1
+    keyword = re.match(r"(for|while|if|switch|do|else)\b", masked[i:])
+    if keyword:
+        word = keyword.group(1)
+        j = i + len(word)
+        if word in ("for", "while", "if", "switch"):
+            j = _skip_space(masked, j)
+            close = _matching_paren(masked, j)
+            if close == -1:
+                return len(masked)
+            end = _statement_end(masked, close + 1)
+            if word == "if":
+                after = _skip_space(masked, end)
+                if re.match(r"else\b", masked[after:]):
+                    end = _statement_end(masked, after + 4)
+            return end
+        if word == "do":
+            end = _statement_end(masked, j)
+            semi = masked.find(";", end)
+            return len(masked) if semi == -1 else semi + 1
+        return _statement_end(masked, j)
+    semi = masked.find(";", i)
+    return len(masked) if semi == -1 else semi + 1
+
+def find_loop_nests(code: str, region: CRegion) -> list:
+    """
+    Finds the outermost `for` loop nests inside a function.
+    Each nest starts at the beginning of its line (so any pragma lines placed above it by an
+    expert replace nothing but whitespace) and ends after its body.
+    Returns:
+        list: CRegion objects named "<function>:loop@<line>", with offsets into `code`.
+    """
+    masked = mask_code(code)
+    body_start = masked.find("{", region.start, region.end)
+    nests = []
+    i = body_start + 1
+    for match in re.finditer(r"\bfor\b", masked[body_start + 1:region.end]):
+        start = body_start + 1 + match.start()
+        if start < i:
+            continue # Inside a nest we already recorded
+        end = min(_statement_end(masked, start), region.end)
+        line_start = code.rfind("\n", 0, start) + 1
+        if code[line_start:start].strip():
+            line_start = start # Loop does not begin its line; keep the prefix outside the region
+        start_line = _line_of(code, line_start)
+        nests.append(CRegion(f"{region.name}:loop@{start_line}", line_start, end, code[line_start:end],
+                             start_line, _line_of(code, end - 1)))
+        i = end
+    return nests
+
+def region_containing_line(regions: list, line: int):
+    """Returns the region that spans the given 1-based line, or None."""
+    for region in regions:
+        if region.start_line <= line <= region.end_line:
+            return region
+    return None
+
+def build_context(code: str, regions: list = None) -> str:
+    """
+    Builds the file-scope context an expert needs to understand one function in isolation:
+    everything outside function bodies (includes, macros, types, globals) plus a prototype
+    for every function.
+    """
+    regions = find_functions(code) if regions is None else regions
+    parts = []
+    cursor = 0
+    for region in regions:
+        parts.append(code[cursor:region.start])
+        brace = mask_code(region.text).find("{")
+        parts.append(region.text[:brace].rstrip() + ";\n")
+        cursor = region.end
+    parts.append(code[cursor:])
+    # Collapse the blank lines left behind by removed bodies
+    return re.sub(r"\n{3,}", "\n\n", "".join(parts)).strip()
+
+def extract_function(response: str, name: str):
+    """Returns the text of the function named `name` in an LLM response, or None if it is not there."""
+    for region in find_functions(response):
+        if region.name == name:
+            return region.text
+    return None
+
+def missing_includes(original_code: str, new_code: str) -> list:
+    """Returns #include lines present in new_code but not in original_code (e.g. <omp.h>)."""
+    existing = {line.strip() for line in _INCLUDE_RE.findall(original_code)}
+    added = []
+    for line in _INCLUDE_RE.findall(new_code):
+        if line.strip() not in existing and line.strip() not in added:
+            added.append(line.strip())
+    return added
+
+def add_includes(code: str, includes: list) -> str:
+    """Inserts include lines after the last existing #include (or at the top of the file)."""
+    if not includes:
+        return code
+    block = "\n".join(includes) + "\n"
+    matches = list(_INCLUDE_RE.finditer(code))
+    if not matches:
+        return block + code
+    insert_at = matches[-1].end() + 1
+    return code[:insert_at] + block + code[insert_at:]
+
+def included_headers(path: str, code: str, include_dirs: list = None, cache: dict = None) -> list:
+    """
+    Resolves the quoted #includes of a file the way gcc does (the including file's directory first, then
+    include_dirs), following them transitively. System headers are not followed.
+    Args:
+        path (str): The file's path; its directory anchors relative includes.
+        code (str): The file's contents.
+        include_dirs (list): Directories searched after the including file's own.
+        cache (dict): Header path -> contents, shared between calls to avoid re-reading headers.
+    Returns:
+        list: Normalized paths of the headers found, sorted.
+    """
+    cache = {} if cache is None else cache
+    found = []
+    pending = [(path, code)]
+    while pending:
+        including_path, text = pending.pop()
+        for name in _QUOTED_INCLUDE_RE.findall(text):
+            for directory in [os.path.dirname(including_path)] + list(include_dirs or []):
+                header = os.path.normpath(os.path.join(directory, name))
+                if not os.path.isfile(header):
+                    continue
+                if header not in found:
+                    found.append(header)
+                    if header not in cache:
+                        try:
+                            with open(header, "r") as f:
+                                cache[header] = f.read()
+                        except (OSError, UnicodeDecodeError):
+                            cache[header] = ""
+                    pending.append((header, cache[header]))
+                break
+    return sorted(found)
+
+def splice(code: str, replacements: dict) -> str:
+    """
+    Replaces regions of the original code.
+    Args:
+        code (str): The original code the regions were found in.
+        replacements (dict): CRegion -> new text.
+    Returns:
+        str: The code with every region swapped for its replacement.
+    """
+    result = code
+    for region in sorted(replacements, key=lambda r: r.start, reverse=True):
+        result = result[:region.start] + replacements[region].rstrip("\n") + result[region.end:]
+    return result
@@ -0,0 +1,52 @@
+import threading
+from contextlib import contextmanager
+from config import Config
+from utils import Logger, LogColors
+
+AGENT_NAME = "Concurrency"
+
+# Process-wide limits shared by every orchestration running in this process.
+_llm_semaphore = threading.BoundedSemaphore(Config.MAX_CONCURRENT_LLM_CALLS)
+_compile_semaphore = threading.BoundedSemaphore(Config.MAX_CONCURRENT_COMPILES)
+_limits = {"llm": Config.MAX_CONCURRENT_LLM_CALLS, "compile": Config.MAX_CONCURRENT_COMPILES}
+
+def configure_limits(max_llm_calls: int = None, max_compiles: int = None):
+    """
+    Resets the process-wide concurrency limits.
+    Call this before starting any orchestrations; slots held at the time of the call are not transferred.
+    Args:
+        max_llm_calls (int): Maximum number of LLM requests in flight at once.
+        max_compiles (int): Maximum number of compiler processes running at once.
+    """
+    global _llm_semaphore, _compile_semaphore
+    if max_llm_calls:
+        _llm_semaphore = threading.BoundedSemaphore(max_llm_calls)
+        _limits["llm"] = max_llm_calls
+    if max_compiles:
+        _compile_semaphore = threading.BoundedSemaphore(max_compiles)
+        _limits["compile"] = max_compiles
+    Logger.info(f"Concurrency limits: {_limits['llm']} LLM calls, {_limits['compile']} compiles.", AGENT_NAME, LogColors.MAIN)
+
+def get_limits() -> dict:
+    """Returns the current concurrency limits."""
+    return dict(_limits)
+
+@contextmanager
+def llm_slot():
+    """Blocks until an LLM request slot is free and holds it for the duration of the block."""
+    semaphore = _llm_semaphore
+    semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+@contextmanager
+def compile_slot():
+    """Blocks until a compile slot is free and holds it for the duration of the block."""
+    semaphore = _compile_semaphore
+    semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
@@ -1,3 +1,5 @@
+import os
+
 class Config:
     """Static configuration settings."""
     MODEL_NAME = "llama-3.3-70b-versatile"  
@@ -5,6 +7,137 @@ class Config:
     TEMP = 0.1  
     MAX_TOKENS = 2048 
 
+    # --- LLM backend ---
+    LLM_BACKEND = os.environ.get("PARAGINEERS_LLM_BACKEND", "groq")  # "groq" or "openai" (any OpenAI-compatible server)
+    LLM_BASE_URL = os.environ.get("PARAGINEERS_LLM_URL", "http://localhost:8000/v1")  # Endpoint for the "openai" backend
+    LLM_LOCAL_MODEL = None  # Model name for the "openai" backend; MODEL_NAME when unset
+    LLM_API_KEY_ENV = "LLM_API_KEY"  # Environment variable holding the "openai" backend's key (optional for local servers)
+    LLM_REQUEST_TIMEOUT = 300  # Seconds before a request to the "openai" backend is abandoned
+
+    # --- Streaming and truncation recovery ---
+    STREAM_RESPONSES = True  # Stream replies so truncation and non-code output are caught as they happen
+    MAX_CONTINUATIONS = 2  # Continuation requests for a reply cut off at MAX_TOKENS before giving up
+    STREAM_CODE_CHECK_CHARS = 300  # Abort a code reply whose first this-many characters contain no code at all
+    NON_CODE_RETRIES = 1  # Re-asks (with NON_CODE_REMINDER) after a reply is aborted as non-code
+
+    # --- LLM Response Cache ---
+    CACHE_ENABLED = True  # Set PARAGINEERS_NO_CACHE=1 or pass --no-cache to bypass
+    CACHE_DIR = ".llm_cache"
+    CACHE_MAX_BYTES = 200 * 1024 * 1024  # Evict oldest entries beyond this total size
+    CACHE_MAX_AGE_SECONDS = 7 * 24 * 3600  # Entries older than this are treated as misses
+
+    # --- Run store ---
+    RUN_STORE_ENABLED = True  # Checkpoint every attempt; set PARAGINEERS_NO_RUN_STORE=1 to disable
+    RUN_STORE_PATH = ".runs.sqlite"  # SQLite database of runs and attempts, keyed by source/context/expert/model hash
+
+    # --- Service mode (service.py) ---
+    SERVICE_HOST = "127.0.0.1"  # Keep it local: the API has no authentication
+    SERVICE_PORT = 8765
+    SERVICE_SOCKET = None  # Unix socket path; when set, used instead of host/port
+    SERVICE_WORKERS = 2  # Jobs processed at once, each worker with its own warm Orchestrator
+    SERVICE_MAX_QUEUED = 1000  # Submissions beyond this many waiting jobs get HTTP 503
+    SERVICE_JOB_TTL_SECONDS = 3600  # Finished jobs are kept this long for status/result queries
+    SERVICE_POLL_INTERVAL = 0.5  # Seconds between the submit client's status polls
+
+    # --- Build ---
+    OBJECT_CACHE_DIR = ".build_cache"  # Cached objects for the project's extra C files
+    BUILD_SANDBOX_ROOT = None  # Directory for per-build sandboxes; None uses /dev/shm when available, else the system temp dir
+    BUILD_SANDBOX_STALE_SECONDS = 6 * 3600  # Sandboxes older than this (left by crashed runs) are swept at startup
+
+    # --- Compiler diagnostics digest (diagnostics.py) ---
+    DIAGNOSTIC_DIGEST_ENABLED = True  # Send refine prompts a deduplicated, root-cause-first digest instead of raw compiler output
+    DIAGNOSTIC_MAX_ENTRIES = 8  # Root diagnostics listed; the rest are counted
+    DIAGNOSTIC_MAX_CHARS = 2500  # Upper bound on the digest's length
+    DIAGNOSTIC_SNIPPET_LINES = 3  # Lines of gcc's source excerpt kept per diagnostic (line, caret, fix-it hint)
+    DIAGNOSTIC_MAX_NOTES = 2  # Notes kept per diagnostic
+
+    # --- Concurrency (batch mode) ---
+    MAX_CONCURRENT_FILES = 8  # Orchestrations running at once
+    MAX_CONCURRENT_LLM_CALLS = 4  # In-flight LLM requests across all orchestrations
+    MAX_CONCURRENT_COMPILES = os.cpu_count() or 2  # Compiler processes across all orchestrations
+
+    # --- Async client rate limiting ---
+    GROQ_REQUESTS_PER_MINUTE = 30
+    GROQ_TOKENS_PER_MINUTE = 12000  # Prompt + completion tokens, as Groq counts them
+    RATE_LIMIT_MAX_RETRIES = 5  # Retries on HTTP 429 before giving up
+    RATE_LIMIT_BASE_BACKOFF = 2.0  # Seconds; doubled on each consecutive 429 unless Retry-After is given
+    RATE_LIMIT_MAX_BACKOFF = 60.0
+    RATE_LIMIT_MIN_SCALE = 0.1  # Lowest fraction of the configured rate the limiter will back off to
+
+    # --- Runtime benchmarking ---
+    BENCHMARK_ENABLED = False  # Also enabled per run with --benchmark
+    BENCHMARK_THREADS = [1, 2, 4]  # OMP_NUM_THREADS values to time the parallel build with
+    BENCHMARK_REPETITIONS = 3  # Runs per configuration; the median is used
+    BENCHMARK_TIMEOUT = 60  # Seconds before a single run is killed
+    BENCHMARK_MIN_SPEEDUP = 1.0  # Reject results whose best speedup is below this
+    MPI_LAUNCHER = "mpirun"  # Launcher for benchmarking MPI results
+    MPI_LAUNCHER_ARGS = []  # Extra launcher arguments, e.g. ["--bind-to", "core"]
+    MPI_RANKS = [1, 2, 4]  # -np values to benchmark MPI results with
+
+    # --- Region chunking for large files ---
+    CHUNK_THRESHOLD_TOKENS = MAX_TOKENS // 2  # Files (and functions) above this estimated size are split into regions
+
+    # --- Profile-guided hot-region selection ---
+    PROFILE_ENABLED = False  # Also enabled per run with --profile
+    PROFILE_TOP_N = 3  # Hot regions passed to the expert
+    PROFILE_MIN_SHARE = 0.05  # Regions below this fraction of runtime are treated as cold
+
+    # --- Static loop analysis and paradigm cost model ---
+    ANALYSIS_DEFAULT_TRIP_COUNT = 100  # Assumed iterations for loops whose bounds cannot be evaluated
+    ANALYSIS_MATH_CALL_COST = 8  # Operations counted per sqrt/exp/pow/... call
+    ANALYSIS_MIN_WORK = 1e5  # Parallel loops with fewer estimated operations are left serial
+    ANALYSIS_MPI_MIN_WORK = 1e10  # Work above which distributing across processes can pay off
+    ANALYSIS_MPI_MIN_RATIO = 4.0  # Operations per array access needed before MPI's data movement is worth it
+    ANALYSIS_ALLOW_SKIP = True  # Return the code unchanged when every nest has too little work
+    RULE_BASED_ENABLED = True  # Try LLM-free pragma insertion on provably safe loops before the OpenMP expert
+
+    # --- Cache locality (before parallelization) ---
+    LOCALITY_ENABLED = False  # Also enabled per run with --locality
+    LOCALITY_HOT_SHARE = 0.05  # Nests below this share of the estimated work are left alone
+    LOCALITY_MAX_ROUNDS = 2  # LLM proposals per run; each later round starts from the best code so far
+    LOCALITY_CANDIDATES = 1  # Proposals generated concurrently per round
+    LOCALITY_TILE_SIZES = [16, 32, 64, 128, 256]  # Values tried for each TILE_* macro of a proposal
+    LOCALITY_REPETITIONS = 3  # Timing runs per variant; the median is used
+    LOCALITY_MIN_GAIN = 0.05  # A variant must be this much faster than the best so far to be kept
+
+    # --- OpenMP autotuning ---
+    AUTOTUNE_ENABLED = False  # Also enabled per run with --autotune
+    AUTOTUNE_DB_DIR = ".tuning_db"  # Winning variants, keyed by source hash and machine signature
+    AUTOTUNE_SCHEDULES = ["static", "dynamic", "guided"]
+    AUTOTUNE_CHUNK_SIZES = [None, 1, 16, 64]  # None leaves the chunk size to the runtime
+    AUTOTUNE_PROC_BIND = [None, "close", "spread"]  # None leaves thread placement to the runtime
+    AUTOTUNE_THREADS = None  # num_threads values to try; None tries the default and powers of two up to the core count
+    AUTOTUNE_REPETITIONS = 3  # Timing runs per variant; the median is used
+    AUTOTUNE_MAX_VARIANTS = 40  # Upper bound on variants built and timed per tuning run
+    AUTOTUNE_MIN_GAIN = 0.03  # A variant must be this much faster than the best so far to replace it
+
+    # --- SIMD vectorization ---
+    VECTORIZE_ENABLED = False  # Also enabled per run with --vectorize
+    VECTORIZE_MAX_ROUNDS = 3  # LLM rounds spent on loops GCC's vectorizer missed
+    VECTORIZE_HOT_SHARE = 0.05  # Inner loops of nests with at least this share of the estimated work count as hot
+    VECTORIZE_TOLERANCE = 0.02  # When benchmarking, a variant may be this much slower (timing noise) and still be kept
+
+    # --- Speculative multi-candidate generation ---
+    NUM_CANDIDATES = 1  # Candidates generated per process call; >1 enables the compile-and-time tournament
+    CANDIDATE_TEMPERATURES = [0.1, 0.4, 0.7]  # Combined with the hints below; each candidate gets a distinct pair
+    CANDIDATE_PROMPT_HINTS = [  # K is capped at the number of distinct (temperature, hint) pairs
+        "",
+        "Strategy hint: parallelize only the outermost loop of each hot loop nest and keep the inner loops serial.",
+        "Strategy hint: prefer fewer, larger parallel regions; use collapse() on perfectly nested loops and reduction() for accumulations.",
+    ]
+
+    # --- Benchmark suite (bench.py) ---
+    BENCH_SUITE = "benchmarks/suite.json"  # Kernel manifest, relative to the repository root
+    BENCH_RESULTS_DIR = "benchmarks/results"  # Where each run's JSON report is written and the previous one is found
+    BENCH_REL_TOL = 1e-4  # Relative tolerance for numbers in a kernel's output vs. its reference (overridden by "tolerance" in the suite)
+    BENCH_CHECK_RANKS = 2  # Ranks used to check the output of MPI results
+
+    # --- Tracing ---
+    TRACE_ENABLED = False  # Record per-stage timing spans; also enabled per run with --trace
+
+    # --- Refinement ---
+    REFINE_MODE = "patch"  # "patch": ask for a diff against the attempted code; "full": regenerate the whole file
+
     # --- Prompts ---
     # System-level instruction (optional, can be pre-pended by the agent)
     SYSTEM_ROLE_C_PARALLELIZER = (
@@ -15,6 +148,39 @@ class Config:
         "Preserve all existing functionality and comments unless directly related to parallelization changes."
     )
 
+    SYSTEM_ROLE_C_PATCHER = (
+        "You are an expert C programmer specialized in code parallelization. "
+        "You fix parallelized C code by editing only the lines that need to change. "
+        "Only output the patch. Do not include any explanations, apologies, or extraneous text."
+    )
+
+    # Shared by the patch-mode refine prompts below
+    PATCH_FORMAT_INSTRUCTIONS = (
+        "Return only a unified diff against the numbered code above, inside a ```diff block. "
+        "Use hunk headers like '@@ -12,3 +12,4 @@' with the line numbers from the listing, "
+        "copy context lines exactly (without the line-number prefix), and keep hunks small.\n"
+        "Alternatively, return line-range edits, one per block:\n"
+        "### replace 12-14\n<replacement lines>\n"
+        "### insert after 20\n<new lines>\n"
+        "### delete 31-33"
+    )
+
+    # Sent when a reply stopped at the output token limit; the model picks up where it left off
+    CONTINUATION_PROMPT_TEMPLATE = (
+        "{prompt}\n\n"
+        "Your previous answer to this request was cut off at the output limit. Here it is, exactly as far as it got:\n"
+        "<<<PARTIAL\n{partial}\nPARTIAL>>>\n"
+        "Continue from exactly where it stopped, starting with the next character. "
+        "Do not repeat anything already written, do not restart the answer, and do not add explanations. "
+        "Close any code block that is still open."
+    )
+
+    # Appended to a prompt whose first reply was aborted for containing no code
+    NON_CODE_REMINDER = (
+        "\nIMPORTANT: Your reply must start with the requested code or patch. "
+        "Do not write any explanation, summary, apology or question."
+    )
+
     # --- OpenMP Prompts ---
     OMP_PROCESS_PROMPT_TEMPLATE = (
         f"{SYSTEM_ROLE_C_PARALLELIZER}\n"
@@ -51,6 +217,62 @@ class Config:
         "Return only the complete, corrected, and compilable C code with OpenMP directives."
     )
 
+    OMP_PATCH_REFINE_PROMPT_TEMPLATE = (
+        f"{SYSTEM_ROLE_C_PATCHER}\n"
+        "The following OpenMP C code (shown with line numbers) resulted in compilation errors or runtime issues.\n"
+        "```c\n"
+        "{numbered_code}\n"
+        "```\n"
+        "Compilation/Runtime Errors:\n"
+        "```\n"
+        "{errors}\n"
+        "```\n"
+        "Fix the OpenMP pragmas, data sharing clauses (shared, private, firstprivate, lastprivate, reduction), "
+        "loop scheduling, or other necessary aspects, keeping the program's logic unchanged.\n"
+        f"{PATCH_FORMAT_INSTRUCTIONS}"
+    )
+
+    # --- OpenMP Region Prompts (large files are parallelized one function or loop nest at a time) ---
+    OMP_REGION_PROMPT_TEMPLATE = (
+        f"{SYSTEM_ROLE_C_PARALLELIZER}\n"
+        "The following {region_kind} is part of a larger C file that is being parallelized with OpenMP one region at a time.\n"
+        "File-level context (for reference only; do not modify or repeat it):\n"
+        "```c\n"
+        "{context}\n"
+        "```\n"
+        "{region_kind_title} to parallelize:\n"
+        "```c\n"
+        "{code}\n"
+        "```\n"
+        "Add '#pragma omp parallel for' to the suitable loops, with correct data sharing clauses (shared, private, reduction).\n"
+        "If you call OpenMP runtime functions, put `#include <omp.h>` on the first line of your answer.\n"
+        "Return only the modified {region_kind}, not the rest of the file."
+    )
+
+    OMP_REGION_REFINE_PROMPT_TEMPLATE = (
+        f"{SYSTEM_ROLE_C_PARALLELIZER}\n"
+        "The following {region_kind} is part of a larger C file being parallelized with OpenMP. "
+        "The previous attempt for this region produced compilation errors.\n"
+        "File-level context (for reference only; do not modify or repeat it):\n"
+        "```c\n"
+        "{context}\n"
+        "```\n"
+        "Original {region_kind}:\n"
+        "```c\n"
+        "{original_code}\n"
+        "```\n"
+        "Attempted OpenMP {region_kind}:\n"
+        "```c\n"
+        "{attempted_code}\n"
+        "```\n"
+        "Compilation errors for this region:\n"
+        "```\n"
+        "{errors}\n"
+        "```\n"
+        "Fix the OpenMP directives and clauses so the region compiles, keeping the original logic unchanged.\n"
+        "Return only the corrected {region_kind}, not the rest of the file."
+    )
+
     # --- MPI Prompts ---
     MPI_PROCESS_PROMPT_TEMPLATE = (
         f"{SYSTEM_ROLE_C_PARALLELIZER}\n"
@@ -90,4 +312,139 @@ class Config:
         "Pay close attention to buffer sizes, data types, tags, and communicator arguments in MPI calls.\n"
         "Ensure that the fundamental logic of the original code remains unchanged.\n"
         "Return only the complete, corrected, and compilable C code with MPI parallelization."
-    )
\ No newline at end of file
+    )
+
+    MPI_PATCH_REFINE_PROMPT_TEMPLATE = (
+        f"{SYSTEM_ROLE_C_PATCHER}\n"
+        "The following MPI C code (shown with line numbers) resulted in compilation errors or runtime issues.\n"
+        "```c\n"
+        "{numbered_code}\n"
+        "```\n"
+        "Compilation/Runtime Errors:\n"
+        "```\n"
+        "{errors}\n"
+        "```\n"
+        "Correct the MPI setup, data distribution, work division or communication, paying close attention to buffer sizes, "
+        "data types, tags, and communicator arguments, and keep the program's logic unchanged.\n"
+        f"{PATCH_FORMAT_INSTRUCTIONS}"
+    )
+
+    # --- Hybrid MPI+OpenMP Prompts ---
+    HYBRID_PROCESS_PROMPT_TEMPLATE = (
+        f"{SYSTEM_ROLE_C_PARALLELIZER}\n"
+        "The following C code needs to be parallelized with MPI across processes and OpenMP threads within each process.\n"
+        "This typically involves:\n"
+        "1. Adding `<mpi.h>` and `<omp.h>`.\n"
+        "2. Initializing MPI with MPI_Init_thread requesting MPI_THREAD_FUNNELED, and finalizing it with MPI_Finalize.\n"
+        "3. Getting rank and size (MPI_Comm_rank, MPI_Comm_size).\n"
+        "4. Decomposing the data and the outermost parallel loop into contiguous blocks, one per rank.\n"
+        "5. Adding `#pragma omp parallel for` (with private/reduction/schedule clauses as needed) to the loops each rank executes on its block.\n"
+        "6. Exchanging and combining results with MPI collectives (MPI_Bcast, MPI_Scatterv, MPI_Gatherv, MPI_Allreduce, etc.) "
+        "called only outside OpenMP parallel regions, from the master thread.\n"
+        "Focus on parallelizing the main computational loops.\n"
+        "Here is the C code:\n"
+        "```c\n"
+        "{code}\n"
+        "```\n"
+        "Return only the complete, modified C code with hybrid MPI+OpenMP parallelization."
+    )
+
+    HYBRID_REFINE_PROMPT_TEMPLATE = (
+        f"{SYSTEM_ROLE_C_PARALLELIZER}\n"
+        "The previous attempt to parallelize the C code with hybrid MPI+OpenMP resulted in compilation errors or runtime issues.\n"
+        "Original C Code:\n"
+        "```c\n"
+        "{original_code}\n"
+        "```\n"
+        "Attempted MPI+OpenMP Code:\n"
+        "```c\n"
+        "{attempted_code}\n"
+        "```\n"
+        "Compilation/Runtime Errors:\n"
+        "```\n"
+        "{errors}\n"
+        "```\n"
+        "Please analyze the errors and the attempted code. Correct the rank-level decomposition and communication, "
+        "or the OpenMP directives and clauses within each rank.\n"
+        "Make sure MPI is initialized with MPI_Init_thread and that no MPI call is made from inside an OpenMP parallel region.\n"
+        "Ensure that the fundamental logic of the original code remains unchanged.\n"
+        "Return only the complete, corrected, and compilable C code with hybrid MPI+OpenMP parallelization."
+    )
+
+    HYBRID_PATCH_REFINE_PROMPT_TEMPLATE = (
+        f"{SYSTEM_ROLE_C_PATCHER}\n"
+        "The following hybrid MPI+OpenMP C code (shown with line numbers) resulted in compilation errors or runtime issues.\n"
+        "```c\n"
+        "{numbered_code}\n"
+        "```\n"
+        "Compilation/Runtime Errors:\n"
+        "```\n"
+        "{errors}\n"
+        "```\n"
+        "Correct the MPI decomposition and communication or the OpenMP directives within each rank. Keep MPI calls "
+        "outside OpenMP parallel regions and keep the program's logic unchanged.\n"
+        f"{PATCH_FORMAT_INSTRUCTIONS}"
+    )
+
+    # --- SIMD Vectorization Prompts ---
+    VECTORIZE_PATCH_PROMPT_TEMPLATE = (
+        f"{SYSTEM_ROLE_C_PATCHER}\n"
+        "The following parallel C code (shown with line numbers) compiles with gcc -O3, but GCC's vectorizer could not "
+        "vectorize some of its hot inner loops.\n"
+        "```c\n"
+        "{numbered_code}\n"
+        "```\n"
+        "Vectorizer report for the hot loops (line numbers refer to the listing):\n"
+        "```\n"
+        "{errors}\n"
+        "```\n"
+        "Make these loops vectorizable without changing the program's results: add `#pragma omp simd` "
+        "(with reduction() clauses for accumulations) where iterations are independent, mark non-aliasing pointer "
+        "parameters `restrict`, hoist loop-invariant loads and branches, replace conditionals with branch-free "
+        "expressions, or restructure the loop so the innermost loop runs over contiguous memory. Do not touch loops "
+        "with a true loop-carried dependence, and keep the existing thread-level pragmas.\n"
+        f"{PATCH_FORMAT_INSTRUCTIONS}"
+    )
+
+    VECTORIZE_PROMPT_TEMPLATE = (
+        f"{SYSTEM_ROLE_C_PARALLELIZER}\n"
+        "The following parallel C code compiles with gcc -O3, but GCC's vectorizer could not vectorize some of its hot inner loops.\n"
+        "```c\n"
+        "{code}\n"
+        "```\n"
+        "Vectorizer report for the hot loops:\n"
+        "```\n"
+        "{report}\n"
+        "```\n"
+        "Make these loops vectorizable without changing the program's results: add `#pragma omp simd` "
+        "(with reduction() clauses for accumulations) where iterations are independent, mark non-aliasing pointer "
+        "parameters `restrict`, hoist loop-invariant loads and branches, replace conditionals with branch-free "
+        "expressions, or restructure the loop so the innermost loop runs over contiguous memory. Keep the existing "
+        "thread-level pragmas. Return the complete modified C code."
+    )
+
+    # --- Cache Locality Prompts ---
+    LOCALITY_PROMPT_TEMPLATE = (
+        "You are an expert C programmer specialized in performance optimization for memory hierarchies. "
+        "Ensure the modified code is complete, correct, and compilable. Only output the complete, modified C code. "
+        "Do not include any explanations, apologies, or extraneous text.\n"
+        "The following serial C code is memory-bound. Before it is parallelized, make its hot loop nests cache-friendly.\n"
+        "```c\n"
+        "{code}\n"
+        "```\n"
+        "Hot loop nests:\n"
+        "{hot_loops}\n"
+        "Apply the transformations that fit:\n"
+        "- Loop interchange, so that the innermost loop walks memory with stride 1.\n"
+        "- Tiling (blocking) of nests that reuse data across iterations, such as matrix products and stencils. Write every "
+        "tile size as a file-scope macro named TILE_<something> (for example `#define TILE_I 64`), and use the macros "
+        "rather than literal sizes, because the sizes will be tuned by timing. Handle bounds that are not a multiple of the tile "
+        "with a single comparison, `i < (ii + TILE_I < N ? ii + TILE_I : N)`, not `i < ii + TILE_I && i < N`, so the loops "
+        "stay in the canonical form OpenMP can parallelize.\n"
+        "- Array-of-structs to struct-of-arrays, when the hot loops read only some fields of an array of structs. "
+        "Update every use of the array.\n"
+        "Keep the code serial (no OpenMP or MPI) and keep its output exactly the same: for every accumulated value, keep "
+        "the order in which terms are added. Leave the code unchanged if none of the transformations applies.\n"
+        "{feedback}"
+        "Return the complete modified C code."
+    )
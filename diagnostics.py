@@ -0,0 +1,240 @@
+import re
+from config import Config
+
+# Turns gcc/mpicc/ld output into a short digest for refine prompts. Raw stderr repeats itself
+# (one report per undeclared use, per inlined copy, per reference to a missing symbol) and a
+# single syntax error drags a tail of follow-on errors behind it. The digest keeps each distinct
+# diagnostic once, folds the follow-on errors into their root, puts root causes first and is
+# capped in size. Entries keep gcc's "file:line:col: severity: message" form, which the experts
+# (and per-function refinement) match on.
+
+_LOCATED_RE = re.compile(r"^(?P<file>[^:\s][^:]*):(?P<line>\d+):(?:(?P<column>\d+):)?\s*(?P<severity>fatal error|error|warning|note):\s*(?P<message>.*)$")
+_TOOL_RE = re.compile(r"^(?P<file>[\w.+-]+):\s*(?P<severity>fatal error|error|warning|note):\s*(?P<message>.*)$") # "cc1: fatal error: ...", "gcc: error: ..."
+_LINK_RE = re.compile(r"^(?:\S*\bld(?:\.\w+)?:\s*)?(?P<file>[^:\s]+):\([^)]*\):\s*(?P<message>.*)$") # "x.c:(.text+0x1a): undefined reference to `foo'"
+_LINKER_RE = re.compile(r"^\S*\bld(?:\.\w+)?:\s*(?P<message>.*)$") # "/usr/bin/ld: cannot find -lfoo"
+_FUNCTION_RE = re.compile(r"^(?P<file>[^:\s][^:]*):\s*In function [`'‘](?P<function>[^'’]+)['’]")
+_SNIPPET_RE = re.compile(r"^\s*(?:\d+|\+\+\+)?\s*\|") # "   12 |   x = 1;", "      |   ^~~", "  +++ |+#include <omp.h>"
+_IGNORED_RE = re.compile(r"^(?:In file included from|\s+from |compilation terminated|.*: At top level:|.*some warnings being treated as errors|.*: in function [`'‘])")
+
+_SYNTAX_RE = re.compile(r"^expected |\bstray\b|missing terminating|unterminated|invalid preprocessing|before .* token|at end of input")
+_DECLARATION_RE = re.compile(r"undeclared|unknown type name|implicit declaration|undefined reference|conflicting types|redefinition|"
+                             r"redeclared|has no member|storage size|not declared|incomplete type")
+_BOILERPLATE_NOTES = ("each undeclared identifier is reported only once",)
+_IMPLICIT_RE = re.compile(r"implicit declaration of function [`'‘](\w+)")
+_UNDEFINED_RE = re.compile(r"undefined reference to [`'‘](\w+)")
+
+class Diagnostic:
+    """One compiler or linker diagnostic, with the notes and source excerpt gcc printed under it."""
+
+    def __init__(self, file: str, line: int, column: int, severity: str, message: str, function: str = None):
+        self.file = file
+        self.line = line             # None for linker and driver messages
+        self.column = column
+        self.severity = severity     # "fatal error", "error" or "warning"
+        self.message = message
+        self.function = function     # Enclosing function, from gcc's "In function" header
+        self.snippet = []            # gcc's source excerpt: the line, the caret and any fix-it hint
+        self.notes = []
+        self.repeats = []            # Other lines where the same message was reported
+        self.count = 1               # Reports folded into this one, including itself
+        self.follow_on = []          # Errors most likely caused by this one
+        self.caused_by = None
+
+    @property
+    def is_error(self) -> bool:
+        return self.severity in ("error", "fatal error")
+
+    @property
+    def category(self) -> str:
+        """fatal, syntax, declaration or other: the order in which root causes are listed."""
+        if self.severity == "fatal error":
+            return "fatal"
+        if _SYNTAX_RE.search(self.message):
+            return "syntax"
+        if _DECLARATION_RE.search(self.message):
+            return "declaration"
+        return "other"
+
+    def location(self) -> str:
+        if self.line is None:
+            return self.file
+        return f"{self.file}:{self.line}:{self.column}" if self.column else f"{self.file}:{self.line}"
+
+    def to_dict(self) -> dict:
+        return {"file": self.file, "line": self.line, "column": self.column, "severity": self.severity, "message": self.message,
+                "function": self.function, "snippet": "\n".join(self.snippet), "notes": list(self.notes), "count": self.count,
+                "follow_on": len(self.follow_on)}
+
+def parse_diagnostics(text: str) -> list:
+    """
+    Parses gcc/mpicc/ld output into Diagnostic records, in the order they were reported. Notes are attached to the
+    diagnostic they explain; include chains, "In function" headers and status lines are dropped.
+    """
+    diagnostics = []
+    current = None
+    functions = {}
+    for raw_line in (text or "").splitlines():
+        line = raw_line.rstrip()
+        if not line.strip():
+            continue
+        if _SNIPPET_RE.match(line):
+            if current is not None: # Excerpts under notes are dropped with the note's location
+                current.snippet.append(line)
+            continue
+        function = _FUNCTION_RE.match(line)
+        if function:
+            functions[function["file"]] = function["function"]
+            continue
+        if _IGNORED_RE.match(line):
+            continue
+
+        located = _LOCATED_RE.match(line)
+        if located:
+            severity, message = located["severity"], located["message"].strip()
+            if severity == "note":
+                if diagnostics and not message.startswith(_BOILERPLATE_NOTES):
+                    where = located["file"] if located["file"] != diagnostics[-1].file else None
+                    if int(located["line"]) != diagnostics[-1].line or where:
+                        message = f"{where + ':' if where else 'line '}{located['line']}: {message}"
+                    diagnostics[-1].notes.append(message)
+                current = None
+                continue
+            current = Diagnostic(located["file"], int(located["line"]), int(located["column"]) if located["column"] else None,
+                                 severity, message, functions.get(located["file"]))
+            diagnostics.append(current)
+            continue
+
+        current = None
+        link = _LINK_RE.match(line)
+        if link:
+            diagnostics.append(Diagnostic(link["file"], None, None, "error", link["message"].strip()))
+            continue
+        tool = _TOOL_RE.match(line)
+        if tool:
+            if tool["severity"] == "note":
+                if diagnostics:
+                    diagnostics[-1].notes.append(tool["message"].strip())
+                continue
+            diagnostics.append(Diagnostic(tool["file"], None, None, tool["severity"], tool["message"].strip()))
+            continue
+        linker = _LINKER_RE.match(line)
+        if linker:
+            diagnostics.append(Diagnostic("ld", None, None, "error", linker["message"].strip()))
+    return diagnostics
+
+def fold_diagnostics(diagnostics: list) -> list:
+    """
+    Dedupes and ranks parsed diagnostics.
+    * Reports of the same message in the same file are merged (their other lines are kept in repeats).
+    * Errors after a syntax error in the same function are folded into it as follow-on errors, and an undefined
+      reference to a function gcc had to declare implicitly is folded into that warning.
+    * "ld returned 1 exit status" is dropped when the linker said why.
+    Returns:
+        list: The remaining root diagnostics, fatal errors first, then syntax, declaration and other errors, then
+              warnings; source order within each group.
+    """
+    merged = {}
+    roots = []
+    for diagnostic in diagnostics:
+        key = (diagnostic.file, diagnostic.severity, diagnostic.message)
+        first = merged.get(key)
+        if first is not None:
+            first.count += 1
+            if diagnostic.line is not None and diagnostic.line != first.line and diagnostic.line not in first.repeats:
+                first.repeats.append(diagnostic.line)
+            continue
+        merged[key] = diagnostic
+        roots.append(diagnostic)
+
+    if any(d.message.startswith("undefined reference") or d.file == "ld" for d in roots):
+        roots = [d for d in roots if not d.message.startswith("ld returned")]
+
+    syntax_error = {}
+    for diagnostic in roots:
+        if not diagnostic.is_error or diagnostic.line is None:
+            continue
+        scope = (diagnostic.file, diagnostic.function)
+        root = syntax_error.get(scope)
+        if root is not None and diagnostic.function is not None:
+            diagnostic.caused_by = root
+            root.follow_on.append(diagnostic)
+        elif diagnostic.category == "syntax":
+            syntax_error[scope] = diagnostic
+
+    implicit = {}
+    for diagnostic in roots:
+        match = _IMPLICIT_RE.search(diagnostic.message)
+        if match:
+            implicit.setdefault(match.group(1), diagnostic)
+    for diagnostic in roots:
+        match = _UNDEFINED_RE.search(diagnostic.message)
+        if match and match.group(1) in implicit and diagnostic.caused_by is None:
+            diagnostic.caused_by = implicit[match.group(1)]
+            implicit[match.group(1)].follow_on.append(diagnostic)
+
+    order = {"fatal": 0, "syntax": 1, "declaration": 2, "other": 3}
+    def rank(diagnostic):
+        if diagnostic.is_error or diagnostic.follow_on:
+            return order[diagnostic.category]
+        # Implicit declarations are warnings in C, but they are what a missing #include <omp.h>/<mpi.h> looks like
+        return 2.5 if _IMPLICIT_RE.search(diagnostic.message) else 4
+    roots = [d for d in roots if d.caused_by is None]
+    return sorted(roots, key=lambda d: (rank(d), roots.index(d)))
+
+def _format_entry(diagnostic: Diagnostic) -> str:
+    header = f"{diagnostic.location()}: {diagnostic.severity}: {diagnostic.message}"
+    if diagnostic.repeats:
+        header += f" (also at line{'s' if len(diagnostic.repeats) > 1 else ''} {', '.join(map(str, diagnostic.repeats[:5]))}"
+        header += ", ...)" if len(diagnostic.repeats) > 5 else ")"
+    elif diagnostic.count > 1:
+        header += f" (x{diagnostic.count})"
+    if diagnostic.follow_on:
+        where = f" in '{diagnostic.function}'" if diagnostic.function else ""
+        header += f" [{len(diagnostic.follow_on)} follow-on error(s){where} omitted; fix this first]"
+    lines = [header]
+    lines += diagnostic.snippet[:Config.DIAGNOSTIC_SNIPPET_LINES]
+    lines += [f"    note: {note}" for note in diagnostic.notes[:Config.DIAGNOSTIC_MAX_NOTES]]
+    return "\n".join(lines)
+
+def digest_diagnostics(text: str, max_chars: int = None, max_entries: int = None) -> str:
+    """
+    Builds the refine-prompt digest of compiler output: a one-line summary, then the root diagnostics in rank order
+    until max_entries or max_chars (Config.DIAGNOSTIC_MAX_ENTRIES / DIAGNOSTIC_MAX_CHARS) is reached.
+    Text with no recognizable diagnostics (runtime failures, benchmark reports) is returned as it is, cut to max_chars.
+    Args:
+        text (str): The compiler's stderr.
+        max_chars (int): Upper bound on the digest's length.
+        max_entries (int): Upper bound on the number of root diagnostics shown.
+    Returns:
+        str: The digest.
+    """
+    max_chars = max_chars or Config.DIAGNOSTIC_MAX_CHARS
+    max_entries = max_entries or Config.DIAGNOSTIC_MAX_ENTRIES
+    diagnostics = parse_diagnostics(text)
+    if not diagnostics:
+        return text if len(text or "") <= max_chars else text[:max_chars].rsplit("\n", 1)[0] + "\n... (output truncated)"
+
+    roots = fold_diagnostics(diagnostics)
+    errors = sum(1 for d in diagnostics if d.is_error)
+    warnings = len(diagnostics) - errors
+    folded = len(diagnostics) - len(roots)
+    summary = f"{errors} error(s), {warnings} warning(s)"
+    if folded:
+        summary += f"; {folded} duplicate or follow-on report(s) folded"
+    summary += ". Root causes first:" if errors else ":"
+
+    entries = []
+    length = len(summary)
+    for diagnostic in roots[:max_entries]:
+        entry = _format_entry(diagnostic)
+        if entries and length + len(entry) + 1 > max_chars:
+            break
+        entries.append(entry[:max_chars - length - 1] if not entries else entry)
+        length += len(entry) + 1
+    if len(entries) < len(roots):
+        entries.append(f"... {len(roots) - len(entries)} more diagnostic(s) omitted")
+    return "\n".join([summary] + entries)
+
+def root_error_count(text: str) -> int:
+    """Number of distinct root-cause errors in compiler output; a fairer measure of how far code is from compiling than raw error lines."""
+    return sum(1 for d in fold_diagnostics(parse_diagnostics(text)) if d.is_error)
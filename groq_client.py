@@ -1,54 +1,283 @@
-import os
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+import time
 from config import Config
+from concurrency import llm_slot
+from llm_backends import ReplayMissError, get_backend
+from llm_cache import ResponseCache
+from tracing import span
 from utils import Logger, LogColors 
 
-load_dotenv(override=True)
-
 AGENT_NAME = "GroqClient"
 
-try:
-    llm = ChatGroq(
-        model=Config.MODEL_NAME,
-        temperature=Config.TEMP,
-        max_tokens=Config.MAX_TOKENS,
-        max_retries=Config.MAX_RETRIES,
-    )
-    Logger.success(f"Successfully initialized Groq LLM with model: {Config.MODEL_NAME}", AGENT_NAME)
-except Exception as e:
-    Logger.error(f"Failed to initialize Groq LLM: {e}", AGENT_NAME)
-    llm = None
-
-def send_prompt(prompt: str) -> str:
-    """
-    Send a single-turn chat prompt to the Groq model via LangChain.
+# The model itself is reached through llm_backends (Groq by default); this module adds the response
+# cache, concurrency slots, rate limiting and tracing on top of whichever backend is active.
+
+response_cache = ResponseCache()
+
+TRUNCATION_FINISH_REASONS = ("length", "max_tokens")
+CODE_SIGNALS = ("```", "#", "{", ";", "@@") # Any C file, diff or line-edit block contains at least one of these
+
+class NonCodeResponseError(Exception):
+    """Raised when a reply that should be code turns out to be prose."""
+
+def set_cache_enabled(enabled: bool):
+    """Turns the on-disk response cache on or off for this process."""
+    response_cache.enabled = enabled
+    Logger.info(f"LLM response cache {'enabled' if enabled else 'disabled'}.", AGENT_NAME, LogColors.GROQ_CLIENT)
+
+def get_cache_stats() -> dict:
+    """Returns the response cache hit/miss counters."""
+    return response_cache.stats()
+
+def send_prompt(prompt: str, use_cache: bool = True, temperature: float = None, expect_code: bool = True) -> str:
+    """
+    Send a single-turn chat prompt to the active LLM backend (Groq unless configured otherwise).
+    Identical requests are served from the on-disk response cache unless use_cache is False.
+    temperature overrides Config.TEMP for this call (used to diversify candidates).
+    The reply is streamed: one cut off at MAX_TOKENS is completed with continuation requests, and when
+    expect_code is set, one that opens with prose instead of code is aborted and asked for again.
     Returns the raw text of the model's reply.
     """
-    if not llm:
-        Logger.error("LLM not initialized. Cannot send prompt.", AGENT_NAME)
-        return "// LLM Error: Not initialized"
+    temperature = Config.TEMP if temperature is None else temperature
+    with span("llm.send_prompt", "llm", temperature=temperature) as trace:
+        return _send_prompt(prompt, use_cache, temperature, trace, expect_code)
 
-    Logger.info(f"Sending prompt to LLM (approx {len(prompt)} chars)...", AGENT_NAME, LogColors.GROQ_CLIENT)
-    Logger.debug(f"Prompt content:\n---\n{prompt}\n---", AGENT_NAME, LogColors.GROQ_CLIENT)
+def _send_prompt(prompt: str, use_cache: bool, temperature: float, trace, expect_code: bool = True) -> str:
+    backend = get_backend()
+    use_cache = use_cache and backend.cacheable
+    cache_key = ResponseCache.make_key(backend.model, temperature, Config.MAX_TOKENS, prompt)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            Logger.info(f"Cache hit for prompt (approx {len(prompt)} chars), skipping LLM call.", AGENT_NAME, LogColors.GROQ_CLIENT)
+            trace.set(cached=True, prompt_tokens=estimate_tokens(prompt), response_tokens=estimate_tokens(cached), tokens_estimated=True)
+            return cached
+    trace.set(cached=False, backend=backend.name)
+
+    Logger.info(f"Sending prompt to LLM (approx {len(prompt)} chars, temperature {temperature})...", AGENT_NAME, LogColors.GROQ_CLIENT)
+    Logger.debug(lambda: f"Prompt content:\n---\n{prompt}\n---", AGENT_NAME, LogColors.GROQ_CLIENT)
 
     try:
-        ai_message = llm.invoke(prompt)
-        response_content = ai_message.content if hasattr(ai_message, "content") else str(ai_message)
+        response_content, truncated = _generate(backend, prompt, temperature, trace, expect_code)
         Logger.info(f"Received response from LLM (approx {len(response_content)} chars).", AGENT_NAME, LogColors.GROQ_CLIENT)
-        Logger.debug(f"Response content:\n---\n{response_content}\n---", AGENT_NAME, LogColors.GROQ_CLIENT)
-        
-        # Basic cleaning: remove backticks and 'c' if LLM wraps code in ```c ... ```
-        if response_content.strip().startswith("```c"):
-            response_content = response_content.split("```c", 1)[1]
-            if response_content.strip().endswith("```"):
-                 response_content = response_content.rsplit("```", 1)[0]
-        elif response_content.strip().startswith("```"):
-            response_content = response_content.split("```", 1)[1]
-            if response_content.strip().endswith("```"):
-                response_content = response_content.rsplit("```", 1)[0]
-
-        return response_content.strip()
+        Logger.debug(lambda: f"Response content:\n---\n{response_content}\n---", AGENT_NAME, LogColors.GROQ_CLIENT)
+
+        response_content = _strip_code_fences(response_content)
+        if use_cache and not truncated: # A reply that is still cut off should be regenerated next time, not replayed
+            response_cache.put(cache_key, response_content, {"model": backend.model, "temperature": temperature})
+        return response_content
     except Exception as e:
         Logger.error(f"Error during LLM invocation: {e}", AGENT_NAME)
+        trace.set(error=str(e), replay_miss=isinstance(e, ReplayMissError), non_code=isinstance(e, NonCodeResponseError))
+        return f"// LLM Invocation Error: {e}"
+
+def _generate(backend, prompt: str, temperature: float, trace, expect_code: bool):
+    """
+    Runs one logical request: re-asks after a reply aborted as non-code, and follows a reply cut off at
+    the token limit with continuation requests, splicing the pieces together.
+    Returns:
+        tuple: (text, truncated), truncated being True if the reply was still cut off after MAX_CONTINUATIONS.
+    """
+    totals = {"prompt_tokens": 0, "response_tokens": 0, "tokens_estimated": False}
+    request = prompt
+    for retry in range(Config.NON_CODE_RETRIES + 1):
+        try:
+            text, finish_reason = _stream_once(backend, request, temperature, trace, totals, expect_code)
+            break
+        except NonCodeResponseError as e:
+            trace.set(**totals)
+            if retry == Config.NON_CODE_RETRIES:
+                raise
+            Logger.warning(f"{e}; asking again.", AGENT_NAME)
+            request = prompt + Config.NON_CODE_REMINDER
+
+    continuations = 0
+    while finish_reason in TRUNCATION_FINISH_REASONS and continuations < Config.MAX_CONTINUATIONS:
+        continuations += 1
+        Logger.warning(f"Response was cut off at the token limit ({len(text)} chars); requesting continuation {continuations}.", AGENT_NAME)
+        continuation_prompt = Config.CONTINUATION_PROMPT_TEMPLATE.format(prompt=request, partial=text)
+        piece, finish_reason = _stream_once(backend, continuation_prompt, temperature, trace, totals, False)
+        text = _join_continuation(text, piece)
+
+    truncated = finish_reason in TRUNCATION_FINISH_REASONS
+    if truncated:
+        Logger.warning(f"Response is still truncated after {continuations} continuations.", AGENT_NAME)
+    trace.set(continuations=continuations, truncated=truncated, finish_reason=finish_reason, **totals)
+    return text, truncated
+
+def _stream_once(backend, prompt: str, temperature: float, trace, totals: dict, expect_code: bool):
+    """
+    Makes a single call and returns (text, finish_reason), adding its token counts to totals.
+    With expect_code, the stream is closed (ending generation) as soon as STREAM_CODE_CHECK_CHARS
+    characters arrive without any sign of code, and NonCodeResponseError is raised.
+    Backends with a quota run the call under the same rate limiter as send_prompt_async, so a 429 is
+    backed off and retried for every thread sharing the backend.
+    """
+    def call():
+        parts, received, usage, finish_reason = [], 0, {}, None
+        checked = not expect_code
+        if Config.STREAM_RESPONSES:
+            chunks = backend.stream(prompt, temperature)
+        else:
+            chunks = iter([backend.invoke(prompt, temperature)])
+        try:
+            for chunk in chunks:
+                content = chunk.content if hasattr(chunk, "content") else str(chunk)
+                parts.append(content)
+                received += len(content)
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                finish_reason = (getattr(chunk, "response_metadata", None) or {}).get("finish_reason") or finish_reason
+                if not checked and received >= Config.STREAM_CODE_CHECK_CHARS:
+                    checked = True
+                    _check_code("".join(parts), totals, prompt)
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+        return "".join(parts), usage, finish_reason, checked
+
+    queued_at = time.perf_counter()
+    with llm_slot():
+        trace.set(queue_wait=round(time.perf_counter() - queued_at, 6))
+        if backend.rate_limited:
+            from rate_limiter import get_limiter # Only loaded once a call actually needs it
+            text, usage, finish_reason, checked = get_limiter(backend.name).call_sync(
+                call, estimate_tokens(prompt) + Config.MAX_TOKENS, usage_of=lambda result: result[1].get("total_tokens"))
+        else:
+            text, usage, finish_reason, checked = call()
+    if not checked:
+        _check_code(text, totals, prompt)
+    _add_tokens(totals, usage, prompt, text)
+    return text, finish_reason
+
+def _check_code(text: str, totals: dict, prompt: str):
+    if text.strip() and not any(signal in text for signal in CODE_SIGNALS):
+        _add_tokens(totals, {}, prompt, text)
+        raise NonCodeResponseError(f"Response is not code (starts with: {text.strip()[:80]!r})")
+
+def _add_tokens(totals: dict, usage: dict, prompt: str, text: str):
+    counts = _token_counts(usage, prompt, text)
+    totals["prompt_tokens"] += counts["prompt_tokens"]
+    totals["response_tokens"] += counts["response_tokens"]
+    totals["tokens_estimated"] = totals["tokens_estimated"] or counts["tokens_estimated"]
+
+def _join_continuation(text: str, piece: str) -> str:
+    """Appends a continuation, dropping a code fence it reopened and any text it repeated from the end of the reply."""
+    stripped = piece.lstrip()
+    if text.lstrip().startswith("```") and stripped.startswith("```"):
+        piece = stripped.split("\n", 1)[1] if "\n" in stripped else ""
+    for overlap in range(min(len(text), len(piece), 400), 7, -1):
+        if text.endswith(piece[:overlap]):
+            return text + piece[overlap:]
+    return text + piece
+
+def _strip_code_fences(response_content: str) -> str:
+    """Basic cleaning: remove backticks and 'c' if LLM wraps code in ```c ... ```"""
+    if response_content.strip().startswith("```c"):
+        response_content = response_content.split("```c", 1)[1]
+        if response_content.strip().endswith("```"):
+             response_content = response_content.rsplit("```", 1)[0]
+    elif response_content.strip().startswith("```"):
+        response_content = response_content.split("```", 1)[1]
+        if response_content.strip().endswith("```"):
+            response_content = response_content.rsplit("```", 1)[0]
+    return response_content.strip()
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), used to reserve rate-limit budget before a call."""
+    return max(1, len(text) // 4)
+
+def _token_counts(usage: dict, prompt: str, response_content: str) -> dict:
+    """Prompt/response token counts for tracing: the API's usage numbers when reported, otherwise estimates."""
+    return {
+        "prompt_tokens": usage.get("input_tokens") or estimate_tokens(prompt),
+        "response_tokens": usage.get("output_tokens") or estimate_tokens(response_content),
+        "tokens_estimated": not usage,
+    }
+
+def _usage_tokens(ai_message):
+    usage = getattr(ai_message, "usage_metadata", None)
+    if usage and usage.get("total_tokens") is not None:
+        return usage["total_tokens"]
+    return None
+
+async def send_prompt_async(prompt: str, use_cache: bool = True, invoke=None, limiter_name: str = None,
+                            temperature: float = None, model: str = None) -> str:
+    """
+    Async counterpart of send_prompt.
+    Requests go through a shared token-bucket limiter (requests and tokens per minute) that caps
+    requests in flight and backs off adaptively on HTTP 429.
+    Args:
+        prompt (str): The prompt to send.
+        use_cache (bool): Serve and store the response via the on-disk cache.
+        invoke (callable): Async function prompt -> message (an object with .content, or a str).
+            Defaults to the active backend; a custom endpoint can pass its own coroutine here.
+        limiter_name (str): Limiter to run under; endpoints sharing a quota should share a name.
+            Defaults to the backend's name. Backends without a quota (local servers, replay) skip the limiter
+            unless a name is given.
+        temperature (float): Overrides Config.TEMP for this call. A custom invoke is expected to apply it itself.
+        model (str): Identifies a custom invoke's endpoint in the cache key. Replies from a custom invoke
+            are only cached when it is given, so they are never served in place of the backend's.
+    Returns:
+        str: The model's reply with code fences removed.
+    """
+    temperature = Config.TEMP if temperature is None else temperature
+    with span("llm.send_prompt_async", "llm", limiter=limiter_name, temperature=temperature) as trace:
+        return await _send_prompt_async(prompt, use_cache, invoke, limiter_name, temperature, model, trace)
+
+async def _send_prompt_async(prompt: str, use_cache: bool, invoke, limiter_name: str, temperature: float,
+                             model: str, trace) -> str:
+    backend = get_backend()
+    if invoke is None:
+        model = backend.model
+        use_cache = use_cache and backend.cacheable
+    else:
+        use_cache = use_cache and model is not None
+    cache_key = ResponseCache.make_key(model, temperature, Config.MAX_TOKENS, prompt)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            Logger.info(f"Cache hit for prompt (approx {len(prompt)} chars), skipping LLM call.", AGENT_NAME, LogColors.GROQ_CLIENT)
+            trace.set(cached=True, prompt_tokens=estimate_tokens(prompt), response_tokens=estimate_tokens(cached), tokens_estimated=True)
+            return cached
+    trace.set(cached=False, backend=backend.name if invoke is None else model or "custom")
+
+    from rate_limiter import get_limiter # asyncio is only imported once something uses the async client
+    limited = invoke is not None or limiter_name is not None or backend.rate_limited
+    invoke = invoke or (lambda p: backend.ainvoke(p, temperature))
+    limiter = get_limiter(limiter_name or backend.name) if limited else None
+
+    Logger.info(f"Sending async prompt to LLM (approx {len(prompt)} chars)...", AGENT_NAME, LogColors.GROQ_CLIENT)
+    Logger.debug(lambda: f"Prompt content:\n---\n{prompt}\n---", AGENT_NAME, LogColors.GROQ_CLIENT)
+
+    async def call(request: str):
+        if limiter is not None:
+            return await limiter.call(lambda: invoke(request), estimate_tokens(request) + Config.MAX_TOKENS, usage_of=_usage_tokens)
+        return await invoke(request)
+
+    try:
+        # Not streamed (a custom invoke returns whole messages), but a reply cut off at the token limit is still continued
+        totals = {"prompt_tokens": 0, "response_tokens": 0, "tokens_estimated": False}
+        request, response_content, continuations = prompt, "", 0
+        while True:
+            ai_message = await call(request)
+            piece = ai_message.content if hasattr(ai_message, "content") else str(ai_message)
+            _add_tokens(totals, getattr(ai_message, "usage_metadata", None) or {}, request, piece)
+            response_content = _join_continuation(response_content, piece) if continuations else piece
+            finish_reason = (getattr(ai_message, "response_metadata", None) or {}).get("finish_reason")
+            if finish_reason not in TRUNCATION_FINISH_REASONS or continuations == Config.MAX_CONTINUATIONS:
+                break
+            continuations += 1
+            Logger.warning(f"Response was cut off at the token limit ({len(response_content)} chars); requesting continuation {continuations}.", AGENT_NAME)
+            request = Config.CONTINUATION_PROMPT_TEMPLATE.format(prompt=prompt, partial=response_content)
+        truncated = finish_reason in TRUNCATION_FINISH_REASONS
+        trace.set(continuations=continuations, truncated=truncated, finish_reason=finish_reason, **totals)
+        Logger.info(f"Received response from LLM (approx {len(response_content)} chars).", AGENT_NAME, LogColors.GROQ_CLIENT)
+        Logger.debug(lambda: f"Response content:\n---\n{response_content}\n---", AGENT_NAME, LogColors.GROQ_CLIENT)
+
+        response_content = _strip_code_fences(response_content)
+        if use_cache and not truncated:
+            response_cache.put(cache_key, response_content, {"model": model, "temperature": temperature})
+        return response_content
+    except Exception as e:
+        Logger.error(f"Error during async LLM invocation: {e}", AGENT_NAME)
+        trace.set(error=str(e), replay_miss=isinstance(e, ReplayMissError))
         return f"// LLM Invocation Error: {e}"
\ No newline at end of file
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import threading
+from config import Config
+from utils import Logger, LogColors
+
+AGENT_NAME = "LLMBackend"
+
+class LLMBackendError(Exception):
+    """Raised when a backend cannot produce a response."""
+
+class ReplayMissError(LLMBackendError):
+    """Raised by ReplayBackend for a prompt that was never recorded."""
+
+class LLMReply:
+    """
+    A completed response, shaped like LangChain's AIMessage (content, usage_metadata, response_metadata)
+    so callers treat every backend's replies the same way. Streams yield these too, one per text delta,
+    with the finish reason and usage on the last one (like AIMessageChunk).
+    """
+
+    def __init__(self, content: str, input_tokens: int = None, output_tokens: int = None, finish_reason: str = None):
+        self.content = content
+        self.usage_metadata = {}
+        if input_tokens is not None and output_tokens is not None:
+            self.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                   "total_tokens": input_tokens + output_tokens}
+        self.response_metadata = {"finish_reason": finish_reason} if finish_reason else {}
+
+class LLMBackend:
+    """
+    A chat model behind send_prompt. Subclasses implement invoke(); ainvoke() defaults to running it on a thread,
+    and stream() to yielding the whole reply as a single chunk.
+    Attributes:
+        name (str): Backend kind, also the rate limiter it runs under.
+        model (str): Model name; part of the response cache key so backends never share cached answers.
+        cacheable (bool): Whether send_prompt may serve this backend's prompts from the response cache.
+        rate_limited (bool): Whether calls (sync and async) go through the shared token-bucket limiter.
+    """
+    name = "base"
+    cacheable = True
+    rate_limited = False
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def invoke(self, prompt: str, temperature: float):
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Does the one-time setup (imports, clients) now rather than on the first prompt. Used by long-running services."""
+
+    async def ainvoke(self, prompt: str, temperature: float):
+        import asyncio # Only the async client needs it; keeps CLI startup lean
+        return await asyncio.to_thread(self.invoke, prompt, temperature)
+
+    def stream(self, prompt: str, temperature: float):
+        """Yields the reply as chunks (objects with .content); the last one carries the finish reason."""
+        yield self.invoke(prompt, temperature)
+
+class GroqBackend(LLMBackend):
+    """Groq through LangChain's ChatGroq. The client (and LangChain itself) is only imported on first use."""
+    name = "groq"
+    rate_limited = True
+
+    def __init__(self, model: str = None):
+        super().__init__(model or Config.MODEL_NAME)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, temperature: float):
+        with self._lock:
+            client = self._clients.get(temperature)
+            if client is None:
+                from dotenv import load_dotenv
+                from langchain_groq import ChatGroq
+                load_dotenv(override=True)
+                client = ChatGroq(model=self.model, temperature=temperature, max_tokens=Config.MAX_TOKENS, max_retries=0)
+                if not self._clients:
+                    Logger.success(f"Successfully initialized Groq LLM with model: {self.model}", AGENT_NAME)
+                self._clients[temperature] = client
+        return client
+
+    def warm_up(self):
+        self._client(Config.TEMP)
+
+    # No LangChain retries here: send_prompt and send_prompt_async run Groq calls under the rate limiter, which retries 429s itself
+    def invoke(self, prompt: str, temperature: float):
+        return self._client(temperature).invoke(prompt)
+
+    async def ainvoke(self, prompt: str, temperature: float):
+        return await self._client(temperature).ainvoke(prompt)
+
+    def stream(self, prompt: str, temperature: float):
+        yield from self._client(temperature).stream(prompt)
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Any server exposing the OpenAI chat-completions API (vLLM, llama.cpp server, Ollama, LM Studio, ...).
+    Uses only the standard library, so a self-hosted model needs no extra Python packages.
+    """
+    name = "openai"
+
+    def __init__(self, base_url: str = None, model: str = None, api_key: str = None, timeout: float = None):
+        super().__init__(model or Config.LLM_LOCAL_MODEL or Config.MODEL_NAME)
+        self.base_url = (base_url or Config.LLM_BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else os.environ.get(Config.LLM_API_KEY_ENV, "")
+        self.timeout = timeout or Config.LLM_REQUEST_TIMEOUT
+
+    def _request(self, prompt: str, temperature: float, stream: bool = False):
+        import urllib.request
+        body = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": Config.MAX_TOKENS,
+        }
+        if stream:
+            body["stream"] = True
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(f"{self.base_url}/chat/completions", data=json.dumps(body).encode("utf-8"),
+                                         headers=headers, method="POST")
+        # HTTPError is left to propagate: it carries .code and .headers, which the rate limiter understands
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def invoke(self, prompt: str, temperature: float):
+        with self._request(prompt, temperature) as response:
+            payload = json.loads(response.read().decode("utf-8"))
+        try:
+            choice = payload["choices"][0]
+            content = choice["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMBackendError(f"Unexpected response from {self.base_url}: {str(payload)[:200]}") from e
+        usage = payload.get("usage") or {}
+        return LLMReply(content, usage.get("prompt_tokens"), usage.get("completion_tokens"), choice.get("finish_reason"))
+
+    def stream(self, prompt: str, temperature: float):
+        # Server-sent events: one "data: {json}" line per delta, then "data: [DONE]".
+        # Leaving the with-block (also when the consumer stops early) closes the connection and ends generation.
+        with self._request(prompt, temperature, stream=True) as response:
+            for raw_line in response:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    event = json.loads(data)
+                except ValueError as e:
+                    raise LLMBackendError(f"Malformed stream event from {self.base_url}: {data[:200]}") from e
+                usage = event.get("usage") or {}
+                choices = event.get("choices") or [{}]
+                delta = choices[0].get("delta") or {}
+                yield LLMReply(delta.get("content") or "", usage.get("prompt_tokens"), usage.get("completion_tokens"),
+                               choices[0].get("finish_reason"))
+
+def _record_key(model: str, temperature: float, prompt: str) -> str:
+    material = json.dumps({"model": model, "temperature": temperature, "max_tokens": Config.MAX_TOKENS, "prompt": prompt},
+                          sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def _record_path(store_dir: str, key: str) -> str:
+    return os.path.join(store_dir, key[:2], f"{key}.json")
+
+class RecordingBackend(LLMBackend):
+    """Passes prompts to another backend and writes every prompt/response pair to store_dir for later replay."""
+    name = "record"
+    cacheable = False # Every prompt must reach the inner backend to be recorded
+
+    def __init__(self, inner: LLMBackend, store_dir: str):
+        super().__init__(inner.model)
+        self.inner = inner
+        self.store_dir = os.path.abspath(store_dir)
+        self.rate_limited = inner.rate_limited
+
+    def warm_up(self):
+        self.inner.warm_up()
+
+    def _save(self, prompt: str, temperature: float, reply):
+        content = reply.content if hasattr(reply, "content") else str(reply)
+        usage = getattr(reply, "usage_metadata", None) or {}
+        finish_reason = (getattr(reply, "response_metadata", None) or {}).get("finish_reason")
+        path = _record_path(self.store_dir, _record_key(self.model, temperature, prompt))
+        entry = {"model": self.model, "temperature": temperature, "prompt": prompt, "content": content,
+                 "input_tokens": usage.get("input_tokens"), "output_tokens": usage.get("output_tokens"),
+                 "finish_reason": finish_reason}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            Logger.warning(f"Could not record response: {e}", AGENT_NAME)
+
+    def invoke(self, prompt: str, temperature: float):
+        reply = self.inner.invoke(prompt, temperature)
+        self._save(prompt, temperature, reply)
+        return reply
+
+    async def ainvoke(self, prompt: str, temperature: float):
+        reply = await self.inner.ainvoke(prompt, temperature)
+        self._save(prompt, temperature, reply)
+        return reply
+
+    def stream(self, prompt: str, temperature: float):
+        parts, usage, finish_reason = [], {}, None
+        for chunk in self.inner.stream(prompt, temperature):
+            parts.append(chunk.content if hasattr(chunk, "content") else str(chunk))
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            finish_reason = (getattr(chunk, "response_metadata", None) or {}).get("finish_reason") or finish_reason
+            yield chunk
+        # Only streams read to the end are recorded; one the caller aborted is not a reply worth replaying
+        self._save(prompt, temperature, LLMReply("".join(parts), usage.get("input_tokens"), usage.get("output_tokens"), finish_reason))
+
+class ReplayBackend(LLMBackend):
+    """Serves recorded responses. Needs no network; a prompt that was never recorded raises ReplayMissError."""
+    name = "replay"
+    cacheable = False # The recording is the source of truth; the cache would only hide misses
+
+    def __init__(self, store_dir: str, model: str = None):
+        super().__init__(model or Config.MODEL_NAME)
+        self.store_dir = os.path.abspath(store_dir)
+        if not os.path.isdir(self.store_dir):
+            Logger.warning(f"Replay directory {self.store_dir} does not exist; every prompt will miss.", AGENT_NAME)
+
+    def invoke(self, prompt: str, temperature: float):
+        path = _record_path(self.store_dir, _record_key(self.model, temperature, prompt))
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            raise ReplayMissError(f"No recorded response for this prompt (approx {len(prompt)} chars) in {self.store_dir}") from None
+        except (OSError, ValueError) as e:
+            raise LLMBackendError(f"Unreadable recording {path}: {e}") from e
+        return LLMReply(entry["content"], entry.get("input_tokens"), entry.get("output_tokens"), entry.get("finish_reason"))
+
+    async def ainvoke(self, prompt: str, temperature: float):
+        return self.invoke(prompt, temperature) # A file read; not worth a thread
+
+def create_backend(kind: str = None, base_url: str = None, model: str = None, record_dir: str = None, replay_dir: str = None) -> LLMBackend:
+    """
+    Builds a backend from settings, falling back to Config for anything unset.
+    Args:
+        kind (str): "groq" or "openai" (an OpenAI-compatible endpoint at base_url).
+        base_url (str): Endpoint for the "openai" kind, e.g. http://localhost:8000/v1.
+        model (str): Model name to request (and to key recordings by).
+        record_dir (str): Wrap the backend in a RecordingBackend writing to this directory.
+        replay_dir (str): Ignore kind and serve recorded responses from this directory.
+    Returns:
+        LLMBackend: The backend.
+    """
+    if replay_dir:
+        return ReplayBackend(replay_dir, model)
+    kind = kind or Config.LLM_BACKEND
+    if kind == "groq":
+        backend = GroqBackend(model)
+    elif kind == "openai":
+        backend = OpenAICompatibleBackend(base_url, model)
+    else:
+        raise ValueError(f"Unknown LLM backend '{kind}' (expected 'groq' or 'openai').")
+    if record_dir:
+        backend = RecordingBackend(backend, record_dir)
+    return backend
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> LLMBackend:
+    """Returns the process-wide backend, building the configured one on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
+
+def set_backend(backend: LLMBackend):
+    """Replaces the process-wide backend (e.g. with a replayer for offline runs)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    Logger.info(f"LLM backend: {backend.name} (model {backend.model}).", AGENT_NAME, LogColors.GROQ_CLIENT)
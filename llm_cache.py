@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from config import Config
+from utils import Logger, LogColors
+
+AGENT_NAME = "LLMCache"
+
+class ResponseCache:
+    """
+    On-disk, content-addressed cache of LLM responses.
+    Each entry is stored as a small JSON file named after the SHA-256 of
+    (model, temperature, max_tokens, prompt), so identical requests map to the same file.
+    """
+
+    EVICT_EVERY_N_PUTS = 32  # Eviction walks the whole directory, so amortize it over several writes
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None, max_age_seconds: float = None, enabled: bool = None):
+        cache_dir = cache_dir or Config.CACHE_DIR
+        if not os.path.isabs(cache_dir):
+            # Relative paths are anchored at the repository root, next to results/
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), cache_dir)
+        self.cache_dir = cache_dir
+        self.max_bytes = Config.CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_age_seconds = Config.CACHE_MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+        if enabled is None:
+            enabled = Config.CACHE_ENABLED and os.environ.get("PARAGINEERS_NO_CACHE", "") in ("", "0")
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, max_tokens: int, prompt: str) -> str:
+        """Returns the hex digest identifying a (model, temperature, max_tokens, prompt) request."""
+        material = json.dumps(
+            {"model": model, "temperature": temperature, "max_tokens": max_tokens, "prompt": prompt},
+            sort_keys=True
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path_for(self, key: str) -> str:
+        # Shard by the first two hex chars to keep directories small
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        """
+        Looks up a cached response.
+        Returns:
+            str or None: The cached response, or None on a miss (or when the cache is disabled).
+        """
+        if not self.enabled:
+            return None
+        path = self._path_for(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if self.max_age_seconds and time.time() - entry.get("created", 0) > self.max_age_seconds:
+            Logger.debug(f"Cache entry {key[:12]} expired, removing.", AGENT_NAME, LogColors.GROQ_CLIENT)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Touch the file so eviction is least-recently-used rather than oldest-created
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry.get("response")
+
+    def put(self, key: str, response: str, metadata: dict = None):
+        """Stores a response under the given key and enforces the size limit."""
+        if not self.enabled:
+            return
+        path = self._path_for(key)
+        entry = {"created": time.time(), "response": response, "metadata": metadata or {}}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see a partial entry
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            Logger.warning(f"Could not write cache entry {key[:12]}: {e}", AGENT_NAME)
+            return
+        with self._lock:
+            self._puts += 1
+            should_evict = self._puts % self.EVICT_EVERY_N_PUTS == 1
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Removes entries unused for max_age_seconds, then least-recently-used ones until the cache fits in max_bytes."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        total = 0
+        now = time.time()
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if self.max_age_seconds and now - st.st_mtime > self.max_age_seconds:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        if not self.max_bytes or total <= self.max_bytes:
+            return
+        entries.sort()  # Oldest access time first
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        Logger.info(f"Cache evicted down to {total} bytes.", AGENT_NAME, LogColors.GROQ_CLIENT)
+
+    def clear(self):
+        """Deletes every cached entry."""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                try:
+                    os.remove(os.path.join(root, name))
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters for this process."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
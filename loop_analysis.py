@@ -0,0 +1,719 @@
+import ast
+import re
+from c_regions import mask_code, find_functions, find_loop_nests, _matching_paren, _skip_space, _statement_end
+from config import Config
+
+# Lightweight static analysis of C loop nests, used to choose a parallelization paradigm
+# (or none) and to brief the experts. Like c_regions, this is pattern matching rather than
+# a compiler front end, and its answers are estimates:
+#   * trip counts are evaluated from literals, #define constants, const globals and
+#     locals that are assigned exactly once;
+#   * dependencies are found by evaluating every array subscript at sample points and
+#     solving for an iteration distance along each loop; distinct arrays are assumed not to alias;
+#   * work is counted as arithmetic operations plus array accesses per iteration.
+
+_MATH_FUNCTIONS = {"sqrt", "sqrtf", "exp", "expf", "log", "logf", "log2", "log10", "pow", "powf", "sin", "sinf",
+                   "cos", "cosf", "tan", "tanh", "atan", "atan2", "fabs", "fabsf", "abs", "labs", "fmax", "fmin",
+                   "fmaxf", "fminf", "floor", "ceil", "round", "fmod", "hypot", "cbrt", "erf", "min", "max", "MIN", "MAX"}
+_SIDE_EFFECT_FUNCTIONS = {"printf", "fprintf", "sprintf", "snprintf", "puts", "putchar", "fputs", "fputc", "scanf",
+                          "fscanf", "sscanf", "fread", "fwrite", "fopen", "fclose", "fgets", "getchar", "rand", "srand",
+                          "random", "malloc", "calloc", "realloc", "free", "exit", "abort", "time", "clock"}
+_KEYWORDS = {"if", "else", "for", "while", "do", "switch", "case", "default", "return", "break", "continue", "goto",
+             "sizeof", "int", "long", "short", "char", "float", "double", "unsigned", "signed", "const", "static",
+             "void", "struct", "union", "enum", "register", "volatile", "size_t", "bool"}
+_TYPE_RE = r"(?:const\s+|static\s+|register\s+|unsigned\s+|signed\s+|long\s+|short\s+)*(?:int|long|short|char|float|double|size_t|bool|unsigned|[A-Za-z_]\w*_t)\b"
+_ASSIGN_RE = re.compile(r"(\+\+|--)|(<<=|>>=|[-+*/%&|^]?=)(?!=)")
+_REDUCTION_OPS = {"+=": "+", "-=": "+", "*=": "*", "&=": "&", "|=": "|", "^=": "^"}
+# Binding strength of C's binary operators; `x = x op E` is a reduction only if E binds at least as tightly as op
+_PRECEDENCE = {"*": 10, "/": 10, "%": 10, "+": 9, "-": 9, "<<": 8, ">>": 8, "<": 7, ">": 7, "<=": 7, ">=": 7,
+               "==": 6, "!=": 6, "&": 5, "^": 4, "|": 3, "&&": 2, "||": 1, "?": 0, ":": 0, ",": -1}
+_OPERATOR_RE = re.compile(r"->|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%<>&^|?:,]")
+_SYMBOL_BASE = 1000 # Sample value for unknown symbols (problem sizes); distances at least this large are not loop-carried
+
+class LoopInfo:
+    """One `for` loop inside a nest."""
+
+    def __init__(self, var: str, start: int, body_start: int, end: int, line: int, depth: int, parent=None):
+        self.var = var
+        self.start = start           # Offset of the `for` keyword
+        self.body_start = body_start # Offset just past the header's closing parenthesis
+        self.end = end               # Offset just past the loop body
+        self.line = line
+        self.depth = depth
+        self.parent = parent
+        self.children = []
+        self.lower = None
+        self.upper = None
+        self.step = None
+        self.trip_count = None       # Estimated iterations, or None if unknown
+        self.dependencies = []       # Human-readable reasons this loop cannot run in parallel
+        self.reductions = {}         # variable -> operator
+        self.private = []            # Scalars that must be private if this loop is parallelized
+        self.calls = []              # Called functions that are neither math functions nor known side effects
+        self.own_flops = 0
+        self.own_accesses = 0
+        self.work = 0.0
+
+    @property
+    def parallel(self) -> bool:
+        return self.var is not None and not self.dependencies
+
+    def iterations(self) -> int:
+        return self.trip_count if self.trip_count is not None else Config.ANALYSIS_DEFAULT_TRIP_COUNT
+
+class NestAnalysis:
+    """Analysis of one outermost loop nest and the cost model's verdict for it."""
+
+    def __init__(self, name: str, function: str, start_line: int, end_line: int, root: LoopInfo):
+        self.name = name
+        self.function = function
+        self.start_line = start_line
+        self.end_line = end_line
+        self.root = root
+        self.parallel_loop = None
+        self.collapse = 1
+        self.flops = 0
+        self.accesses = 0
+        self.work = 0.0
+        self.trip_counts_known = True
+        self.verdict = "none"
+        self.reason = ""
+
+    def loops(self) -> list:
+        result, stack = [], [self.root]
+        while stack:
+            loop = stack.pop()
+            result.append(loop)
+            stack.extend(reversed(loop.children))
+        return result
+
+    @property
+    def compute_ratio(self) -> float:
+        """Arithmetic operations per array access; below ~1 the nest is memory-bound."""
+        return self.flops / max(1, self.accesses)
+
+    def to_dict(self) -> dict:
+        chosen = self.parallel_loop
+        return {
+            "name": self.name,
+            "function": self.function,
+            "start_line": self.start_line,
+            "end_line": self.end_line,
+            "loops": [{"var": l.var, "line": l.line, "depth": l.depth, "trip_count": l.trip_count, "parallel": l.parallel,
+                       "dependencies": list(l.dependencies)} for l in self.loops()],
+            "parallel_loop": {"var": chosen.var, "line": chosen.line} if chosen else None,
+            "collapse": self.collapse,
+            "reductions": dict(chosen.reductions) if chosen else {},
+            "private": list(chosen.private) if chosen else [],
+            "work": self.work,
+            "compute_ratio": round(self.compute_ratio, 3),
+            "trip_counts_known": self.trip_counts_known,
+            "verdict": self.verdict,
+            "reason": self.reason,
+        }
+
+class ProgramAnalysis:
+    """All loop nests of a file plus the file-level paradigm recommendation."""
+
+    def __init__(self, nests: list, paradigm: str, reason: str):
+        self.nests = nests
+        self.paradigm = paradigm # "openmp", "mpi", "hybrid" or "none"
+        self.reason = reason
+
+    def to_dicts(self) -> list:
+        return [n.to_dict() for n in self.nests]
+
+# --- Constant evaluation ---
+
+def _safe_eval(expr: str):
+    """Evaluates an integer arithmetic expression (already free of identifiers), or returns None."""
+    expr = re.sub(r"(\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)[uUlLfF]+\b", r"\1", expr).replace("/", "//").replace("////", "//")
+    expr = expr.replace("&&", " and ").replace("||", " or ")
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except SyntaxError:
+        return None
+    allowed = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.operator, ast.unaryop)
+    if not all(isinstance(node, allowed) for node in ast.walk(tree)):
+        return None
+    try:
+        value = eval(compile(tree, "<expr>", "eval"), {"__builtins__": {}})
+    except Exception:
+        return None
+    return int(value) if isinstance(value, (int, float)) else None
+
+def _strip_casts(expr: str) -> str:
+    return re.sub(r"\(\s*" + _TYPE_RE + r"\s*\**\s*\)", "", expr)
+
+def _evaluate(expr: str, values: dict, symbols: dict = None, _depth: int = 0):
+    """
+    Evaluates a C expression with the given identifier values (numbers or expressions).
+    Identifiers not in `values` take their value from `symbols` when given, else the result is None.
+    """
+    if expr is None or _depth > 8:
+        return None
+    expr = _strip_casts(expr)
+    if re.search(r"\[|->|\.\s*[A-Za-z_]|\"|'", expr):
+        return None
+    parts = []
+    last = 0
+    for match in re.finditer(r"[A-Za-z_]\w*", expr):
+        name = match.group(0)
+        after = _skip_space(expr, match.end())
+        if after < len(expr) and expr[after] == "(":
+            return None # Function call
+        if name in values:
+            value = values[name]
+            if isinstance(value, str):
+                value = _evaluate(value, values, symbols, _depth + 1)
+        elif symbols is not None:
+            value = symbols.setdefault(name, _SYMBOL_BASE + 17 * len(symbols))
+        else:
+            value = None
+        if value is None:
+            return None
+        parts.append(expr[last:match.start()])
+        parts.append(f"({value})")
+        last = match.end()
+    parts.append(expr[last:])
+    return _safe_eval("".join(parts))
+
+def find_constants(code: str) -> dict:
+    """Collects object-like #define values and const integer globals, as unevaluated expressions."""
+    constants = {}
+    for match in re.finditer(r"^\s*#\s*define\s+([A-Za-z_]\w*)(?!\()\s+(.+?)\s*(?://.*|/\*.*)?$", code, re.M):
+        constants[match.group(1)] = match.group(2)
+    for match in re.finditer(r"\bconst\s+" + r"(?:unsigned\s+|signed\s+|long\s+|short\s+)*(?:int|long|size_t|short)?\s*([A-Za-z_]\w*)\s*=\s*([^;,{]+)", code):
+        constants.setdefault(match.group(1), match.group(2))
+    return constants
+
+def _single_assignment_locals(masked_function: str, function_text: str) -> dict:
+    """Locals such as `int n = 1024;` that are never reassigned, usable as known sizes."""
+    values = {}
+    for match in re.finditer(_TYPE_RE + r"\s+([A-Za-z_]\w*)\s*=\s*([^;,]+);", masked_function):
+        name = match.group(1)
+        assignments = re.findall(r"(?<![\w.>])" + re.escape(name) + r"\s*(?:[-+*/%&|^]?=(?!=)|\+\+|--)", masked_function)
+        assignments += re.findall(r"(?:\+\+|--)\s*" + re.escape(name) + r"\b", masked_function)
+        if len(assignments) == 1:
+            values[name] = function_text[match.start(2):match.end(2)]
+    return values
+
+# --- Loop structure ---
+
+def _parse_header(header: str, values: dict):
+    """Returns (var, lower, upper, step, trip count) for a canonical `for` header; unknown parts are None."""
+    parts = header.split(";")
+    if len(parts) != 3:
+        return None, None, None, None, None
+    init, cond, incr = (p.strip() for p in parts)
+    if re.search(r"&&|\|\||,", cond):
+        return None, None, None, None, None # `i < ii + T && i < n` is not a canonical OpenMP loop test
+    var = lower = upper = step = None
+    init_match = re.search(r"([A-Za-z_]\w*)\s*=\s*([^,]+)$", init)
+    if init_match:
+        var, lower = init_match.group(1), init_match.group(2)
+    if var is None:
+        return None, None, None, None, None
+
+    inclusive = False
+    descending = False
+    cond_match = re.match(re.escape(var) + r"\s*(<=|<|!=|>=|>)\s*(.+)$", cond)
+    if cond_match:
+        op, upper = cond_match.group(1), cond_match.group(2)
+    else:
+        cond_match = re.match(r"(.+?)\s*(>=|>|<=|<)\s*" + re.escape(var) + r"$", cond)
+        if cond_match:
+            upper = cond_match.group(1)
+            op = {">=": "<=", ">": "<", "<=": ">=", "<": ">"}[cond_match.group(2)]
+        else:
+            op = None
+    if op in ("<=", ">="):
+        inclusive = True
+    if op in (">", ">="):
+        descending = True
+
+    if re.fullmatch(r"(?:\+\+\s*" + re.escape(var) + r"|" + re.escape(var) + r"\s*\+\+)", incr):
+        step = "1"
+    elif re.fullmatch(r"(?:--\s*" + re.escape(var) + r"|" + re.escape(var) + r"\s*--)", incr):
+        step = "-1"
+    else:
+        step_match = re.fullmatch(re.escape(var) + r"\s*(\+=|-=)\s*(.+)", incr) or \
+                     re.fullmatch(re.escape(var) + r"\s*=\s*" + re.escape(var) + r"\s*([+-])\s*(.+)", incr)
+        if step_match:
+            sign = "-" if step_match.group(1) in ("-=", "-") else ""
+            step = f"{sign}({step_match.group(2)})"
+
+    trip = None
+    lo, hi, st = _evaluate(lower, values), _evaluate(upper, values), _evaluate(step, values)
+    if None not in (lo, hi, st) and st != 0 and op is not None:
+        span = (lo - hi) if descending else (hi - lo)
+        stride = abs(st)
+        if (st < 0) == descending:
+            trip = max(0, (span + (1 if inclusive else 0) + stride - 1) // stride)
+    return var, lower, upper, step, trip
+
+def _find_loops(code: str, masked: str, start: int, end: int, depth: int, parent, values: dict) -> list:
+    """Finds the `for` loops directly inside [start, end), recursing into their bodies."""
+    loops = []
+    i = start
+    for match in re.finditer(r"\bfor\b", masked[start:end]):
+        pos = start + match.start()
+        if pos < i:
+            continue
+        open_paren = _skip_space(masked, pos + 3)
+        if open_paren >= len(masked) or masked[open_paren] != "(":
+            continue
+        close_paren = _matching_paren(masked, open_paren)
+        if close_paren == -1:
+            continue
+        loop_end = min(_statement_end(masked, close_paren + 1), end)
+        header = code[open_paren + 1:close_paren]
+        var, lower, upper, step, trip = _parse_header(header, values)
+        loop = LoopInfo(var, pos, close_paren + 1, loop_end, code.count("\n", 0, pos) + 1, depth, parent)
+        loop.lower, loop.upper, loop.step, loop.trip_count = lower, upper, step, trip
+        if loop.trip_count is None and parent is not None and upper is not None and lower is not None:
+            # Triangular nests (bounds depending on an outer loop variable): use the outer loop's midpoint
+            outer = parent
+            bound_values = dict(values)
+            while outer is not None:
+                if outer.var and outer.trip_count is not None:
+                    lo = _evaluate(outer.lower, values) or 0
+                    bound_values.setdefault(outer.var, lo + outer.trip_count // 2)
+                outer = outer.parent
+            _, _, _, _, loop.trip_count = _parse_header(header, bound_values)
+        loop.children = _find_loops(code, masked, close_paren + 1, loop_end, depth + 1, loop, values)
+        loops.append(loop)
+        i = loop_end
+    return loops
+
+def _blank_children(masked: str, loop: LoopInfo) -> str:
+    """The loop's own body with every nested loop blanked out."""
+    body = list(masked[loop.body_start:loop.end])
+    for child in loop.children:
+        for k in range(child.start - loop.body_start, child.end - loop.body_start):
+            if body[k] != "\n":
+                body[k] = " "
+    return "".join(body)
+
+# --- Operation counts ---
+
+def _count_operations(text: str) -> tuple:
+    """Returns (arithmetic operations, array accesses) in a piece of masked code, ignoring subscript arithmetic."""
+    accesses = len(re.findall(r"(?<![\]\w])[A-Za-z_]\w*\s*\[", text))
+    kept, depth = [], 0
+    for ch in text:
+        if ch == "[":
+            depth += 1
+        elif ch == "]":
+            depth -= 1
+        elif depth == 0:
+            kept.append(ch)
+    outside_subscripts = "".join(kept)
+    # Drop loop headers' increment noise and comparisons; count + - * / % and compound assignments
+    flops = len(re.findall(r"(?<![+\-*/%=<>!&|^])[+\-*/%](?![+\-=>])", outside_subscripts))
+    flops += len(re.findall(r"[+\-*/]=", outside_subscripts))
+    for name in re.findall(r"\b([A-Za-z_]\w*)\s*\(", outside_subscripts):
+        if name in _MATH_FUNCTIONS:
+            flops += Config.ANALYSIS_MATH_CALL_COST
+    return flops, accesses
+
+# --- Dependence analysis ---
+
+def _array_accesses(masked: str, start: int, end: int) -> list:
+    """
+    Finds array accesses in masked[start:end].
+    Returns:
+        list: (array name, [subscript texts], position, kind) with kind "read", "write" or "update".
+    """
+    accesses = []
+    for match in re.finditer(r"(?<![\]\w.>])([A-Za-z_]\w*)\s*\[", masked[start:end]):
+        name = match.group(1)
+        if name in _KEYWORDS:
+            continue
+        pos = start + match.start()
+        cursor = start + match.end() - 1
+        subscripts = []
+        while cursor < end and masked[cursor] == "[":
+            depth = 0
+            close = cursor
+            while close < end:
+                if masked[close] == "[":
+                    depth += 1
+                elif masked[close] == "]":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                close += 1
+            subscripts.append(masked[cursor + 1:close].strip())
+            cursor = _skip_space(masked, close + 1)
+        if masked[cursor:cursor + 2] == "->" or masked[cursor:cursor + 1] == ".":
+            # Member of an array element (a[i].x = ...): the assignment, if any, follows the member name
+            member = re.match(r"(?:->|\.)\s*[A-Za-z_]\w*", masked[cursor:end])
+            if member:
+                cursor = _skip_space(masked, cursor + member.end())
+        before = masked[max(start, pos - 3):pos].rstrip()
+        op = _ASSIGN_RE.match(masked, _skip_space(masked, cursor))
+        if op and op.group(1):
+            kind = "update"
+        elif op and op.group(2):
+            kind = "write" if op.group(2) == "=" else "update"
+        elif before.endswith(("++", "--")):
+            kind = "update"
+        else:
+            kind = "read"
+        accesses.append((name, subscripts, pos, kind))
+    return accesses
+
+def _subscript_values(subscripts: list, values: dict, symbols: dict):
+    result = []
+    for subscript in subscripts:
+        value = _evaluate(subscript, values, symbols)
+        if value is None:
+            return None
+        result.append(value)
+    return result
+
+def _carried_distance(write: list, other: list, var: str, base_values: dict, symbols: dict):
+    """
+    Returns the iteration distance t != 0 along `var` at which `other` touches the element `write` touches,
+    0 if they only meet within the same iteration, or None if they never meet along this loop.
+    """
+    if any(re.search(r"[%/]", subscript) for subscript in write + other):
+        return "unknown" # Integer division and modulo fold many iterations onto one element
+    w0 = _subscript_values(write, base_values, symbols)
+    o0 = _subscript_values(other, base_values, symbols)
+    stepped = dict(base_values, **{var: base_values[var] + 1})
+    w1 = _subscript_values(write, stepped, symbols)
+    if None in (w0, o0, w1) or len(w0) != len(o0):
+        return "unknown"
+    distance = None
+    for d in range(len(w0)):
+        coefficient = w1[d] - w0[d]
+        delta = o0[d] - w0[d]
+        if coefficient == 0:
+            if delta != 0:
+                return None
+            continue
+        if delta % coefficient != 0:
+            return None
+        t = delta // coefficient
+        if distance is not None and t != distance:
+            return None
+        distance = t
+    if distance is None:
+        return "invariant" # The written element does not move with this loop
+    if abs(distance) >= _SYMBOL_BASE:
+        return None
+    return distance
+
+def _declared_names(text: str) -> set:
+    names = set()
+    for match in re.finditer(_TYPE_RE + r"\s*\**\s*([A-Za-z_]\w*)", text):
+        names.add(match.group(1))
+        # Further declarators in the same declaration: `int a = 0, b, c[4];`
+        rest = text[match.end():]
+        statement = rest[:rest.find(";")] if ";" in rest else rest
+        for extra in re.finditer(r",\s*\**\s*([A-Za-z_]\w*)", re.sub(r"\([^()]*\)|\[[^\[\]]*\]|\{[^{}]*\}", "", statement)):
+            names.add(extra.group(1))
+    return names
+
+def _top_level_operators(expression: str) -> set:
+    """The binary operators of a (masked) expression that are not inside parentheses, brackets or braces."""
+    operators = set()
+    depth = 0
+    position = 0
+    while position < len(expression):
+        char = expression[position]
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif depth == 0:
+            match = _OPERATOR_RE.match(expression, position)
+            if match:
+                operator = match.group(0)
+                before = expression[:position].rstrip()
+                # Unary minus/plus, dereference and address-of follow an operator or start the expression
+                if operator in _PRECEDENCE and before and (before[-1].isalnum() or before[-1] in "_)]."):
+                    operators.add(operator)
+                position = match.end()
+                continue
+        position += 1
+    return operators
+
+def _is_reduction_update(operator: str, rest: str) -> bool:
+    """Whether `x = x <operator> <rest>` folds into x like `x <operator>= (<rest>)`, as a reduction needs."""
+    return all(_PRECEDENCE[other] >= _PRECEDENCE[operator] for other in _top_level_operators(rest))
+
+def _analyze_scalars(loop: LoopInfo, masked: str, inner_vars: set, declared_inside: set):
+    """Classifies scalars written in the loop as reductions, privates or loop-carried dependencies."""
+    body = masked[loop.body_start:loop.end]
+    # Members of a struct variable (`s.total += a[i]`) are shared scalars that no clause can privatize or reduce
+    members = re.finditer(r"(?<![\w.>\]])(?:(?:\+\+|--)\s*)?([A-Za-z_]\w*)((?:\s*\.\s*[A-Za-z_]\w*)+)\s*"
+                          r"(?:\+\+|--|<<=|>>=|[-+*/%&|^]?=(?!=))|(?:\+\+|--)\s*([A-Za-z_]\w*)((?:\s*\.\s*[A-Za-z_]\w*)+)", body)
+    for match in members:
+        base, member = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+        if base in declared_inside or base in inner_vars:
+            continue
+        member = "".join(member.split())
+        dependency = f"struct member '{base}{member}' is written in every iteration"
+        if dependency not in loop.dependencies:
+            loop.dependencies.append(dependency)
+    seen = set()
+    for match in re.finditer(r"(?<![\w.>\]])(?:(\+\+|--)\s*)?([A-Za-z_]\w*)\s*(\+\+|--|<<=|>>=|[-+*/%&|^]?=(?!=))", body):
+        name = match.group(2)
+        if name in seen or name in _KEYWORDS or name == loop.var or name in declared_inside:
+            continue
+        if match.group(3) in ("++", "--") or match.group(1):
+            op = "+="
+        else:
+            op = match.group(3)
+        seen.add(name)
+        if name in inner_vars:
+            loop.private.append(name)
+            continue
+        occurrences = [m.start() for m in re.finditer(r"(?<![\w.>])" + re.escape(name) + r"\b(?!\s*\()", body)]
+        rhs_end = body.find(";", match.end())
+        rhs = body[match.end():rhs_end if rhs_end != -1 else len(body)]
+        if op == "=" and occurrences and occurrences[0] == match.start(2) and not re.search(r"(?<![\w.>])" + re.escape(name) + r"\b", rhs):
+            # Written before any read in the iteration (e.g. a per-iteration temporary or accumulator reset)
+            loop.private.append(name)
+            continue
+        updates = list(re.finditer(r"(?<![\w.>])" + re.escape(name) + r"\s*(\+\+|--|[-+*&|^]=)|(?:\+\+|--)\s*" + re.escape(name) + r"\b", body))
+        self_assign = list(re.finditer(r"(?<![\w.>])" + re.escape(name) + r"\s*=\s*" + re.escape(name) + r"\s*([-+*&|^])(?![-+=&|>])", body))
+        # `r = r * x + c[i]` (a Horner step) is not `r *= (x + c[i])`: its value flows between iterations
+        if any(not _is_reduction_update(m.group(1), body[m.end():body.find(";", m.end())]) for m in self_assign):
+            loop.dependencies.append(f"scalar '{name}' is updated by an expression that is not a reduction")
+            continue
+        minmax = list(re.finditer(r"(?<![\w.>])" + re.escape(name) + r"\s*=\s*(f?max|f?min|MAX|MIN)\s*\(\s*" + re.escape(name) + r"\b", body))
+        # `if (e > m) m = e;` keeps a maximum, `if (m < e) m = e;` too; the mirrored forms keep a minimum
+        if_minmax = []
+        for m in re.finditer(r"if\s*\(([^;{}]*?)\s*([<>])=?\s*" + re.escape(name) + r"\s*\)\s*\{?\s*" + re.escape(name) + r"\s*=(?!=)", body):
+            if_minmax.append("max" if m.group(2) == ">" else "min")
+        for m in re.finditer(r"if\s*\(\s*" + re.escape(name) + r"\s*([<>])=?\s*([^;{}]*?)\)\s*\{?\s*" + re.escape(name) + r"\s*=(?!=)", body):
+            if_minmax.append("max" if m.group(1) == "<" else "min")
+
+        # Every update must fold into the same reduction: `s += a[i]; s *= 0.5;` is a recurrence, not a reduction
+        operators = {_REDUCTION_OPS.get(m.group(1), "+") for m in updates}
+        operators.update("+" if m.group(1) in "+-" else m.group(1) for m in self_assign)
+        operators.update("max" if "max" in m.group(1).lower() else "min" for m in minmax)
+        operators.update(if_minmax)
+        if len(operators) > 1:
+            loop.dependencies.append(f"scalar '{name}' is updated with different operators ({', '.join(sorted(operators))})")
+            continue
+
+        reduction_uses = len(updates) + 2 * len(self_assign) + 2 * len(minmax) + 2 * len(if_minmax)
+        if operators and reduction_uses == len(occurrences):
+            loop.reductions[name] = operators.pop()
+            continue
+        if updates or self_assign or minmax:
+            loop.dependencies.append(f"scalar '{name}' is updated and also read in each iteration")
+            continue
+        # Plain assignment read before it is written (or reading itself): its value flows between iterations
+        loop.dependencies.append(f"scalar '{name}' carries its value from one iteration to the next")
+
+def _analyze_arrays(loop: LoopInfo, masked: str, all_vars: list):
+    accesses = _array_accesses(masked, loop.body_start, loop.end)
+    by_array = {}
+    for access in accesses:
+        by_array.setdefault(access[0], []).append(access)
+    # Distinct small primes per loop variable so different loops never coincide
+    base_values = {var: 7 + 6 * k for k, var in enumerate(all_vars)}
+    for name, group in by_array.items():
+        writes = [a for a in group if a[3] != "read"]
+        for write in writes:
+            symbols = {}
+            distance = _carried_distance(write[1], write[1], loop.var, base_values, symbols)
+            if distance == "unknown":
+                loop.dependencies.append(f"indirect or non-affine write to '{name}[{']['.join(write[1])}]' (may need atomic)")
+                break
+            if distance == "invariant":
+                same_element = all(a[1] == write[1] for a in group)
+                if write[3] == "update" and same_element:
+                    loop.dependencies.append(f"every iteration accumulates into '{name}[{']['.join(write[1])}]' (array reduction)")
+                else:
+                    loop.dependencies.append(f"'{name}[{']['.join(write[1])}]' is written by every iteration of '{loop.var}'")
+                break
+            carried = None
+            for other in group:
+                if other is write:
+                    continue
+                distance = _carried_distance(write[1], other[1], loop.var, base_values, symbols)
+                if distance == "unknown":
+                    carried = f"'{name}' is accessed through an index the analysis cannot follow ('{']['.join(other[1])}')"
+                    break
+                if isinstance(distance, int) and distance != 0:
+                    carried = f"'{name}' carries a dependency of distance {abs(distance)} along '{loop.var}'"
+                    break
+            if carried:
+                loop.dependencies.append(carried)
+                break
+
+def _analyze_loop(loop: LoopInfo, code: str, masked: str, all_vars: list):
+    own = _blank_children(masked, loop)
+    loop.own_flops, loop.own_accesses = _count_operations(own)
+    for child in loop.children:
+        _analyze_loop(child, code, masked, all_vars)
+    loop.work = loop.iterations() * (loop.own_flops + loop.own_accesses + sum(c.work for c in loop.children))
+    if loop.var is None:
+        loop.dependencies.append("loop header is not in canonical form")
+        return
+
+    body = masked[loop.body_start:loop.end]
+    if re.search(r"\b(return|goto)\b|\bexit\s*\(", body):
+        loop.dependencies.append("the loop body can leave the loop early (return/goto/exit)")
+    if re.search(r"\bbreak\b", own) and not re.search(r"\bswitch\b", own):
+        loop.dependencies.append("the loop contains a break")
+    called = set(re.findall(r"\b([A-Za-z_]\w*)\s*\(", body)) - _KEYWORDS
+    calls = called & _SIDE_EFFECT_FUNCTIONS
+    if calls:
+        loop.dependencies.append(f"calls with side effects: {', '.join(sorted(calls))}")
+    # Other non-math calls are assumed pure by the cost model but recorded, since nothing proves it
+    loop.calls = sorted(called - _SIDE_EFFECT_FUNCTIONS - _MATH_FUNCTIONS)
+
+    inner_vars = {l.var for l in _descendants(loop) if l.var}
+    declared_inside = _declared_names(body)
+    _analyze_scalars(loop, masked, inner_vars, declared_inside)
+    _analyze_arrays(loop, masked, all_vars)
+
+def _descendants(loop: LoopInfo) -> list:
+    result = []
+    for child in loop.children:
+        result.append(child)
+        result.extend(_descendants(child))
+    return result
+
+def _choose_parallel_loop(loop: LoopInfo):
+    """The outermost parallel loop, descending into the heaviest child when a level cannot be parallelized."""
+    while loop is not None:
+        if loop.parallel:
+            return loop
+        loop = max(loop.children, key=lambda c: c.work) if loop.children else None
+    return None
+
+# --- Cost model ---
+
+def _verdict(nest: NestAnalysis) -> tuple:
+    if nest.parallel_loop is None:
+        # Unproven is not unsafe: histograms need atomics or privatized bins, recurrences need restructuring
+        if nest.trip_counts_known and nest.work < Config.ANALYSIS_MIN_WORK:
+            return "none", f"too little work (~{nest.work:.0e} operations) to pay for thread start-up"
+        reasons = "; ".join(dict.fromkeys(d for l in nest.loops() for d in l.dependencies)) or "no canonical loop"
+        return "openmp", f"no loop is provably parallel ({reasons}); needs atomics, privatization or restructuring"
+    parallel_work = nest.parallel_loop.work
+    if parallel_work < Config.ANALYSIS_MIN_WORK and not nest.trip_counts_known:
+        return "openmp", "loop bounds are only known at run time; assuming enough work for threads"
+    if parallel_work < Config.ANALYSIS_MIN_WORK:
+        return "none", f"too little work (~{parallel_work:.0e} operations) to pay for thread start-up"
+    if parallel_work >= Config.ANALYSIS_MPI_MIN_WORK and nest.compute_ratio >= Config.ANALYSIS_MPI_MIN_RATIO:
+        inner_parallel = any(c.parallel for c in _descendants(nest.parallel_loop))
+        if inner_parallel:
+            return "hybrid", "large compute-bound nest: distribute the outer loop across ranks and thread the inner loops"
+        return "mpi", "large compute-bound nest: enough work per element to amortize communication across ranks"
+    if nest.compute_ratio < 1:
+        return "openmp", "memory-bound nest on shared data: threads avoid copying data between processes"
+    return "openmp", "parallel loop with enough work for threads on one node"
+
+def _collapsible(masked: str, loop: LoopInfo) -> bool:
+    """True if the loop's only statement is a parallel child loop with bounds independent of this loop's variable."""
+    if len(loop.children) != 1:
+        return False
+    child = loop.children[0]
+    if not child.parallel or masked[loop.body_start:child.start].strip(" \t\n{") or masked[child.end:loop.end].strip(" \t\n};"):
+        return False
+    bounds = " ".join(b for b in (child.lower, child.upper, child.step) if b)
+    return not re.search(r"\b" + re.escape(loop.var) + r"\b", bounds)
+
+def analyze_nest(code: str, masked: str, function, nest_region, values: dict) -> NestAnalysis:
+    loops = _find_loops(code, masked, nest_region.start, nest_region.end, 0, None, values)
+    if not loops:
+        return None
+    root = loops[0]
+    nest = NestAnalysis(nest_region.name, function.name, nest_region.start_line, nest_region.end_line, root)
+    all_vars = [l.var for l in nest.loops() if l.var]
+    _analyze_loop(root, code, masked, all_vars)
+    nest.flops = sum(l.own_flops for l in nest.loops())
+    nest.accesses = sum(l.own_accesses for l in nest.loops())
+    nest.work = root.work
+    nest.trip_counts_known = all(l.trip_count is not None for l in nest.loops())
+    nest.parallel_loop = _choose_parallel_loop(root)
+    chosen = nest.parallel_loop
+    while chosen is not None and _collapsible(masked, chosen):
+        nest.collapse += 1
+        chosen = chosen.children[0]
+    nest.verdict, nest.reason = _verdict(nest)
+    return nest
+
+def _nest_work(nest: NestAnalysis) -> float:
+    return nest.parallel_loop.work if nest.parallel_loop is not None else nest.work
+
+def _has_unmodeled_loops(masked: str, nests: list) -> bool:
+    """True if a while or do loop lies outside every analyzed for-loop nest."""
+    for match in re.finditer(r"\b(?:while|do)\b", masked):
+        line = masked.count("\n", 0, match.start()) + 1
+        if not any(n.start_line <= line <= n.end_line for n in nests):
+            return True
+    return False
+
+def analyze_program(code: str) -> ProgramAnalysis:
+    """
+    Analyzes every loop nest in the file and recommends a paradigm.
+    Returns:
+        ProgramAnalysis: nests in source order, plus paradigm ("openmp", "mpi", "hybrid" or "none") and the reason.
+    """
+    masked = mask_code(code)
+    constants = find_constants(code)
+    nests = []
+    for function in find_functions(code):
+        masked_function = masked[function.start:function.end]
+        values = dict(constants, **_single_assignment_locals(masked_function, function.text))
+        for nest_region in find_loop_nests(code, function):
+            nest = analyze_nest(code, masked, function, nest_region, values)
+            if nest is not None:
+                nests.append(nest)
+
+    if "MPI_" in code.upper():
+        return ProgramAnalysis(nests, "mpi", "the code already uses MPI")
+    candidates = [n for n in nests if n.verdict != "none"]
+    if not candidates:
+        # Only measured lack of work rules a file out; loops the analysis cannot model are left to the expert
+        if _has_unmodeled_loops(masked, nests):
+            return ProgramAnalysis(nests, "openmp", "while/do loops the analysis cannot model; leaving them to the expert")
+        if not nests:
+            return ProgramAnalysis(nests, "openmp", "the file has no loop nests to analyze; leaving it to the expert")
+        return ProgramAnalysis(nests, "none", "no loop nest has enough work to be worth parallelizing")
+    work_by_paradigm = {}
+    for nest in candidates:
+        work_by_paradigm[nest.verdict] = work_by_paradigm.get(nest.verdict, 0.0) + _nest_work(nest)
+    paradigm = max(work_by_paradigm, key=work_by_paradigm.get)
+    dominant = max((n for n in candidates if n.verdict == paradigm), key=_nest_work)
+    return ProgramAnalysis(nests, paradigm, f"dominant nest {dominant.name}: {dominant.reason}")
+
+def format_analysis_note(nests: list, start_line: int = None, end_line: int = None) -> str:
+    """
+    Summarizes nest analyses (as returned by ProgramAnalysis.to_dicts()) for an expert prompt.
+    With start_line/end_line, only nests inside that line range are described.
+    """
+    selected = [n for n in nests if start_line is None or (start_line <= n["start_line"] and n["end_line"] <= end_line)]
+    if not selected:
+        return ""
+    lines = ["Static analysis of the loop nests (estimates; verify before relying on them):"]
+    for n in selected:
+        loops = ", ".join(f"{l['var'] or '?'} (~{l['trip_count'] if l['trip_count'] is not None else '?'} iterations)" for l in n["loops"])
+        parts = [f"- {n['name']} (lines {n['start_line']}-{n['end_line']}): loops {loops}"]
+        if n["parallel_loop"]:
+            target = f"parallelize '{n['parallel_loop']['var']}' (line {n['parallel_loop']['line']})"
+            if n["collapse"] > 1:
+                target += f" with collapse({n['collapse']})"
+            parts.append(target)
+        if n["reductions"]:
+            parts.append("reductions: " + ", ".join(f"{var} ({op})" for var, op in n["reductions"].items()))
+        if n["private"]:
+            parts.append("must be private: " + ", ".join(n["private"]))
+        dependencies = list(dict.fromkeys(d for l in n["loops"] for d in l["dependencies"]))
+        if dependencies:
+            parts.append("dependencies: " + "; ".join(dependencies))
+        parts.append(f"~{n['work']:.1e} operations, {n['compute_ratio']:.2f} operations per array access")
+        parts.append(f"recommendation: {'leave serial' if n['verdict'] == 'none' else n['verdict']} ({n['reason']})")
+        lines.append("; ".join(parts) + ".")
+    return "\n".join(lines)
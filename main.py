@@ -1,33 +1,107 @@
 import sys
 import os
 import argparse
+import shlex
 from agents.orchestrator import Orchestrator
+from agents.mpi_harness import write_scaling_csv
+from project import run_project
+from batch import is_batch_target, collect_sources, make_output_path, run_batch, print_summary
+from concurrency import configure_limits
+from groq_client import set_cache_enabled, get_cache_stats
+from llm_backends import create_backend, set_backend
+from tracing import tracer, set_tracing_enabled, write_trace, format_summary
 from utils import Logger, LogColors 
 import time 
 
 AGENT_NAME = "MainScript"
 
+def finish_trace(trace_prefix: str):
+    """Prints where the time went and writes the trace files, if tracing was requested."""
+    if not trace_prefix:
+        return
+    Logger.info(f"Stage timings:\n{format_summary(tracer.summary())}", AGENT_NAME, LogColors.MAIN)
+    try:
+        jsonl_path, chrome_path = write_trace(trace_prefix)
+        Logger.info(f"Trace written to {jsonl_path} and {chrome_path}", AGENT_NAME, LogColors.MAIN)
+    except OSError as e:
+        Logger.error(f"Failed to write trace files for {trace_prefix}: {e}", AGENT_NAME)
+
 if __name__ == "__main__":
     Logger.info("Application started.", AGENT_NAME, LogColors.MAIN)
     
     # Set up command line argument parser
     parser = argparse.ArgumentParser(description="Parallelize C code using OpenMP or MPI")
-    parser.add_argument("source_file", help="Path to the C source file to parallelize")
+    parser.add_argument("source_file", help="Path to the C source file to parallelize, or a directory/glob for batch mode")
     parser.add_argument("-p", "--project-dir", help="Root directory of the C project")
     parser.add_argument("-i", "--include-dirs", nargs='+', help="Include directories (relative to project dir)")
     parser.add_argument("-f", "--extra-files", nargs='+', help="Additional C files to compile")
     parser.add_argument("-c", "--compiler-flags", nargs='+', help="Additional compiler flags")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk LLM response cache")
+    parser.add_argument("--fresh", action="store_true", help="Ignore stored results and interrupted attempts of an identical earlier run")
+    parser.add_argument("--project", action="store_true", help="Treat source_file as a project directory: parallelize its hot translation units incrementally and validate them with one combined build")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Batch mode: also search subdirectories")
+    parser.add_argument("--max-files", type=int, help="Batch mode: maximum concurrent orchestrations")
+    parser.add_argument("--max-llm-calls", type=int, help="Maximum concurrent LLM requests")
+    parser.add_argument("--max-compiles", type=int, help="Maximum concurrent compiler processes")
+    parser.add_argument("-k", "--candidates", type=int, help="Candidates generated per attempt (compile-and-time tournament)")
+    parser.add_argument("--benchmark", action="store_true", help="Time the result against the serial original and reject slowdowns")
+    parser.add_argument("--threads", type=int, nargs='+', help="OMP_NUM_THREADS values to benchmark with (per rank, for hybrid code)")
+    parser.add_argument("--ranks", type=int, nargs='+', help="MPI rank counts (mpirun -np) to benchmark MPI results with")
+    parser.add_argument("--weak-args", help="MPI weak scaling: program arguments with {n} (= --weak-base x ranks) and {ranks} placeholders")
+    parser.add_argument("--weak-base", type=int, help="MPI weak scaling: problem size per rank substituted for {n}")
+    parser.add_argument("--repetitions", type=int, help="Benchmark runs per configuration (median is used)")
+    parser.add_argument("--run-timeout", type=float, help="Seconds before a benchmark run is killed")
+    parser.add_argument("--run-args", help="Arguments passed to the program when profiling/benchmarking, as one quoted string")
+    parser.add_argument("--profile", action="store_true", help="Profile the original (gprof/gcov) and send only the hot regions to the expert")
+    parser.add_argument("--profile-top", type=int, help="Number of hot regions to send when profiling")
+    parser.add_argument("--autotune", action="store_true", help="Sweep schedule/chunk/collapse/proc_bind/threads on the accepted OpenMP code and keep the fastest")
+    parser.add_argument("--locality", action="store_true", help="Restructure the serial code for cache locality (interchange, tiling, AoS to SoA) before parallelizing, keeping only timed improvements")
+    parser.add_argument("--vectorize", action="store_true", help="Make the hot inner loops of accepted OpenMP code SIMD-vectorizable, guided by GCC's vectorizer report")
+    parser.add_argument("--min-speedup", type=float, help="Minimum speedup required to accept a result")
+    parser.add_argument("--paradigm", choices=["auto", "openmp", "mpi", "hybrid"], default="auto",
+                        help="Parallelization paradigm; 'auto' (default) lets the static loop analysis decide")
+    parser.add_argument("--no-rule-based", action="store_true", help="Always use the LLM, even for loops the rule-based fast path can handle")
+    parser.add_argument("--refine-mode", choices=["patch", "full"], help="Refine by asking for a patch (default) or for the whole file")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], type=str.upper,
+                        help="Minimum log level to print (default INFO, or $PARAGINEERS_LOG_LEVEL)")
+    parser.add_argument("--llm-backend", choices=["groq", "openai"], help="LLM backend: Groq (default) or an OpenAI-compatible server")
+    parser.add_argument("--llm-url", help="Base URL of the OpenAI-compatible server, e.g. http://localhost:8000/v1")
+    parser.add_argument("--llm-model", help="Model name to request (default Config.MODEL_NAME, or LLM_LOCAL_MODEL for --llm-backend openai)")
+    llm_store = parser.add_mutually_exclusive_group()
+    llm_store.add_argument("--record", metavar="DIR", help="Record every prompt/response pair in DIR for later replay")
+    llm_store.add_argument("--replay", metavar="DIR", help="Answer prompts only from responses recorded in DIR (no network)")
+    parser.add_argument("--trace", metavar="PREFIX", help="Record per-stage timings; writes PREFIX.jsonl and PREFIX.trace.json (Chrome trace)")
     
     # Parse arguments
     args = parser.parse_args()
+
+    if args.log_level:
+        Logger.set_level(args.log_level)
+    if args.trace:
+        set_tracing_enabled(True)
+
+    if args.no_cache:
+        set_cache_enabled(False)
+    if args.llm_backend or args.llm_url or args.llm_model or args.record or args.replay:
+        try:
+            set_backend(create_backend(args.llm_backend, args.llm_url, args.llm_model, args.record, args.replay))
+        except ValueError as e:
+            Logger.error(str(e), AGENT_NAME)
+            sys.exit(1)
+    if args.max_llm_calls or args.max_compiles:
+        configure_limits(args.max_llm_calls, args.max_compiles)
     
     source_file_path = args.source_file
-    if not os.path.isfile(source_file_path):
+    if args.project and not os.path.isdir(source_file_path):
+        Logger.error(f"Project directory not found: {source_file_path}", AGENT_NAME)
+        sys.exit(1)
+    batch_mode = not args.project and is_batch_target(source_file_path)
+    if not batch_mode and not args.project and not os.path.isfile(source_file_path):
         Logger.error(f"Source file not found: {source_file_path}", AGENT_NAME)
         sys.exit(1)
     
-    # Set project directory
-    project_dir = args.project_dir if args.project_dir else os.path.dirname(source_file_path)
+    # Set project directory (in batch mode an unset project dir defaults to each file's directory)
+    project_dir = args.project_dir if args.project_dir else (None if batch_mode else os.path.dirname(source_file_path))
     
     # Set results directory
     results_dir = os.path.join(os.path.dirname(__file__) or ".", "results")
@@ -39,11 +113,87 @@ if __name__ == "__main__":
             Logger.error(f"Could not create results directory {results_dir}: {e}", AGENT_NAME)
             results_dir = os.path.dirname(source_file_path)
     
+    # Create compilation context with all parameters
+    compilation_context = {
+        "project_dir": project_dir,
+        "include_dirs": args.include_dirs,
+        "extra_files": args.extra_files,
+        "extra_flags": args.compiler_flags,
+        "num_candidates": args.candidates,
+        "refine_mode": args.refine_mode,
+        "paradigm": args.paradigm,
+        "rule_based": not args.no_rule_based,
+        "resume": not args.fresh
+    }
+    if args.vectorize:
+        compilation_context["vectorize"] = True
+    if args.profile:
+        compilation_context["profile"] = {
+            "run_args": shlex.split(args.run_args) if args.run_args else None,
+            "top_n": args.profile_top,
+            "timeout": args.run_timeout
+        }
+    if args.benchmark:
+        compilation_context["benchmark"] = {
+            "threads": args.threads,
+            "repetitions": args.repetitions,
+            "timeout": args.run_timeout,
+            "run_args": shlex.split(args.run_args) if args.run_args else None,
+            "min_speedup": args.min_speedup,
+            "ranks": args.ranks,
+            "weak_args": args.weak_args,
+            "weak_base": args.weak_base
+        }
+    if args.locality:
+        compilation_context["locality"] = {
+            "repetitions": args.repetitions,
+            "timeout": args.run_timeout,
+            "run_args": shlex.split(args.run_args) if args.run_args else None
+        }
+    if args.autotune:
+        compilation_context["autotune"] = {
+            "threads": args.threads,
+            "repetitions": args.repetitions,
+            "timeout": args.run_timeout,
+            "run_args": shlex.split(args.run_args) if args.run_args else None
+        }
+
+    if args.project:
+        project_start = time.perf_counter()
+        success = False
+        records = []
+        try:
+            records, output_dir, success = run_project(source_file_path, compilation_context, results_dir, max_files=args.max_files)
+            print_summary(records, time.perf_counter() - project_start)
+            Logger.info(f"Project written to {output_dir} (combined build {'succeeded' if success else 'FAILED'}).",
+                        AGENT_NAME, LogColors.MAIN)
+        except FileNotFoundError as e:
+            Logger.error(str(e), AGENT_NAME)
+        finally:
+            cache_stats = get_cache_stats()
+            Logger.info(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses.", AGENT_NAME, LogColors.MAIN)
+            finish_trace(args.trace)
+            Logger.info("Application finished.", AGENT_NAME, LogColors.MAIN)
+        sys.exit(0 if success and all(r["status"] in ("ok", "unchanged", "cold") for r in records) else 1)
+
+    if batch_mode:
+        sources = collect_sources(source_file_path, recursive=args.recursive)
+        if not sources:
+            Logger.error(f"No C source files matched: {source_file_path}", AGENT_NAME)
+            sys.exit(1)
+        batch_start = time.perf_counter()
+        try:
+            records = run_batch(sources, compilation_context, results_dir, max_files=args.max_files)
+            print_summary(records, time.perf_counter() - batch_start)
+        finally:
+            cache_stats = get_cache_stats()
+            Logger.info(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses.", AGENT_NAME, LogColors.MAIN)
+            finish_trace(args.trace)
+            Logger.info("Application finished.", AGENT_NAME, LogColors.MAIN)
+        sys.exit(0 if all(r["status"] == "ok" for r in records) else 1)
+
     # Generate output filename
-    base_name = os.path.splitext(os.path.basename(source_file_path))[0]
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    output_filename = f"output_{base_name}_{timestamp}.c"
-    output_file_path = os.path.join(results_dir, output_filename)
+    output_file_path = make_output_path(results_dir, source_file_path, reserve=False)
     
     # Log input parameters
     Logger.info(f"Input C file: {source_file_path}", AGENT_NAME, LogColors.MAIN)
@@ -56,14 +206,6 @@ if __name__ == "__main__":
         Logger.info(f"Additional compiler flags: {args.compiler_flags}", AGENT_NAME, LogColors.MAIN)
     Logger.info(f"Output parallelized C file will be: {output_file_path}", AGENT_NAME, LogColors.MAIN)
     
-    # Create compilation context with all parameters
-    compilation_context = {
-        "project_dir": project_dir,
-        "include_dirs": args.include_dirs,
-        "extra_files": args.extra_files,
-        "extra_flags": args.compiler_flags
-    }
-    
     # Initialize orchestrator and run the parallelization
     orchestrator = Orchestrator()
     try:
@@ -73,6 +215,9 @@ if __name__ == "__main__":
             with open(output_file_path, "w") as f:
                 f.write(parallel_code)
             Logger.success(f"Parallelized code saved to {output_file_path}", AGENT_NAME)
+            if orchestrator.last_benchmark and orchestrator.last_benchmark.get("strong"):
+                for csv_path in write_scaling_csv(orchestrator.last_benchmark, os.path.splitext(output_file_path)[0] + "_scaling"):
+                    Logger.info(f"Scaling results saved to {csv_path}", AGENT_NAME, LogColors.MAIN)
         except IOError as e:
             Logger.error(f"Failed to write output file {output_file_path}: {e}", AGENT_NAME)
             print("\n--- BEGIN PARALLELIZED CODE ---\n")
@@ -86,4 +231,7 @@ if __name__ == "__main__":
     except Exception as e:
         Logger.error(f"An unexpected error occurred in main: {e}", AGENT_NAME)
     finally:
+        cache_stats = get_cache_stats()
+        Logger.info(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses.", AGENT_NAME, LogColors.MAIN)
+        finish_trace(args.trace)
         Logger.info("Application finished.", AGENT_NAME, LogColors.MAIN)
\ No newline at end of file
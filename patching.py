@@ -0,0 +1,183 @@
+import re
+
+# Applies the small edits returned by patch-mode refine prompts. Two formats are accepted:
+#
+#   * a unified diff (`@@ -12,4 +12,5 @@` hunks with ' ', '-' and '+' lines), and
+#   * line-range edits against the numbered listing the model was shown:
+#         ### replace 12-14        ### insert after 20        ### delete 31-33
+#         <new lines>              <new lines>
+#
+# Models get hunk line numbers wrong often enough that diff hunks are located by their
+# content, searching outward from the stated position; whitespace differences are tolerated.
+
+_HUNK_HEADER_RE = re.compile(r"^@@\s*(?:-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?)?\s*@@")
+_EDIT_HEADER_RE = re.compile(r"^###\s*(replace|delete)\s+(\d+)(?:\s*-\s*(\d+))?\s*$|^###\s*insert\s+after\s+(\d+)\s*$", re.I)
+
+class PatchError(Exception):
+    """Raised when a patch cannot be parsed or does not apply to the code."""
+
+def number_lines(code: str) -> str:
+    """Prefixes every line with its 1-based number, so the model can refer to lines precisely."""
+    lines = code.split("\n")
+    width = len(str(len(lines)))
+    return "\n".join(f"{i:>{width}}| {line}" for i, line in enumerate(lines, 1))
+
+def _strip_line_number(line: str) -> str:
+    # Models sometimes copy the listing's "12| " prefixes into their edits
+    match = re.match(r"^\s*\d+\| ?", line)
+    return line[match.end():] if match else line
+
+def _extract_patch_text(response: str) -> str:
+    """Returns the body of the first ```diff/```patch block, or the whole response when it is not fenced."""
+    fenced = re.search(r"```(?:diff|patch|udiff)?[ \t]*\n(.*?)```", response, re.S)
+    return fenced.group(1) if fenced else response
+
+def is_unified_diff(text: str) -> bool:
+    return any(_HUNK_HEADER_RE.match(line) for line in text.splitlines())
+
+def is_line_edits(text: str) -> bool:
+    return any(_EDIT_HEADER_RE.match(line.strip()) for line in text.splitlines())
+
+def parse_unified_diff(text: str) -> list:
+    """
+    Parses the hunks of a unified diff. File headers (---/+++) and anything outside hunks are ignored.
+    Returns:
+        list: (old start line or None, [(op, text), ...]) per hunk, op being " ", "-" or "+".
+    """
+    hunks = []
+    current = None
+    blank_run = 0 # Bare empty lines are context only if more hunk lines follow (models often drop the leading space)
+    for line in text.splitlines():
+        header = _HUNK_HEADER_RE.match(line)
+        if header:
+            current = (int(header.group(1)) if header.group(1) else None, [])
+            hunks.append(current)
+            blank_run = 0
+            continue
+        if current is None or line.startswith(("--- ", "+++ ", "\\")):
+            continue
+        if line == "":
+            blank_run += 1
+            continue
+        current[1].extend([(" ", "")] * blank_run)
+        blank_run = 0
+        if line[0] in "+-":
+            current[1].append((line[0], _strip_line_number(line[1:])))
+        else:
+            current[1].append((" ", _strip_line_number(line[1:] if line.startswith(" ") else line)))
+    if not hunks:
+        raise PatchError("No diff hunks found.")
+    return hunks
+
+def _matches(lines: list, at: int, block: list, normalize) -> bool:
+    if at < 0 or at + len(block) > len(lines):
+        return False
+    return all(normalize(lines[at + i]) == normalize(block[i]) for i in range(len(block)))
+
+def _locate(lines: list, block: list, expected: int) -> int:
+    """Finds where `block` occurs in `lines`, preferring the position closest to `expected`."""
+    for normalize in (lambda s: s, lambda s: s.rstrip(), lambda s: " ".join(s.split())):
+        candidates = [i for i in range(len(lines) - len(block) + 1) if _matches(lines, i, block, normalize)]
+        if candidates:
+            return min(candidates, key=lambda i: abs(i - expected))
+    return -1
+
+def apply_unified_diff(code: str, text: str) -> str:
+    """
+    Applies a unified diff to the code. Every hunk is located in the unpatched code, so hunks
+    may come in any order. Raises PatchError if a hunk cannot be placed or two hunks overlap.
+    """
+    lines = code.split("\n")
+    placed = []
+    for number, (old_start, ops) in enumerate(parse_unified_diff(text), 1):
+        old_lines = [line for op, line in ops if op != "+"]
+        if old_lines:
+            at = _locate(lines, old_lines, (old_start or 1) - 1)
+            if at == -1:
+                raise PatchError(f"Hunk {number} does not match the code:\n" + "\n".join(old_lines))
+        elif old_start is None:
+            raise PatchError(f"Hunk {number} has neither context nor a line number.")
+        else:
+            at = min(len(lines), old_start) # Pure insertion after line old_start
+        # Context lines keep the file's own text, in case the model changed their whitespace
+        new_lines = []
+        cursor = at
+        for op, line in ops:
+            if op == "+":
+                new_lines.append(line)
+            else:
+                if op == " ":
+                    new_lines.append(lines[cursor])
+                cursor += 1
+        placed.append((at, len(old_lines), new_lines))
+
+    placed.sort(key=lambda p: p[0])
+    for (at, length, _), (next_at, _, _) in zip(placed, placed[1:]):
+        if next_at < at + length:
+            raise PatchError(f"Hunks overlap at line {next_at + 1}.")
+    for at, length, new_lines in reversed(placed):
+        lines[at:at + length] = new_lines
+    return "\n".join(lines)
+
+def parse_line_edits(text: str) -> list:
+    """
+    Parses line-range edits.
+    Returns:
+        list: (first line, last line, new lines) per edit, with last = first - 1 for an insertion.
+    """
+    edits = []
+    current = None
+    for line in text.splitlines():
+        header = _EDIT_HEADER_RE.match(line.strip())
+        if header:
+            if header.group(4):
+                after = int(header.group(4))
+                current = (after + 1, after, [])
+            else:
+                first = int(header.group(2))
+                last = int(header.group(3) or first)
+                if last < first:
+                    raise PatchError(f"Invalid line range {first}-{last}.")
+                current = (first, last, [])
+                if header.group(1).lower() == "delete":
+                    edits.append(current)
+                    current = None
+                    continue
+            edits.append(current)
+            continue
+        if current is not None:
+            current[2].append(_strip_line_number(line))
+    if not edits:
+        raise PatchError("No line edits found.")
+    return edits
+
+def apply_line_edits(code: str, text: str) -> str:
+    """Applies line-range edits (numbered against the original code). Raises PatchError on overlapping or out-of-range edits."""
+    lines = code.split("\n")
+    edits = sorted(parse_line_edits(text), key=lambda e: (e[0], e[1]))
+    for (first, last, _), (next_first, _, _) in zip(edits, edits[1:]):
+        if next_first <= last:
+            raise PatchError(f"Edits overlap at line {next_first}.")
+    # Apply bottom-up so earlier line numbers stay valid
+    for first, last, new_lines in reversed(edits):
+        if first < 1 or last > len(lines) or first > len(lines) + 1:
+            raise PatchError(f"Line range {first}-{last} is outside the file ({len(lines)} lines).")
+        while new_lines and not new_lines[-1].strip():
+            new_lines = new_lines[:-1] # Blank separator lines between edit blocks
+        lines[first - 1:last] = new_lines
+    return "\n".join(lines)
+
+def apply_patch(code: str, response: str) -> str:
+    """
+    Applies an LLM patch response (unified diff or line-range edits) to the code.
+    Returns:
+        str: The patched code.
+    Raises:
+        PatchError: If the response holds no patch, or the patch does not apply.
+    """
+    text = _extract_patch_text(response)
+    if is_unified_diff(text):
+        return apply_unified_diff(code, text)
+    if is_line_edits(text):
+        return apply_line_edits(code, text)
+    raise PatchError("The response contains neither a unified diff nor line edits.")
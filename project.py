@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from agents.checker import Checker
+from agents.orchestrator import Orchestrator
+from c_regions import find_functions, included_headers, mask_code
+from config import Config
+from diagnostics import parse_diagnostics
+from llm_backends import get_backend
+from loop_analysis import analyze_program
+from run_store import RunStore
+from utils import Logger, LogColors
+
+AGENT_NAME = "Project"
+
+_CALL_RE = re.compile(r"\b([A-Za-z_]\w*)\s*\(")
+_SKIPPED_DIRS = {"results", "build", "__pycache__"}
+
+# Context entries that don't change what a unit's parallel version looks like
+_FINGERPRINT_IGNORED_CONTEXT = ("resume", "project_dir", "extra_files")
+
+class ProjectUnit:
+    """One translation unit (.c file) of a project, with its place in the include/call graph."""
+
+    def __init__(self, path: str, code: str):
+        self.path = path             # Relative to the project directory
+        self.code = code
+        self.headers = []            # Project headers it includes, directly or through other headers
+        self.defines = {}            # Non-static function name -> signature (the definition's header)
+        self.calls = set()           # Names of the functions it calls
+        self.callees = set()         # Units defining the functions it calls
+        self.callers = set()         # Units calling its functions
+        self.analysis = None
+        self.fingerprint = None
+
+    @property
+    def has_main(self) -> bool:
+        return "main" in self.defines
+
+    @property
+    def hot(self) -> bool:
+        """Whether the unit goes to an expert: anything but a measured lack of work (as for a single file)."""
+        return self.analysis is not None and self.analysis.paradigm != "none"
+
+def scan_project(project_dir: str, include_dirs: list = None) -> dict:
+    """
+    Finds every translation unit under project_dir and builds the include/call dependency graph between them.
+    Directories starting with "." and build/result directories are skipped, as are temp files left by the checker.
+    Returns:
+        dict: {relative path: ProjectUnit}, sorted by path.
+    """
+    project_dir = os.path.abspath(project_dir)
+    units = {}
+    for root, dirs, files in os.walk(project_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in _SKIPPED_DIRS)
+        for name in sorted(files):
+            if not name.endswith(".c") or name.startswith("temp_generated_code"):
+                continue
+            path = os.path.relpath(os.path.join(root, name), project_dir)
+            try:
+                with open(os.path.join(root, name), "r") as f:
+                    units[path] = ProjectUnit(path, f.read())
+            except (OSError, UnicodeDecodeError) as e:
+                Logger.warning(f"Skipping unreadable file {path}: {e}", AGENT_NAME)
+
+    header_cache = {}
+    definitions = {}
+    for unit in units.values():
+        # Only headers inside the project are its dependencies; the project root is searched last, as before
+        search_dirs = [os.path.join(project_dir, d) for d in include_dirs or []] + [project_dir]
+        headers = included_headers(os.path.join(project_dir, unit.path), unit.code, search_dirs, header_cache)
+        unit.headers = sorted(h for h in (os.path.relpath(h, project_dir) for h in headers) if not h.startswith(".."))
+        masked = mask_code(unit.code)
+        for region in find_functions(unit.code):
+            brace = masked.index("{", region.start)
+            header = unit.code[region.start:brace]
+            unit.calls.update(_CALL_RE.findall(masked[brace:region.end]))
+            if not re.match(r"\s*static\b", header):
+                unit.defines[region.name] = " ".join(header.split())
+                definitions.setdefault(region.name, unit)
+    for unit in units.values():
+        for name in unit.calls:
+            callee = definitions.get(name)
+            if callee is not None and callee is not unit:
+                unit.callees.add(callee.path)
+                callee.callers.add(unit.path)
+    return units
+
+def unit_fingerprint(unit: ProjectUnit, units: dict, project_dir: str, compilation_context: dict, model: str) -> str:
+    """
+    Hashes what a unit's parallel version depends on: its code, the headers it includes, the signatures of the
+    functions it calls in other units, the compilation context and the model. A body-only edit of a called
+    function leaves its callers' fingerprints unchanged.
+    """
+    headers = {}
+    for header in unit.headers:
+        try:
+            with open(os.path.join(project_dir, header), "rb") as f:
+                headers[header] = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            headers[header] = None
+    signatures = sorted(units[callee].defines[name] for callee in unit.callees for name in unit.calls
+                        if name in units[callee].defines)
+    context = {k: v for k, v in compilation_context.items() if k not in _FINGERPRINT_IGNORED_CONTEXT}
+    material = {"code": unit.code, "headers": headers, "signatures": signatures, "context": context, "model": model}
+    return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _run_unit(unit: ProjectUnit, units: dict, project_dir: str, compilation_context: dict) -> dict:
+    """Parallelizes one translation unit, linked against the original versions of all the others."""
+    context = dict(compilation_context, project_dir=project_dir,
+                   extra_files=[path for path in units if path != unit.path])
+    if context.get("paradigm") in (None, "auto") and not unit.has_main:
+        # MPI setup belongs in the unit holding main(); library units get thread-level parallelism
+        context["paradigm"] = "openmp"
+
+    # Each unit gets its own orchestrator: experts keep per-run state between process and refine
+    orchestrator = Orchestrator()
+    start = time.perf_counter()
+    record = {"source": unit.path, "status": "failed", "attempts": 0, "wall_time": 0.0, "output": None, "error": "",
+              "speedup": None, "code": None}
+    try:
+        record["code"] = orchestrator.run(os.path.join(project_dir, unit.path), context)
+        record["status"] = "ok"
+    except Exception as e:
+        record["error"] = str(e).splitlines()[0] if str(e) else type(e).__name__
+    record["attempts"] = orchestrator.last_attempts
+    if orchestrator.last_benchmark and orchestrator.last_benchmark.get("best"):
+        record["speedup"] = orchestrator.last_benchmark["best"]["speedup"]
+    record["wall_time"] = time.perf_counter() - start
+    return record
+
+def run_project(project_dir: str, compilation_context: dict, results_dir: str, max_files: int = None, checker=None,
+                run_store: RunStore = None):
+    """
+    Parallelizes a whole project incrementally. Hot translation units whose fingerprint changed since the last
+    validated run are parallelized concurrently; unchanged ones reuse their stored parallel version. The result is
+    validated with one combined build of every unit, and units whose new version breaks it are reverted to the
+    original. The project tree is written to results/project_<name>_<timestamp>/.
+    Args:
+        project_dir (str): Root of the project; every .c file under it is part of one program.
+        compilation_context (dict): As for a single run; extra_files is ignored (the project's units replace it).
+        results_dir (str): Directory the output tree is created in.
+        max_files (int): Maximum number of units parallelized at once.
+        checker (Checker): Checker for the combined build (one is created if omitted).
+        run_store (RunStore): Store of unit fingerprints (the default store if omitted).
+    Returns:
+        tuple: (records, output directory, combined build succeeded) where records are batch-style summaries per unit,
+               with status "ok", "unchanged", "cold" (nothing worth parallelizing), "reverted" or "failed".
+    """
+    project_dir = os.path.abspath(project_dir)
+    max_files = max_files or Config.MAX_CONCURRENT_FILES
+    checker = checker or Checker()
+    run_store = run_store or RunStore()
+    include_dirs = compilation_context.get("include_dirs")
+
+    units = scan_project(project_dir, include_dirs)
+    if not units:
+        raise FileNotFoundError(f"No C source files found under {project_dir}")
+    for unit in units.values():
+        unit.analysis = analyze_program(unit.code)
+    edges = sum(len(u.callees) for u in units.values())
+    Logger.info(f"Project {project_dir}: {len(units)} translation unit(s), {sum(len(u.headers) for u in units.values())} "
+                f"header dependencies, {edges} cross-unit call edge(s), {sum(u.hot for u in units.values())} hot unit(s).",
+                AGENT_NAME, LogColors.MAIN)
+
+    model = get_backend().model
+    stored = run_store.project_units(project_dir) if compilation_context.get("resume", True) else {}
+    outputs = {path: unit.code for path, unit in units.items()}
+    records = {}
+    pending = []
+    for path, unit in units.items():
+        unit.fingerprint = unit_fingerprint(unit, units, project_dir, compilation_context, model)
+        record = {"source": path, "status": "cold", "attempts": 0, "wall_time": 0.0, "output": None, "error": "",
+                  "speedup": None, "code": None}
+        previous = stored.get(path)
+        if not unit.hot:
+            records[path] = record
+        elif previous and previous["fingerprint"] == unit.fingerprint and previous["status"] == "ok":
+            outputs[path] = previous["code"]
+            records[path] = dict(record, status="unchanged", code=previous["code"])
+        else:
+            pending.append(unit)
+    Logger.info(f"{len(pending)} unit(s) to parallelize, {sum(r['status'] == 'unchanged' for r in records.values())} "
+                f"unchanged since the last run.", AGENT_NAME, LogColors.MAIN)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(max_files, len(pending))) as executor:
+            futures = {executor.submit(_run_unit, unit, units, project_dir, compilation_context): unit for unit in pending}
+            for future in as_completed(futures):
+                record = future.result()
+                records[record["source"]] = record
+                if record["status"] == "ok":
+                    outputs[record["source"]] = record["code"]
+                    Logger.success(f"{record['source']} parallelized in {record['wall_time']:.1f}s.", AGENT_NAME)
+                else:
+                    Logger.warning(f"{record['source']} failed: {record['error']}", AGENT_NAME)
+
+    # One combined build validates every unit against the others' new versions
+    use_openmp = compilation_context.get("paradigm") != "mpi"
+    def build(sources):
+        return checker.build_project(sources, project_dir, include_dirs, compilation_context.get("extra_flags"), use_openmp)
+
+    success, errors = build(outputs)
+    while not success:
+        changed = {p for p in outputs if outputs[p] != units[p].code}
+        broken = sorted({d.file for d in parse_diagnostics(errors) if d.is_error} & changed)
+        if broken:
+            Logger.warning(f"Combined build failed in {broken}; reverting them to the original code.", AGENT_NAME)
+            _revert(broken, units, outputs, records)
+            success, errors = build(outputs)
+            continue
+        if not changed:
+            Logger.error(f"The combined build fails even with the original code:\n{errors}", AGENT_NAME)
+            break
+        # Link errors (duplicate or missing symbols) are reported against temporary objects, not units
+        success, errors = build(dict(outputs, **{p: units[p].code for p in changed}))
+        if not success:
+            Logger.error(f"The combined build fails even with the original code:\n{errors}", AGENT_NAME)
+            break
+        Logger.warning(f"The combined build errors name no changed unit; reverting all {len(changed)} and restoring them "
+                       f"one at a time.", AGENT_NAME)
+        new_versions = {p: outputs[p] for p in changed}
+        _revert(changed, units, outputs, records)
+        for path in sorted(changed):
+            restored, _ = build(dict(outputs, **{path: new_versions[path]}))
+            if restored:
+                outputs[path] = new_versions[path]
+                records[path].update(status=records[path].pop("reverted_from"), error="")
+        break
+
+    for path, unit in units.items():
+        status = records[path]["status"]
+        if status == "ok" and success:
+            run_store.record_unit(project_dir, path, unit.fingerprint, "ok", outputs[path])
+        elif status in ("failed", "reverted"):
+            run_store.record_unit(project_dir, path, unit.fingerprint, "failed")
+
+    output_dir = _write_tree(project_dir, units, outputs, results_dir)
+    for path, record in records.items():
+        record["output"] = os.path.join(output_dir, path)
+        record.pop("code", None)
+        record.pop("reverted_from", None)
+    return [records[path] for path in units], output_dir, success
+
+def _revert(paths, units: dict, outputs: dict, records: dict):
+    """Puts the original code of the given units back into outputs and marks their records as reverted."""
+    for path in paths:
+        outputs[path] = units[path].code
+        records[path].update(status="reverted", error="broke the combined build", reverted_from=records[path]["status"])
+
+def _write_tree(project_dir: str, units: dict, outputs: dict, results_dir: str) -> str:
+    """Writes every unit's output, plus the headers they include, to results/project_<name>_<timestamp>/."""
+    name = os.path.basename(project_dir.rstrip(os.sep)) or "project"
+    output_dir = os.path.join(results_dir, f"project_{name}_{time.strftime('%Y%m%d-%H%M%S')}")
+    counter = 1
+    while os.path.exists(output_dir):
+        output_dir = os.path.join(results_dir, f"project_{name}_{time.strftime('%Y%m%d-%H%M%S')}_{counter}")
+        counter += 1
+    for path, code in outputs.items():
+        target = os.path.join(output_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w") as f:
+            f.write(code)
+    for header in sorted({h for unit in units.values() for h in unit.headers}):
+        target = os.path.join(output_dir, header)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(os.path.join(project_dir, header), target)
+    return output_dir
@@ -0,0 +1,247 @@
+import asyncio
+import random
+import threading
+import time
+from config import Config
+from tracing import span
+from utils import Logger, LogColors
+
+AGENT_NAME = "RateLimiter"
+
+class RateLimitExceeded(Exception):
+    """Raised when a request keeps getting rate limited after all retries."""
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """Best-effort detection of an HTTP 429 from the Groq SDK, LangChain or a plain HTTP client."""
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    text = str(exc).lower()
+    return "429" in text or "rate limit" in text or "rate_limit" in text
+
+def retry_after_seconds(exc: Exception):
+    """Returns the server's Retry-After hint in seconds, if the exception carries one."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or getattr(exc, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity` units and refills at `rate` units per second."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if available now)."""
+        self._refill()
+        # A single request larger than the bucket can never fit; let it through once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        """Removes units from the bucket; the balance may go negative to record an overrun."""
+        self._refill()
+        self.tokens -= amount
+
+class RateLimiter:
+    """
+    Async limiter that enforces requests-per-minute and tokens-per-minute budgets,
+    caps the number of requests in flight, and backs off adaptively on HTTP 429.
+
+    On a 429 the effective rate is halved and every caller pauses until the backoff
+    expires; each success restores a fraction of the configured rate (AIMD).
+    Any async callable can be run through `call`, and any blocking one through `call_sync`
+    from worker threads (batch, project and service runs), so the sync and async clients
+    and a local stand-in endpoint share the same budgets.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float,
+                 max_in_flight: int, max_retries: int = None):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_in_flight = max_in_flight
+        self.max_retries = Config.RATE_LIMIT_MAX_RETRIES if max_retries is None else max_retries
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.rate_scale = 1.0 # Fraction of the configured rate currently allowed
+        self.blocked_until = 0.0
+        self.rate_limited_count = 0
+        self._lock = None
+        self._semaphore = None
+        self._loop = None
+        self._state_lock = threading.Lock() # Buckets and backoff are shared by threads and the event loop
+        self._thread_semaphore = threading.BoundedSemaphore(max_in_flight)
+
+    def _ensure_primitives(self):
+        # asyncio primitives are bound to the loop they were first used on; recreate them per loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    def _set_rate_scale(self, scale: float):
+        self.rate_scale = max(Config.RATE_LIMIT_MIN_SCALE, min(1.0, scale))
+        self.request_bucket.rate = self.rate_scale * self.requests_per_minute / 60.0
+        self.token_bucket.rate = self.rate_scale * self.tokens_per_minute / 60.0
+
+    def _try_reserve(self, estimated_tokens: int) -> float:
+        """Takes one request and estimated_tokens from the buckets and returns 0, or returns how long to wait first."""
+        with self._state_lock:
+            wait = max(
+                self.blocked_until - time.monotonic(),
+                self.request_bucket.wait_time(1),
+                self.token_bucket.wait_time(estimated_tokens),
+            )
+            if wait <= 0:
+                self.request_bucket.consume(1)
+                self.token_bucket.consume(estimated_tokens)
+            return wait
+
+    async def _acquire(self, estimated_tokens: int):
+        with span("llm.rate_limit_wait", "llm", limiter=self.name):
+            async with self._lock:
+                while True:
+                    wait = self._try_reserve(estimated_tokens)
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+
+    def _acquire_sync(self, estimated_tokens: int):
+        with span("llm.rate_limit_wait", "llm", limiter=self.name):
+            while True:
+                wait = self._try_reserve(estimated_tokens)
+                if wait <= 0:
+                    break
+                time.sleep(wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Corrects the token bucket once the real token count of a response is known."""
+        if actual_tokens is not None:
+            with self._state_lock:
+                self.token_bucket.consume(actual_tokens - estimated_tokens)
+
+    def _on_rate_limited(self, exc: Exception, attempt: int) -> float:
+        with self._state_lock:
+            self.rate_limited_count += 1
+            self._set_rate_scale(self.rate_scale * 0.5)
+            hinted = retry_after_seconds(exc)
+            backoff = hinted if hinted is not None else min(Config.RATE_LIMIT_MAX_BACKOFF, Config.RATE_LIMIT_BASE_BACKOFF * (2 ** attempt))
+            backoff *= 1 + random.uniform(0, 0.25) # Jitter so waiting callers don't retry in lockstep
+            self.blocked_until = max(self.blocked_until, time.monotonic() + backoff)
+        Logger.warning(f"[{self.name}] Rate limited (429). Backing off {backoff:.1f}s, rate scaled to {self.rate_scale:.2f}.", AGENT_NAME)
+        return backoff
+
+    def _on_success(self):
+        with self._state_lock:
+            if self.rate_scale < 1.0:
+                self._set_rate_scale(self.rate_scale + 0.1)
+
+    async def call(self, request_factory, estimated_tokens: int, usage_of=None):
+        """
+        Runs an async request under the limiter, retrying on 429.
+        Args:
+            request_factory (callable): Zero-argument function returning a fresh awaitable for each attempt.
+            estimated_tokens (int): Tokens reserved up front (prompt plus maximum completion).
+            usage_of (callable): Optional function mapping the result to its actual total token count.
+        Returns:
+            The awaited result of request_factory().
+        """
+        self._ensure_primitives()
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(estimated_tokens)
+            async with self._semaphore:
+                try:
+                    result = await request_factory()
+                except Exception as e:
+                    if not is_rate_limit_error(e):
+                        raise
+                    if attempt >= self.max_retries:
+                        raise RateLimitExceeded(f"[{self.name}] Still rate limited after {self.max_retries + 1} attempts: {e}") from e
+                    self._on_rate_limited(e, attempt)
+                    continue
+            self._on_success()
+            if usage_of is not None:
+                self.record_usage(estimated_tokens, usage_of(result))
+            return result
+        raise RateLimitExceeded(f"[{self.name}] Retries exhausted.")
+
+    def call_sync(self, request, estimated_tokens: int, usage_of=None):
+        """
+        Blocking counterpart of call(), safe to use from many threads at once.
+        Args:
+            request (callable): Zero-argument function making the request; called again for each retry.
+            estimated_tokens (int): Tokens reserved up front (prompt plus maximum completion).
+            usage_of (callable): Optional function mapping the result to its actual total token count.
+        Returns:
+            The result of request().
+        """
+        for attempt in range(self.max_retries + 1):
+            self._acquire_sync(estimated_tokens)
+            with self._thread_semaphore:
+                try:
+                    result = request()
+                except Exception as e:
+                    if not is_rate_limit_error(e):
+                        raise
+                    if attempt >= self.max_retries:
+                        raise RateLimitExceeded(f"[{self.name}] Still rate limited after {self.max_retries + 1} attempts: {e}") from e
+                    self._on_rate_limited(e, attempt)
+                    continue
+            self._on_success()
+            if usage_of is not None:
+                self.record_usage(estimated_tokens, usage_of(result))
+            return result
+        raise RateLimitExceeded(f"[{self.name}] Retries exhausted.")
+
+    def stats(self) -> dict:
+        """Returns the limiter's current state, for logging."""
+        return {
+            "name": self.name,
+            "rate_scale": self.rate_scale,
+            "rate_limited": self.rate_limited_count,
+            "request_tokens": round(self.request_bucket.tokens, 2),
+            "token_tokens": round(self.token_bucket.tokens, 1),
+        }
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(name: str, requests_per_minute: float = None, tokens_per_minute: float = None,
+                max_in_flight: int = None) -> RateLimiter:
+    """
+    Returns the process-wide limiter registered under `name`, creating it on first use.
+    Endpoints that share a quota should share a name; unset limits default to the Groq settings in Config.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is not None:
+            return limiter
+        limiter = RateLimiter(
+            name,
+            requests_per_minute or Config.GROQ_REQUESTS_PER_MINUTE,
+            tokens_per_minute or Config.GROQ_TOKENS_PER_MINUTE,
+            max_in_flight or Config.MAX_CONCURRENT_LLM_CALLS,
+        )
+        _limiters[name] = limiter
+        Logger.info(
+            f"Rate limiter '{name}': {limiter.requests_per_minute} req/min, {limiter.tokens_per_minute} tokens/min, "
+            f"{limiter.max_in_flight} in flight.", AGENT_NAME, LogColors.GROQ_CLIENT
+        )
+    return limiter
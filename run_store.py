@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from c_regions import included_headers
+from config import Config
+from tuning_db import machine_signature
+from utils import Logger, LogColors
+
+AGENT_NAME = "RunStore"
+
+# Context entries that change how a run is carried out, not what it produces
+_KEY_IGNORED_CONTEXT = ("resume",)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    key TEXT PRIMARY KEY,
+    source_path TEXT,
+    expert TEXT,
+    model TEXT,
+    context TEXT,
+    status TEXT NOT NULL,          -- running, succeeded or failed
+    best_code TEXT,
+    attempts INTEGER DEFAULT 0,
+    benchmark TEXT,
+    created REAL,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    run_key TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    kind TEXT,                     -- process or refine
+    candidates TEXT,               -- JSON list of the codes the expert returned
+    code TEXT,                     -- the candidate the checker settled on
+    errors TEXT,
+    stage TEXT,                    -- NULL until the checker has evaluated the candidates
+    accepted INTEGER,
+    report TEXT,
+    llm_seconds REAL,
+    check_seconds REAL,
+    created REAL,
+    PRIMARY KEY (run_key, attempt)
+);
+CREATE TABLE IF NOT EXISTS project_units (
+    project TEXT NOT NULL,         -- absolute project directory
+    path TEXT NOT NULL,            -- translation unit, relative to the project
+    fingerprint TEXT NOT NULL,     -- hash of the unit, the headers it includes and the signatures it calls
+    status TEXT NOT NULL,          -- ok (validated by a combined build) or failed
+    code TEXT,                     -- the validated parallel version
+    updated REAL,
+    PRIMARY KEY (project, path)
+);
+"""
+
+class RunStore:
+    """
+    SQLite store of orchestration runs, keyed by a hash of the source, the compilation context, the expert and the model.
+    Every attempt is checkpointed as soon as the expert answers and again once the checker has judged it, so a rerun
+    on identical input returns the stored result and an interrupted run picks up after its last LLM call.
+    """
+
+    def __init__(self, db_path: str = None, enabled: bool = None):
+        db_path = db_path or Config.RUN_STORE_PATH
+        if not os.path.isabs(db_path):
+            # Relative paths are anchored at the repository root, next to results/
+            db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), db_path)
+        self.db_path = db_path
+        if enabled is None:
+            enabled = Config.RUN_STORE_ENABLED and os.environ.get("PARAGINEERS_NO_RUN_STORE", "") in ("", "0")
+        self.enabled = enabled
+        if self.enabled:
+            try:
+                with closing(self._connect()) as db, db:
+                    db.executescript(_SCHEMA)
+            except sqlite3.Error as e:
+                Logger.warning(f"Run store {self.db_path} unavailable ({e}); runs will not be checkpointed.", AGENT_NAME)
+                self.enabled = False
+
+    def _connect(self):
+        # A connection per operation: batch mode runs orchestrations on several threads
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    @staticmethod
+    def make_key(code: str, compilation_context: dict, expert: str, model: str, source_path: str = None) -> str:
+        """
+        Hashes everything that determines a run's result: the source, the project headers it includes (directly or
+        through other headers), the compilation context (with the contents of its extra files), the expert and the
+        model. Runs that time the code are also tied to the machine.
+        Args:
+            source_path (str): Where the source lives, to resolve its quoted includes; headers are only found relative
+                               to the project directory when omitted.
+        """
+        context = {k: v for k, v in compilation_context.items() if k not in _KEY_IGNORED_CONTEXT}
+        project_dir = compilation_context.get("project_dir") or (os.path.dirname(source_path) if source_path else "")
+        extra_files = {}
+        for path in compilation_context.get("extra_files") or []:
+            extra_files[path] = _file_digest(os.path.join(project_dir, path))
+        search_dirs = [os.path.join(project_dir, d) for d in compilation_context.get("include_dirs") or []] + [project_dir or "."]
+        headers = {os.path.relpath(path, project_dir or "."): _file_digest(path) for path in
+                   included_headers(source_path or os.path.join(project_dir, "source.c"), code, search_dirs)}
+        material = {"code": code, "context": context, "extra_files": extra_files, "headers": headers, "expert": expert,
+                    "model": model}
+        if context.get("benchmark") or context.get("autotune"):
+            material["machine"] = machine_signature()
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """
+        Returns:
+            dict or None: The stored run (status, best_code, attempts, benchmark, ...), or None if there is none.
+        """
+        if not self.enabled:
+            return None
+        try:
+            with closing(self._connect()) as db:
+                row = db.execute("SELECT * FROM runs WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            Logger.warning(f"Could not read run {key[:12]}: {e}", AGENT_NAME)
+            return None
+        if row is None:
+            return None
+        run = dict(row)
+        run["benchmark"] = json.loads(run["benchmark"]) if run["benchmark"] else None
+        return run
+
+    def attempts(self, key: str) -> list:
+        """Returns the run's checkpointed attempts in order, with candidates and report decoded."""
+        if not self.enabled:
+            return []
+        try:
+            with closing(self._connect()) as db:
+                rows = db.execute("SELECT * FROM attempts WHERE run_key = ? ORDER BY attempt", (key,)).fetchall()
+        except sqlite3.Error as e:
+            Logger.warning(f"Could not read attempts of run {key[:12]}: {e}", AGENT_NAME)
+            return []
+        attempts = []
+        for row in rows:
+            attempt = dict(row)
+            attempt["candidates"] = json.loads(attempt["candidates"]) if attempt["candidates"] else []
+            attempt["report"] = json.loads(attempt["report"]) if attempt["report"] else None
+            attempt["accepted"] = bool(attempt["accepted"])
+            attempts.append(attempt)
+        return attempts
+
+    def begin(self, key: str, source_path: str, expert: str, model: str, compilation_context: dict, fresh: bool = True):
+        """Marks the run as in progress. A fresh run discards the attempts of any earlier run with this key."""
+        now = time.time()
+        self._write(key, [
+            ("DELETE FROM attempts WHERE run_key = ?", (key,)) if fresh else None,
+            ("INSERT INTO runs (key, source_path, expert, model, context, status, created, updated) "
+             "VALUES (?, ?, ?, ?, ?, 'running', ?, ?) "
+             "ON CONFLICT(key) DO UPDATE SET status = 'running', source_path = excluded.source_path, updated = excluded.updated",
+             (key, source_path, expert, model, json.dumps(compilation_context, sort_keys=True, default=str), now, now)),
+        ])
+
+    def checkpoint(self, key: str, attempt: int, **fields):
+        """
+        Creates or updates an attempt. Fields: kind, candidates (list), code, errors, stage, accepted, report (dict),
+        llm_seconds, check_seconds.
+        """
+        if "candidates" in fields:
+            fields["candidates"] = json.dumps(fields["candidates"])
+        if "report" in fields:
+            fields["report"] = json.dumps(fields["report"], default=str) if fields["report"] else None
+        columns = ", ".join(fields)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in fields)
+        self._write(key, [
+            (f"INSERT INTO attempts (run_key, attempt, created, {columns}) VALUES (?, ?, ?, {', '.join('?' * len(fields))}) "
+             f"ON CONFLICT(run_key, attempt) DO UPDATE SET {updates}",
+             (key, attempt, time.time(), *fields.values())),
+            ("UPDATE runs SET attempts = MAX(attempts, ?), updated = ? WHERE key = ?", (attempt, time.time(), key)),
+        ])
+
+    def finish(self, key: str, status: str, best_code: str = None, attempts: int = None, benchmark: dict = None):
+        """Records the run's outcome ("succeeded" with its final code, or "failed")."""
+        self._write(key, [
+            ("UPDATE runs SET status = ?, best_code = ?, attempts = COALESCE(?, attempts), benchmark = ?, updated = ? WHERE key = ?",
+             (status, best_code, attempts, json.dumps(benchmark, default=str) if benchmark else None, time.time(), key)),
+        ])
+
+    def project_units(self, project: str) -> dict:
+        """Returns the stored translation units of a project mode run, as {relative path: {"fingerprint", "status", "code"}}."""
+        if not self.enabled:
+            return {}
+        try:
+            with closing(self._connect()) as db:
+                rows = db.execute("SELECT path, fingerprint, status, code FROM project_units WHERE project = ?", (project,)).fetchall()
+        except sqlite3.Error as e:
+            Logger.warning(f"Could not read project units of {project}: {e}", AGENT_NAME)
+            return {}
+        return {row["path"]: dict(row) for row in rows}
+
+    def record_unit(self, project: str, path: str, fingerprint: str, status: str, code: str = None):
+        """Stores the outcome of one translation unit of a project mode run."""
+        self._write(path, [
+            ("INSERT INTO project_units (project, path, fingerprint, status, code, updated) VALUES (?, ?, ?, ?, ?, ?) "
+             "ON CONFLICT(project, path) DO UPDATE SET fingerprint = excluded.fingerprint, status = excluded.status, "
+             "code = excluded.code, updated = excluded.updated",
+             (project, path, fingerprint, status, code, time.time())),
+        ])
+
+    def _write(self, key: str, statements: list):
+        if not self.enabled:
+            return
+        try:
+            with closing(self._connect()) as db, db:
+                for statement in statements:
+                    if statement:
+                        db.execute(*statement)
+        except sqlite3.Error as e:
+            # Checkpoints are an optimization; a failed write must not fail the run
+            Logger.warning(f"Could not update run {key[:12]}: {e}", AGENT_NAME)
+            return
+        Logger.debug(f"Checkpointed run {key[:12]}.", AGENT_NAME, LogColors.ORCHESTRATOR)
+
+def _file_digest(path: str):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
@@ -0,0 +1,389 @@
+import argparse
+import http.client
+import json
+import os
+import queue
+import shutil
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from batch import make_output_path
+from config import Config
+from utils import Logger, LogColors
+
+AGENT_NAME = "Service"
+
+# The compilation context entries a job may set (see main.py for their meaning)
+CONTEXT_KEYS = ("project_dir", "include_dirs", "extra_files", "extra_flags", "num_candidates", "refine_mode", "paradigm",
+                "rule_based", "resume", "profile", "locality", "benchmark", "vectorize", "autotune")
+FINISHED = ("succeeded", "failed")
+
+class JobQueue:
+    """
+    Queue of parallelization jobs served by a fixed pool of worker threads.
+    Each worker keeps one Orchestrator for its whole life, and the process keeps the LLM client, the response
+    cache, the run store and the build cache open, so a job pays none of the startup a main.py invocation does.
+    """
+
+    def __init__(self, workers: int = None):
+        self.num_workers = workers or Config.SERVICE_WORKERS
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Does the expensive imports and client setup up front, then starts the workers."""
+        # Deferred until now so that the submit/status client never pays for them
+        from agents.orchestrator import Orchestrator
+        from llm_backends import get_backend
+        started = time.perf_counter()
+        try:
+            get_backend().warm_up()
+        except Exception as e:
+            Logger.warning(f"LLM backend warm-up failed ({e}); it will be retried on the first prompt.", AGENT_NAME)
+        orchestrators = [Orchestrator() for _ in range(self.num_workers)]
+        for index, orchestrator in enumerate(orchestrators):
+            thread = threading.Thread(target=self._work, args=(orchestrator,), name=f"service-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        Logger.info(f"{self.num_workers} worker(s) ready in {time.perf_counter() - started:.2f}s.", AGENT_NAME, LogColors.SERVICE)
+
+    def stop(self):
+        """Lets the workers finish their current job and exit."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def submit(self, spec: dict) -> dict:
+        """
+        Queues a job.
+        Args:
+            spec (dict): {"source": absolute path} or {"code": C source, "name": file name}, plus an optional
+                "context" dict with compilation context entries.
+        Returns:
+            dict: The job's status record.
+        Raises:
+            ValueError: If the spec is malformed.
+            OverflowError: If SERVICE_MAX_QUEUED jobs are already waiting.
+        """
+        context = spec.get("context") or {}
+        if not isinstance(context, dict) or set(context) - set(CONTEXT_KEYS):
+            raise ValueError(f"'context' must be an object with keys from: {', '.join(CONTEXT_KEYS)}.")
+        if spec.get("code") is not None:
+            name = os.path.basename(spec.get("name") or "source.c")
+        elif spec.get("source"):
+            if not os.path.isabs(spec["source"]) or not os.path.isfile(spec["source"]):
+                raise ValueError(f"'source' must be the absolute path of an existing file: {spec['source']}")
+            name = os.path.basename(spec["source"])
+        else:
+            raise ValueError("A job needs either 'source' (a file path) or 'code' (the C source).")
+
+        self._expire()
+        with self._lock:
+            if self._queue.qsize() >= Config.SERVICE_MAX_QUEUED:
+                raise OverflowError(f"{Config.SERVICE_MAX_QUEUED} jobs are already queued.")
+            job = {"id": uuid.uuid4().hex[:12], "name": name, "status": "queued", "source": spec.get("source"),
+                   "code": spec.get("code"), "context": context, "result": None, "error": "", "attempts": 0,
+                   "speedup": None, "run_key": None, "submitted": time.time(), "started": None, "finished": None}
+            self.jobs[job["id"]] = job
+        self._queue.put(job)
+        Logger.info(f"Queued job {job['id']} ({name}).", AGENT_NAME, LogColors.SERVICE)
+        return self.status(job["id"])
+
+    def status(self, job_id: str, with_result: bool = False):
+        """
+        Returns:
+            dict or None: The job's status (and, with with_result, its parallelized code), or None for an unknown job.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            record = {k: job[k] for k in ("id", "name", "status", "error", "attempts", "speedup", "run_key", "submitted", "started", "finished")}
+            if job["status"] == "queued":
+                record["position"] = sum(1 for j in self.jobs.values() if j["status"] == "queued" and j["submitted"] <= job["submitted"])
+        if with_result:
+            record["code"] = job["result"]
+        return record
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {status: 0 for status in ("queued", "running") + FINISHED}
+            for job in self.jobs.values():
+                counts[job["status"]] += 1
+        return dict(counts, workers=self.num_workers)
+
+    def _expire(self):
+        """Forgets finished jobs older than SERVICE_JOB_TTL_SECONDS."""
+        cutoff = time.time() - Config.SERVICE_JOB_TTL_SECONDS
+        with self._lock:
+            for job_id in [j["id"] for j in self.jobs.values() if j["finished"] and j["finished"] < cutoff]:
+                del self.jobs[job_id]
+
+    def _work(self, orchestrator):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                job["status"] = "running"
+                job["started"] = time.time()
+            self._run(orchestrator, job)
+            Logger.info(f"Job {job['id']} {job['status']} in {job['finished'] - job['started']:.1f}s.", AGENT_NAME, LogColors.SERVICE)
+
+    def _run(self, orchestrator, job: dict):
+        context = dict(job["context"])
+        job_dir = None
+        try:
+            source_path = job["source"]
+            if source_path is None:
+                # Inline code is written to a scratch directory; includes still resolve against the given project_dir
+                job_dir = tempfile.mkdtemp(prefix="paragineers_job_")
+                source_path = os.path.join(job_dir, job["name"])
+                with open(source_path, "w") as f:
+                    f.write(job["code"])
+            if not context.get("project_dir"):
+                context["project_dir"] = os.path.dirname(source_path)
+            result, status, error = orchestrator.run(source_path, context), "succeeded", ""
+        except Exception as e:
+            result, status, error = None, "failed", str(e).splitlines()[0] if str(e) else type(e).__name__
+        finally:
+            if job_dir:
+                shutil.rmtree(job_dir, ignore_errors=True)
+        benchmark = orchestrator.last_benchmark
+        with self._lock:
+            job.update(status=status, result=result, error=error, attempts=orchestrator.last_attempts,
+                       run_key=orchestrator.last_run_key, finished=time.time(), code=None,
+                       speedup=benchmark["best"]["speedup"] if benchmark and benchmark.get("best") else None)
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs            submit a job, returns 202 and its status
+    GET  /jobs/<id>       job status
+    GET  /jobs/<id>/result  parallelized code (409 until the job has finished)
+    GET  /health          queue and worker counts
+    """
+    server_version = "ParagineersService/1.0"
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._reply(404, {"error": f"No such endpoint: POST {self.path}"})
+        try:
+            spec = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if not isinstance(spec, dict):
+                raise ValueError("The request body must be a JSON object.")
+            return self._reply(202, self.server.jobs.submit(spec))
+        except ValueError as e:
+            return self._reply(400, {"error": str(e)})
+        except OverflowError as e:
+            return self._reply(503, {"error": str(e)})
+
+    def do_GET(self):
+        parts = [p for p in urllib.parse.urlparse(self.path).path.split("/") if p]
+        if parts == ["health"]:
+            return self._reply(200, self.server.jobs.stats())
+        if len(parts) in (2, 3) and parts[0] == "jobs" and parts[2:] in ([], ["result"]):
+            record = self.server.jobs.status(parts[1], with_result=len(parts) == 3)
+            if record is None:
+                return self._reply(404, {"error": f"Unknown job {parts[1]}"})
+            if len(parts) == 3 and record["status"] not in FINISHED:
+                return self._reply(409, record)
+            return self._reply(200, record)
+        return self._reply(404, {"error": f"No such endpoint: GET {self.path}"})
+
+    def _reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # client_address is a plain string on a Unix socket, so the default formatter cannot be used
+        Logger.debug(lambda: f"{self.command} {self.path} -> {format % args}", AGENT_NAME, LogColors.SERVICE)
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("local", 0) # BaseHTTPRequestHandler expects a (host, port) client address
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(host: str = None, port: int = None, socket_path: str = None, workers: int = None):
+    """
+    Runs the service until interrupted.
+    Args:
+        host (str): Interface to listen on (default SERVICE_HOST; keep it local, there is no authentication).
+        port (int): TCP port (default SERVICE_PORT).
+        socket_path (str): Listen on this Unix socket instead of TCP (default SERVICE_SOCKET).
+        workers (int): Number of worker threads (default SERVICE_WORKERS).
+    """
+    jobs = JobQueue(workers)
+    jobs.start()
+    socket_path = socket_path or Config.SERVICE_SOCKET
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path) # Left behind by a previous instance
+        server = _UnixHTTPServer(socket_path, _RequestHandler)
+        address = socket_path
+    else:
+        server = ThreadingHTTPServer((host or Config.SERVICE_HOST, port or Config.SERVICE_PORT), _RequestHandler)
+        server.daemon_threads = True
+        address = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    server.jobs = jobs
+    signal.signal(signal.SIGTERM, _interrupt) # Stop the same way on SIGTERM (service managers) as on Ctrl-C
+    Logger.success(f"Service listening on {address}.", AGENT_NAME)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        Logger.info("Shutting down; waiting for running jobs to finish.", AGENT_NAME, LogColors.SERVICE)
+    finally:
+        server.server_close()
+        jobs.stop()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def request(method: str, path: str, body: dict = None, url: str = None, socket_path: str = None, timeout: float = 30):
+    """
+    Calls the service.
+    Args:
+        url (str): Base URL, e.g. http://127.0.0.1:8765 (default from SERVICE_HOST/SERVICE_PORT).
+        socket_path (str): Unix socket to use instead of url.
+    Returns:
+        tuple: (HTTP status, decoded JSON body).
+    """
+    socket_path = socket_path or (None if url else Config.SERVICE_SOCKET)
+    if socket_path:
+        connection = _UnixHTTPConnection(socket_path, timeout)
+    else:
+        parsed = urllib.parse.urlparse(url or f"http://{Config.SERVICE_HOST}:{Config.SERVICE_PORT}")
+        connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+    try:
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        connection.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        connection.close()
+
+def _submit(args) -> int:
+    context = json.loads(args.context) if args.context else {}
+    if args.project_dir:
+        context["project_dir"] = os.path.abspath(args.project_dir)
+    for key, value in (("include_dirs", args.include_dirs), ("extra_files", args.extra_files), ("extra_flags", args.compiler_flags),
+                       ("paradigm", args.paradigm)):
+        if value:
+            context[key] = value
+    if args.fresh:
+        context["resume"] = False
+    status, job = request("POST", "/jobs", {"source": os.path.abspath(args.source_file), "context": context}, args.url, args.socket)
+    if status != 202:
+        Logger.error(f"Submission rejected ({status}): {job.get('error')}", AGENT_NAME)
+        return 2
+    if args.no_wait:
+        print(job["id"])
+        return 0
+    Logger.info(f"Submitted job {job['id']}; waiting for it to finish.", AGENT_NAME, LogColors.SERVICE)
+    while True:
+        status, job = request("GET", f"/jobs/{job['id']}/result", url=args.url, socket_path=args.socket)
+        if status != 409:
+            break
+        time.sleep(Config.SERVICE_POLL_INTERVAL)
+    return _write_result(job, args.source_file, args.output)
+
+def _write_result(job: dict, source_path: str, output_path: str = None) -> int:
+    if job.get("status") != "succeeded":
+        Logger.error(f"Job {job.get('id')} failed: {job.get('error')}", AGENT_NAME)
+        return 1
+    if output_path is None:
+        results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+        os.makedirs(results_dir, exist_ok=True)
+        output_path = make_output_path(results_dir, source_path, reserve=False)
+    with open(output_path, "w") as f:
+        f.write(job["code"])
+    Logger.success(f"Job {job['id']} succeeded after {job['attempts']} attempt(s); saved to {output_path}", AGENT_NAME)
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the parallelizer as a long-running local service, or talk to one")
+    parser.add_argument("--url", help=f"Service URL (default http://{Config.SERVICE_HOST}:{Config.SERVICE_PORT})")
+    parser.add_argument("--socket", help="Unix socket path, instead of TCP")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], type=str.upper, help="Minimum log level to print")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Start the service")
+    serve_parser.add_argument("--host", help="Interface to listen on")
+    serve_parser.add_argument("--port", type=int, help="TCP port to listen on")
+    serve_parser.add_argument("--workers", type=int, help="Worker threads (jobs processed at once)")
+
+    submit_parser = commands.add_parser("submit", help="Submit a C file and (by default) wait for the result")
+    submit_parser.add_argument("source_file", help="C source file to parallelize")
+    submit_parser.add_argument("-o", "--output", help="Where to write the result (default results/output_<name>_<timestamp>.c)")
+    submit_parser.add_argument("-p", "--project-dir", help="Root directory of the C project")
+    submit_parser.add_argument("-i", "--include-dirs", nargs='+', help="Include directories (relative to project dir)")
+    submit_parser.add_argument("-f", "--extra-files", nargs='+', help="Additional C files to compile")
+    submit_parser.add_argument("-c", "--compiler-flags", nargs='+', help="Additional compiler flags")
+    submit_parser.add_argument("--paradigm", choices=["auto", "openmp", "mpi", "hybrid"], help="Parallelization paradigm")
+    submit_parser.add_argument("--fresh", action="store_true", help="Ignore stored results of an identical earlier run")
+    submit_parser.add_argument("--context", help="Further compilation context entries as a JSON object")
+    submit_parser.add_argument("--no-wait", action="store_true", help="Print the job id and return immediately")
+
+    status_parser = commands.add_parser("status", help="Show a job's status, or the service's queue counts")
+    status_parser.add_argument("job_id", nargs="?", help="Job id (omit for service health)")
+
+    result_parser = commands.add_parser("result", help="Fetch a finished job's code")
+    result_parser.add_argument("job_id", help="Job id")
+    result_parser.add_argument("source_file", help="The submitted source file (names the default output file)")
+    result_parser.add_argument("-o", "--output", help="Where to write the result")
+
+    args = parser.parse_args(argv)
+    if args.log_level:
+        Logger.set_level(args.log_level)
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.socket, args.workers)
+        return 0
+    try:
+        if args.command == "submit":
+            return _submit(args)
+        if args.command == "status":
+            status, body = request("GET", f"/jobs/{args.job_id}" if args.job_id else "/health", url=args.url, socket_path=args.socket)
+            print(json.dumps(body, indent=2))
+            return 0 if status == 200 else 1
+        status, job = request("GET", f"/jobs/{args.job_id}/result", url=args.url, socket_path=args.socket)
+        if status == 409:
+            Logger.warning(f"Job {args.job_id} is still {job['status']}.", AGENT_NAME)
+            return 3
+        if status != 200:
+            Logger.error(job.get("error", f"HTTP {status}"), AGENT_NAME)
+            return 1
+        return _write_result(job, args.source_file, args.output)
+    except (OSError, http.client.HTTPException) as e:
+        Logger.error(f"Could not reach the service: {e}", AGENT_NAME)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from config import Config
+
+# Per-stage timing spans for the orchestration pipeline.
+# Spans are tagged with whatever trace_context() is active (the orchestrator sets context_id
+# and attempt), so one run can be picked out of a batch. When tracing is disabled, span()
+# returns a shared no-op object and costs next to nothing.
+
+_tags = contextvars.ContextVar("paragineers_trace_tags", default={})
+
+class Span:
+    """One timed stage. Attributes can be added while it runs (e.g. token counts once a response arrives)."""
+
+    __slots__ = ("name", "category", "start", "duration", "thread_id", "attrs")
+
+    def __init__(self, name: str, category: str, attrs: dict):
+        self.name = name
+        self.category = category
+        self.start = 0.0
+        self.duration = 0.0
+        self.thread_id = threading.get_ident()
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Tracer:
+    """Collects spans from every thread of the process."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.origin_wall = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **attrs):
+        """
+        Times the enclosed block.
+        Args:
+            name (str): Stage name, e.g. "checker.build".
+            category (str): Coarse grouping ("llm", "compile", "expert", ...), used as the Chrome-trace category.
+            **attrs: Extra attributes recorded with the span.
+        """
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        span = Span(name, category, dict(_tags.get(), **attrs))
+        span.start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            with self._lock:
+                self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def _records(self) -> list:
+        with self._lock:
+            spans = list(self.spans)
+        return sorted(spans, key=lambda s: s.start)
+
+    def export_jsonl(self, path: str):
+        """Writes one JSON object per span: name, category, start (seconds since tracing began), duration, thread and attributes."""
+        with open(path, "w") as f:
+            for span in self._records():
+                record = {"name": span.name, "category": span.category, "start": round(span.start - self.origin, 6),
+                          "duration": round(span.duration, 6), "thread": span.thread_id}
+                record.update(span.attrs)
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def export_chrome_trace(self, path: str):
+        """Writes the spans in Chrome's trace-event format (open in chrome://tracing or ui.perfetto.dev)."""
+        pid = os.getpid()
+        events = []
+        for span in self._records():
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - self.origin) * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {k: v if isinstance(v, (int, float, bool, str)) or v is None else str(v) for k, v in span.attrs.items()},
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.origin_wall))}}, f)
+
+    def summary(self) -> list:
+        """
+        Aggregates the spans by name.
+        Returns:
+            list: {"name", "count", "total", "mean", "max", "tokens"} dicts, slowest stage first.
+        """
+        stats = {}
+        for span in self._records():
+            entry = stats.setdefault(span.name, {"name": span.name, "count": 0, "total": 0.0, "max": 0.0, "tokens": 0})
+            entry["count"] += 1
+            entry["total"] += span.duration
+            entry["max"] = max(entry["max"], span.duration)
+            if not span.attrs.get("cached"): # Cache hits carry token estimates, but cost nothing
+                entry["tokens"] += (span.attrs.get("prompt_tokens") or 0) + (span.attrs.get("response_tokens") or 0)
+        for entry in stats.values():
+            entry["mean"] = entry["total"] / entry["count"]
+        return sorted(stats.values(), key=lambda e: e["total"], reverse=True)
+
+tracer = Tracer(Config.TRACE_ENABLED)
+
+def span(name: str, category: str = "stage", **attrs):
+    """Times a block with the process-wide tracer: `with span("checker.build", "compile") as s: ...`."""
+    return tracer.span(name, category, **attrs)
+
+def set_tracing_enabled(enabled: bool):
+    tracer.enabled = enabled
+
+@contextmanager
+def trace_context(**tags):
+    """Tags every span started inside the block (in this thread, or in threads started via `propagate`)."""
+    token = _tags.set(dict(_tags.get(), **tags))
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+def propagate(fn):
+    """
+    Wraps fn so it runs with the caller's trace tags when executed on a pool thread
+    (ThreadPoolExecutor does not carry context variables over by itself).
+    """
+    context = contextvars.copy_context()
+
+    def _run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return _run
+
+def write_trace(prefix: str) -> tuple:
+    """Exports the spans to <prefix>.jsonl and <prefix>.trace.json (Chrome trace). Returns both paths."""
+    directory = os.path.dirname(prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    jsonl_path, chrome_path = f"{prefix}.jsonl", f"{prefix}.trace.json"
+    tracer.export_jsonl(jsonl_path)
+    tracer.export_chrome_trace(chrome_path)
+    return jsonl_path, chrome_path
+
+def format_summary(entries: list) -> str:
+    """Formats summary() as a table of where the time went."""
+    if not entries:
+        return "No spans recorded."
+    lines = [f"{'Stage':<28} {'Count':>6} {'Total (s)':>10} {'Mean (s)':>9} {'Max (s)':>8} {'Tokens':>8}"]
+    for e in entries:
+        lines.append(f"{e['name']:<28} {e['count']:>6} {e['total']:>10.3f} {e['mean']:>9.3f} {e['max']:>8.3f} {e['tokens'] or '-':>8}")
+    return "\n".join(lines)
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from config import Config
+from utils import Logger, LogColors
+
+AGENT_NAME = "TuningDB"
+
+_machine_signature = None
+
+def machine_signature() -> str:
+    """
+    Describes the machine tuning results are valid for: architecture, CPU model, core count and compiler.
+    Computed once per process.
+    """
+    global _machine_signature
+    if _machine_signature is not None:
+        return _machine_signature
+    cpu_model = platform.processor() or ""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu_model = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    try:
+        compiler = subprocess.run(["gcc", "--version"], capture_output=True, text=True, timeout=10).stdout.splitlines()[0]
+    except (OSError, subprocess.TimeoutExpired, IndexError):
+        compiler = "unknown"
+    _machine_signature = f"{platform.machine()}|{cpu_model}|{os.cpu_count()}|{compiler}"
+    return _machine_signature
+
+class TuningDatabase:
+    """
+    On-disk store of autotuning results, one JSON file per (source, build settings, machine) key,
+    so a repeat run of the same code on the same machine reuses the winning variant without re-sweeping.
+    """
+
+    def __init__(self, db_dir: str = None):
+        db_dir = db_dir or Config.AUTOTUNE_DB_DIR
+        if not os.path.isabs(db_dir):
+            # Relative paths are anchored at the repository root, next to results/
+            db_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), db_dir)
+        self.db_dir = db_dir
+
+    @staticmethod
+    def make_key(code: str, settings: dict) -> str:
+        """Hashes the code, the build/run settings that affect timing, and the machine signature."""
+        material = json.dumps({"code": code, "settings": settings, "machine": machine_signature()}, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.db_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        """
+        Returns:
+            dict or None: The stored tuning result, or None if this code was never tuned on this machine.
+        """
+        try:
+            with open(self._path_for(key), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, result: dict):
+        path = self._path_for(key)
+        entry = dict(result, created=time.time(), machine=machine_signature())
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see a partial entry
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            Logger.warning(f"Could not write tuning entry {key[:12]}: {e}", AGENT_NAME)
+            return
+        Logger.debug(f"Stored tuning result {key[:12]}.", AGENT_NAME, LogColors.CHECKER)
@@ -1,5 +1,20 @@
+import os
+
 class Logger:
-    """Simple logger class with color support."""
+    """
+    Simple logger class with color support and level gating.
+    Messages may be passed as zero-argument callables; they are only called (and the
+    text built) when the level is enabled, so large debug payloads cost nothing otherwise.
+    """
+
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+    LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+
+    # PARAGINEERS_LOG_LEVEL sets the initial level; main.py overrides it with --log-level
+    level = LEVELS.get(os.environ.get("PARAGINEERS_LOG_LEVEL", "INFO").upper(), INFO)
 
     # ANSI escape codes for colors
     RESET = "\033[0m"
@@ -12,35 +27,56 @@ class Logger:
     WHITE = "\033[37m"
 
     @staticmethod
-    def _log(message: str, color: str, agent_name: str):
-        print(f"{color}[{agent_name}] {message}{Logger.RESET}")
+    def set_level(level):
+        """Sets the minimum level that is printed, by name ("DEBUG", "INFO", ...) or number."""
+        if isinstance(level, str):
+            if level.upper() not in Logger.LEVELS:
+                raise ValueError(f"Unknown log level '{level}'. Choose from {', '.join(Logger.LEVELS)}.")
+            level = Logger.LEVELS[level.upper()]
+        Logger.level = level
+
+    @staticmethod
+    def is_enabled(level: int) -> bool:
+        return level >= Logger.level
+
+    @staticmethod
+    def _log(level: int, message, color: str, agent_name: str, prefix: str = ""):
+        if level < Logger.level:
+            return
+        if callable(message):
+            message = message()
+        print(f"{color}[{agent_name}] {prefix}{message}{Logger.RESET}")
 
     @staticmethod
-    def info(message: str, agent_name: str, color_code: str = WHITE):
-        Logger._log(message, color_code, agent_name)
+    def info(message, agent_name: str, color_code: str = WHITE):
+        Logger._log(Logger.INFO, message, color_code, agent_name)
 
     @staticmethod
-    def success(message: str, agent_name: str):
-        Logger._log(message, Logger.GREEN, agent_name)
+    def success(message, agent_name: str):
+        Logger._log(Logger.INFO, message, Logger.GREEN, agent_name)
 
     @staticmethod
-    def warning(message: str, agent_name: str):
-        Logger._log(message, Logger.YELLOW, agent_name)
+    def warning(message, agent_name: str):
+        Logger._log(Logger.WARNING, message, Logger.YELLOW, agent_name)
 
     @staticmethod
-    def error(message: str, agent_name: str):
-        Logger._log(message, Logger.RED, agent_name)
+    def error(message, agent_name: str):
+        Logger._log(Logger.ERROR, message, Logger.RED, agent_name)
 
     @staticmethod
-    def debug(message: str, agent_name: str, color_code: str = MAGENTA):
+    def debug(message, agent_name: str, color_code: str = MAGENTA):
         # Dedicated color for debug, or use a specific one if needed
-        Logger._log(f"DEBUG: {message}", color_code, agent_name)
+        Logger._log(Logger.DEBUG, message, color_code, agent_name, "DEBUG: ")
 
 # Define color constants for each module/agent
 class LogColors:
     ORCHESTRATOR = Logger.CYAN
     OMP_EXPERT = Logger.BLUE
     MPI_EXPERT = Logger.MAGENTA
+    HYBRID_EXPERT = Logger.MAGENTA
     CHECKER = Logger.YELLOW
     GROQ_CLIENT = Logger.GREEN
-    MAIN = Logger.WHITE
\ No newline at end of file
+    MAIN = Logger.WHITE
+    SERVICE = Logger.CYAN
+    VECTORIZER = Logger.BLUE
+    LOCALITY = Logger.GREEN
\ No newline at end of file